@@ -2,15 +2,20 @@ from typing import Annotated
 
 from fastapi import Depends
 
+from services.helpers.revocation import revocation_list
 from core import exceptions
 from schemas.auth import TokenUserData
-from services.helpers.security import oauth2_scheme, get_token_user
+from services.helpers.security import oauth2_scheme, get_token_user, decode_claims
 
 
-def get_current_user(
+async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
 ):
     user = get_token_user(token)
+    claims = decode_claims(token)
+    revoked = await revocation_list.is_revoked(claims.jti)
+    if revoked or await revocation_list.is_user_revoked(user.id, claims.iat):
+        raise exceptions.CREDENTIALS_EXCEPTION_REVOKED
     return user
 
 
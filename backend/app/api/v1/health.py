@@ -1,5 +1,7 @@
 from fastapi import APIRouter, status
 
+from core import metrics
+
 router = APIRouter(tags=["health"])
 
 
@@ -7,3 +9,9 @@ router = APIRouter(tags=["health"])
 async def status():
     """Проверка работоспособности."""
     return {"detail": "pong"}
+
+
+@router.get("/metrics", summary="Runtime metrics of the worker")
+async def get_metrics():
+    """Метрики подсистем текущего воркера."""
+    return metrics.collect()
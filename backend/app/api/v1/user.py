@@ -1,14 +1,22 @@
-from typing import Annotated
+from typing import Annotated, Literal
 
 from fastapi import APIRouter
-from fastapi import Depends
+from fastapi import Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.deps import get_current_active_user, check_admin_role
-from core.session_manager import get_session
+from core.session_manager import get_session, get_read_session
 from schemas.auth import TokenUserData
 from schemas.page import PageResponse, PagedParamsSchema
-from schemas.user import UserUpdateSchema, UserFilterSchema, UserResponse
+from schemas.bulk import BulkWriteResponse
+from schemas.user import (
+    UserUpdateSchema,
+    UserFilterSchema,
+    UserSearchSchema,
+    UserResponse,
+    UserCreateSchema,
+)
 from services.user import UserService
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -20,20 +28,23 @@ router = APIRouter(prefix="/users", tags=["users"])
     summary="Get current user info",
 )
 async def read_user_me(
-    session: Annotated[AsyncSession, Depends(get_session)],
+    request: Request,
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     current_user: Annotated[TokenUserData, Depends(get_current_active_user)],
 ):
     """
     Данные текущего пользователя.
 
     Args:
+        request: Запрос (для проверки If-None-Match),
         session: Сессия БД,
         current_user: Текущий пользователь.
 
     Returns:
         UserResponse: Схема возвращаемых данных о пользователе.
     """
-    return await UserService(session).find_one(current_user.id)
+    user = await UserService(session).find_one(current_user.id)
+    return user.to_response(request)
 
 
 @router.patch(
@@ -58,23 +69,73 @@ async def update_me(
     return await UserService(session).edit_me(current_user, data)
 
 
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    dependencies=[Depends(check_admin_role)],
+    summary="Export users as NDJSON or CSV by Admin",
+)
+async def export(
+    filter_schema: Annotated[UserFilterSchema, Depends()],
+    fmt: Annotated[Literal["ndjson", "csv"], Query(alias="format")] = "ndjson",
+):
+    """
+    Потоковая выгрузка пользователей Админом.
+
+    Args:
+        filter_schema: Критерий отбора списка данных,
+        fmt: Формат выгрузки (ndjson или csv).
+    """
+    return StreamingResponse(
+        UserService.export(filter_schema, fmt),
+        media_type="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="users.{fmt}"'},
+    )
+
+
+@router.post(
+    "/import",
+    response_model=BulkWriteResponse,
+    dependencies=[Depends(check_admin_role)],
+    summary="Bulk import of users by Admin",
+)
+async def import_users(
+    session: Annotated[AsyncSession, Depends(get_session)],
+    users: list[UserCreateSchema],
+    on_conflict: Literal["skip", "update", "error"] = "skip",
+):
+    """
+    Массовый импорт пользователей Админом.
+
+    Args:
+        session: Сессия БД,
+        users: Список создаваемых пользователей,
+        on_conflict: Что делать с существующим username: пропустить, обновить или
+            отменить импорт.
+    """
+    return await UserService(session).import_users(users, on_conflict)
+
+
 @router.get(
     "/{user_id}",
     response_model=UserResponse,
     summary="Get user info",
 )
 async def get_one(
-    session: Annotated[AsyncSession, Depends(get_session)],
+    request: Request,
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     user_id: int,
 ):
     """
     Возвращает данных пользователя.
 
     Args:
+        request: Запрос (для проверки If-None-Match),
         session: Сессия БД,
         user_id: Идентификатор пользователя.
     """
-    return await UserService(session).find_one(user_id)
+    user = await UserService(session).find_one(user_id)
+    return user.to_response(request)
 
 
 @router.get(
@@ -83,19 +144,26 @@ async def get_one(
     summary="View user data by filters",
 )
 async def get_many(
-    session: Annotated[AsyncSession, Depends(get_session)],
+    request: Request,
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     limit_offset: Annotated[PagedParamsSchema, Depends()],
     filter_schema: Annotated[UserFilterSchema, Depends()],
+    search_schema: Annotated[UserSearchSchema, Depends()],
 ):
     """
     Возвращает список пользователей.
 
     Args:
+        request: Запрос (для проверки If-None-Match),
         session: Сессия БД,
         limit_offset: Параметры для постраничного отображения,
-        filter_schema: Критерий отбора списка данных.
+        filter_schema: Критерий отбора списка данных,
+        search_schema: Поисковый запрос (выдача по релевантности и курсору).
     """
-    return await UserService(session).find_all(limit_offset, filter_schema)
+    page = await UserService(session).find_all(
+        limit_offset, filter_schema, search_schema.q
+    )
+    return page.to_response(request)
 
 
 @router.patch(
@@ -1,22 +1,90 @@
+import random
 from abc import ABC, abstractmethod
-from typing import TypeVar
+from typing import Any, TypeVar
 
+import orjson
 from pydantic import BaseModel
 
 SchemaType = TypeVar("SchemaType", bound=BaseModel)
 
 
+def dump_value(value: Any) -> bytes:
+    """Сериализует значение кэша (схему, список схем или JSON-совместимые данные)."""
+    if isinstance(value, BaseModel):
+        value = value.model_dump()
+    elif isinstance(value, list):
+        value = [_.model_dump() if isinstance(_, BaseModel) else _ for _ in value]
+    return orjson.dumps(value)
+
+
+def load_value(value: bytes | None) -> Any:
+    """Десериализует значение, записанное `dump_value`."""
+    if value is None:
+        return None
+    return orjson.loads(value)
+
+
+def jittered(timeout: int, jitter: float) -> int:
+    """
+    Случайно укорачивает время жизни не более чем на долю `jitter`.
+
+    Ключи, записанные одновременно, истекают в разное время, и промахи не приходят
+    в базу данных одной волной.
+    """
+    if jitter <= 0 or timeout <= 1:
+        return timeout
+    return max(1, timeout - int(random.random() * jitter * timeout))  # nosec B311
+
+
 class AbstractCache(ABC):
-    """Абстрактный класс для реализации кеша данных."""
+    """
+    Абстрактный класс для реализации кеша данных.
+
+    Реализации хранят сериализованные байты (методы `*_raw` и удаление), а чтение и
+    запись значений через `dump_value`/`load_value` общие для всех реализаций.
+    Байтовые методы позволяют хранить готовые тела HTTP-ответов.
+    """
 
     @abstractmethod
-    async def get(self, key: str) -> SchemaType | None:
-        """Получает значение из кеша по ключу."""
+    async def get_raw(self, key: str) -> bytes | None:
+        """Получает байты из кеша по ключу."""
         pass
 
     @abstractmethod
-    async def set(self, key: str, value: SchemaType, timeout: int) -> None:
-        """Записывает значение в кеш по ключу и устанавливает таймаут для удаления."""
+    async def get_raw_with_ttl(self, key: str) -> tuple[bytes | None, float | None]:
+        """Получает байты и оставшееся время их жизни в секундах."""
+        pass
+
+    @abstractmethod
+    async def get_raw_many(self, keys: list[str]) -> list[bytes | None]:
+        """Получает байты нескольких ключей за одно обращение (в порядке ключей)."""
+        pass
+
+    @abstractmethod
+    async def get_raw_many_with_ttl(
+        self, keys: list[str]
+    ) -> list[tuple[bytes | None, float | None]]:
+        """Получает байты нескольких ключей и оставшееся время их жизни в секундах."""
+        pass
+
+    @abstractmethod
+    async def set_raw(
+        self, key: str, value: bytes, timeout: int, stale_timeout: int = 0
+    ) -> None:
+        """
+        Записывает байты в кеш по ключу и устанавливает таймаут для удаления.
+
+        Значение свежее `timeout` секунд (со случайным разбросом), затем еще
+        `stale_timeout` секунд его можно отдавать как устаревшее, пока оно
+        обновляется в фоне.
+        """
+        pass
+
+    @abstractmethod
+    async def set_raw_many(
+        self, items: dict[str, bytes], timeout: int, stale_timeout: int = 0
+    ) -> None:
+        """Записывает байты нескольких ключей за одно обращение."""
         pass
 
     @abstractmethod
@@ -24,7 +92,50 @@ class AbstractCache(ABC):
         """Удаляет значение из кеша по ключу."""
         pass
 
+    @abstractmethod
+    async def delete_many(self, keys: list[str]) -> None:
+        """Удаляет несколько ключей за одно обращение."""
+        pass
+
     @abstractmethod
     async def delete_namespace(self, prefix: str) -> None:
         """Удаляет все ключи с указанным префиксом."""
         pass
+
+    async def get(self, key: str) -> SchemaType | None:
+        """Получает значение из кеша по ключу."""
+        return load_value(await self.get_raw(key))
+
+    async def get_with_ttl(self, key: str) -> tuple[SchemaType | None, float | None]:
+        """Получает значение и оставшееся время его жизни в секундах."""
+        value, ttl = await self.get_raw_with_ttl(key)
+        return load_value(value), ttl
+
+    async def get_many(self, keys: list[str]) -> list[SchemaType | None]:
+        """Получает значения нескольких ключей за одно обращение (в порядке ключей)."""
+        return [load_value(value) for value in await self.get_raw_many(keys)]
+
+    async def set(
+        self, key: str, value: SchemaType, timeout: int, stale_timeout: int = 0
+    ) -> None:
+        """Записывает значение в кеш по ключу (см. `set_raw`)."""
+        await self.set_raw(key, dump_value(value), timeout, stale_timeout)
+
+    async def set_many(
+        self, items: dict[str, SchemaType], timeout: int, stale_timeout: int = 0
+    ) -> None:
+        """Записывает несколько значений за одно обращение."""
+        await self.set_raw_many(
+            {key: dump_value(value) for key, value in items.items()},
+            timeout,
+            stale_timeout,
+        )
+
+    # необязательные хуки: у большинства кэшей нет фоновых задач
+    async def start(self) -> None:  # noqa: B027
+        """Запускает фоновые задачи кэша (вызывается при старте приложения)."""
+        return None
+
+    async def stop(self) -> None:  # noqa: B027
+        """Останавливает фоновые задачи кэша."""
+        return None
@@ -1,50 +1,188 @@
+import asyncio
 from functools import wraps
 from typing import Any
-from collections.abc import Callable
+from collections.abc import Awaitable, Callable
 
 from loguru import logger
 
+from core import metrics
 from core.config import settings
 from .base import AbstractCache
 from .memory_db import InMemoryCache
+from .near_db import NearCache
 from .redis_db import RedisCache
+from .single_flight import RedisSingleFlight, single_flight
 
 
 class RedisConnectionError(Exception):
     pass
 
 
+def get_redis_cache() -> RedisCache:
+    """Возвращает подключение к Redis из настроек приложения."""
+    if RedisCache is None:
+        logger.error("Redis is not initialized")
+        raise RedisConnectionError("Redis client has not been initialized.")
+    logger.info("Redis is initialized")
+    return RedisCache(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD,
+    )
+
+
 def get_cache() -> AbstractCache:
     """Возвращает кэш в зависимости от настроек приложения."""
     if settings.REDIS_HOST:
-        if RedisCache is None:
-            logger.error("Redis is not initialized")
-            raise RedisConnectionError("Redis client has not been initialized.")
-        logger.info("Redis is initialized")
-        return RedisCache(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            db=settings.REDIS_DB,
-            password=settings.REDIS_PASSWORD,
-        )
+        if settings.CACHE_NEAR_ENABLED:
+            cache = NearCache(
+                get_redis_cache(),
+                ttl=settings.CACHE_NEAR_TTL_SEC,
+                max_entries=settings.CACHE_NEAR_MAX_ENTRIES,
+                max_bytes=settings.CACHE_NEAR_MAX_BYTES,
+            )
+            metrics.register("near_cache", cache.stats)
+            return cache
+        return get_redis_cache()
     else:
         return InMemoryCache()
 
 
+_distributed_flight: RedisSingleFlight | None = None
+
+
+def get_distributed_flight() -> RedisSingleFlight | None:
+    """Возвращает межпроцессное объединение вычислений, если настроен Redis."""
+    if not settings.REDIS_HOST:
+        return None
+    global _distributed_flight
+    if _distributed_flight is None:
+        _distributed_flight = RedisSingleFlight(
+            get_redis_cache().client,
+            lock_timeout=settings.CACHE_LOCK_TIMEOUT_SEC,
+            wait_timeout=settings.CACHE_LOCK_WAIT_SEC,
+        )
+        metrics.register("distributed_flight", _distributed_flight.stats)
+    return _distributed_flight
+
+
+_refreshing: dict[str, asyncio.Task] = {}
+
+
+def _refresh_in_background(
+    key: str, load: Callable[[], Awaitable[Any]], flight: RedisSingleFlight | None
+) -> None:
+    """Запускает фоновое обновление ключа, не более одного на ключ в процессе."""
+    if key in _refreshing:
+        return
+
+    async def refresh() -> None:
+        try:
+            if flight is None:
+                await single_flight.do(key, load)
+            else:
+                # значение уже есть, ждать чужую блокировку не нужно
+                await single_flight.do(key, lambda: flight.do(key, load, probe=noop))
+        except Exception as e:
+            logger.warning("Background refresh of {} failed: {}", key, e)
+        finally:
+            _refreshing.pop(key, None)
+
+    async def noop() -> bool:
+        return True
+
+    _refreshing[key] = asyncio.create_task(refresh())
+
+
+async def get_or_set(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    timeout: int,
+    cache: AbstractCache | None = None,
+    distributed: bool = False,
+    stale_timeout: int = 0,
+    refresher: Callable[[], Awaitable[Any]] | None = None,
+    raw: bool = False,
+) -> Any:
+    """
+    Читает значение из кэша, а при промахе вычисляет его один раз на ключ.
+
+    Одновременные промахи по одному ключу ждут единственного вызова `loader`.
+    С `distributed=True` вычисление объединяется еще и между воркерами через
+    блокировку в Redis.
+
+    Если задан `stale_timeout`, значение живет в кэше `timeout + stale_timeout`
+    секунд. Последние `stale_timeout` секунд оно отдается сразу как устаревшее, а
+    одна фоновая задача вычисляет новое. Фоновая задача переживает запрос, поэтому
+    `refresher` не должен использовать ресурсы запроса (например, его сессию БД).
+
+    :param key: Ключ кэша.
+    :param loader: Функция вычисления значения.
+    :param timeout: Время жизни свежего значения.
+    :param cache: Кэш, по умолчанию из `get_cache`.
+    :param distributed: Объединять вычисление между процессами.
+    :param stale_timeout: Сколько секунд отдавать устаревшее значение.
+    :param refresher: Функция фонового обновления, по умолчанию `loader`.
+    :param raw: Хранить байты `loader` как есть, без `dump_value`/`load_value`.
+    :return: Значение из кэша или результат `loader`.
+    """
+    cache = cache or get_cache()
+    flight = get_distributed_flight() if distributed else None
+    if raw:
+        get, get_with_ttl, set_ = cache.get_raw, cache.get_raw_with_ttl, cache.set_raw
+    else:
+        get, get_with_ttl, set_ = cache.get, cache.get_with_ttl, cache.set
+
+    def loading(func: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+        async def load() -> Any:
+            result = await func()
+            if result is not None:
+                await set_(key, result, timeout, stale_timeout)
+            return result
+
+        return load
+
+    if stale_timeout:
+        value, ttl = await get_with_ttl(key)
+        if value is not None:
+            if ttl is not None and ttl <= stale_timeout:
+                _refresh_in_background(key, loading(refresher or loader), flight)
+            return value
+    else:
+        value = await get(key)
+        if value is not None:
+            return value
+
+    load = loading(loader)
+    if flight is None:
+        return await single_flight.do(key, load)
+    return await single_flight.do(
+        key, lambda: flight.do(key, load, probe=lambda: get(key))
+    )
+
+
 def cached(
     timeout: int,
     key: str | None = None,
     variable_positions: list[int] | None = None,
     delimiter: str = ":",
+    distributed: bool = False,
+    stale_timeout: int = 0,
 ) -> Callable[..., Any]:
     """
     Декоратор кэширования функции.
 
+    Одновременные промахи по одному ключу выполняют функцию один раз.
+
     :param timeout: Время жизни кэш.
     :param key: Ключ кэша, если не указан будет взято имя функции.
     :param variable_positions: Список позиций аргументов, которые будут добавлены в ключ
         через str().
     :param delimiter: Разделитель позиций аргументов.
+    :param distributed: Объединять вычисление между процессами через Redis.
+    :param stale_timeout: Сколько секунд после `timeout` отдавать устаревшее значение,
+        обновляя его в фоне. Функция тогда вызывается и вне запроса.
     :return: Декоратор функции.
     """
 
@@ -62,13 +200,13 @@ def cached(
                         values = list(kwargs.values())
                         cache_key += delimiter + str(values[pos - len(args) - 1])
 
-            cache = get_cache()
-            value = await cache.get(cache_key)
-            if value is not None:
-                return value
-            value = await func(*args, **kwargs)
-            await cache.set(cache_key, value, timeout)
-            return value
+            return await get_or_set(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                timeout,
+                distributed=distributed,
+                stale_timeout=stale_timeout,
+            )
 
         return wrapper
 
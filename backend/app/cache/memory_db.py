@@ -1,55 +1,248 @@
-from datetime import datetime, timedelta
-from typing import TypedDict
+import asyncio
+import heapq
+import time
+from collections import OrderedDict
 
 from loguru import logger
 
+from core import metrics
+from core.config import settings
 from utils import singleton
-from .base import AbstractCache, SchemaType
-
-
-class _ValueType(TypedDict):
-    data: SchemaType
-    expires: datetime
+from .base import AbstractCache, jittered
+
+
+def namespace_of(key: str, delimiter: str = ":") -> str:
+    """Пространство имен ключа — часть до первого разделителя."""
+    return key.split(delimiter, 1)[0]
+
+
+class BoundedLRU:
+    """
+    LRU-хранилище сериализованных значений с ограничением по числу записей и байтам.
+
+    Срок жизни считается по `time.monotonic`, поэтому не зависит от перевода часов.
+    Истекшие записи удаляются при чтении и методом `reap`, который проходит только по
+    истекшим записям (куча сроков), а не по всему кэшу.
+    Индекс пространств имен позволяет удалять ключи по префиксу без полного перебора.
+    """
+
+    def __init__(self, max_entries: int = 10_000, max_bytes: int = 64 << 20) -> None:
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._data: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._expiry: list[tuple[float, str]] = []
+        self._namespaces: dict[str, set[str]] = {}
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_entry(self, key: str) -> tuple[bytes, float] | None:
+        """Возвращает значение и срок его истечения (по `time.monotonic`)."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[1] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def get(self, key: str) -> bytes | None:
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def set(self, key: str, value: bytes, timeout: float) -> None:
+        if len(value) > self._max_bytes:
+            self.delete(key)
+            return
+        expires = time.monotonic() + timeout
+        if key in self._data:
+            self._bytes -= len(self._data[key][0])
+        else:
+            self._namespaces.setdefault(namespace_of(key), set()).add(key)
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        self._bytes += len(value)
+        heapq.heappush(self._expiry, (expires, key))
+        self._evict()
+
+    def delete(self, key: str) -> bool:
+        if key not in self._data:
+            return False
+        self._remove(key)
+        return True
+
+    def delete_prefix(self, prefix: str) -> int:
+        namespace = namespace_of(prefix)
+        if namespace != prefix:
+            namespaces = [namespace] if namespace in self._namespaces else []
+        else:
+            # префикс без разделителя может покрывать несколько пространств имен
+            namespaces = [ns for ns in self._namespaces if ns.startswith(prefix)]
+        keys = [
+            key
+            for ns in namespaces
+            for key in self._namespaces[ns]
+            if key.startswith(prefix)
+        ]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def reap(self) -> int:
+        """Удаляет истекшие записи и возвращает их количество."""
+        now = time.monotonic()
+        removed = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            expires, key = heapq.heappop(self._expiry)
+            entry = self._data.get(key)
+            # в куче могут остаться сроки перезаписанных ключей
+            if entry is not None and entry[1] == expires:
+                self._remove(key)
+                removed += 1
+        # куча не должна разрастаться из-за перезаписей
+        if len(self._expiry) > 2 * len(self._data) + 1024:
+            self._expiry = [(entry[1], key) for key, entry in self._data.items()]
+            heapq.heapify(self._expiry)
+        self.expirations += removed
+        return removed
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._expiry.clear()
+        self._namespaces.clear()
+        self._bytes = 0
+
+    def _evict(self) -> None:
+        while self._data and (
+            len(self._data) > self._max_entries or self._bytes > self._max_bytes
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        value, _ = self._data.pop(key)
+        self._bytes -= len(value)
+        namespace = namespace_of(key)
+        keys = self._namespaces.get(namespace)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._namespaces[namespace]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self._max_entries,
+            "max_bytes": self._max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
 
 
 @singleton
 class InMemoryCache(AbstractCache):
     """Кэш данных в памяти."""
 
-    def __init__(self) -> None:
-        self._cache: dict[str, _ValueType] = {}
+    def __init__(
+        self,
+        max_entries: int = settings.CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.CACHE_MAX_BYTES,
+        reaper_interval: float = settings.CACHE_REAPER_INTERVAL_SEC,
+    ) -> None:
+        self._cache = BoundedLRU(max_entries=max_entries, max_bytes=max_bytes)
+        self._reaper_interval = reaper_interval
+        self._reaper: asyncio.Task | None = None
+        metrics.register("cache", self._cache.stats)
+
+    async def get_raw(self, key: str) -> bytes | None:
+        logger.debug(f"Get from cache {key}", key=key)
+
+        return self._cache.get(key)
 
-    async def get(self, key: str) -> SchemaType | None:
+    async def get_raw_with_ttl(self, key: str) -> tuple[bytes | None, float | None]:
         logger.debug(f"Get from cache {key}", key=key)
 
-        if value := self._cache.get(key, None):
-            if value["expires"] > datetime.now():
-                return value["data"]
-            else:
-                await self.delete(key)
-        return None
+        if entry := self._cache.get_entry(key):
+            return entry[0], entry[1] - time.monotonic()
+        return None, None
+
+    async def get_raw_many(self, keys: list[str]) -> list[bytes | None]:
+        logger.debug(f"Get many from cache {keys}", keys=keys)
 
-    async def set(self, key: str, value: SchemaType, timeout: int) -> None:
+        return [self._cache.get(key) for key in keys]
+
+    async def get_raw_many_with_ttl(
+        self, keys: list[str]
+    ) -> list[tuple[bytes | None, float | None]]:
+        logger.debug(f"Get many from cache {keys}", keys=keys)
+
+        now = time.monotonic()
+        entries = [self._cache.get_entry(key) for key in keys]
+        return [(e[0], e[1] - now) if e else (None, None) for e in entries]
+
+    async def set_raw(
+        self, key: str, value: bytes, timeout: int, stale_timeout: int = 0
+    ) -> None:
         logger.debug(f"Set to cache {key}", key=key)
 
-        if isinstance(value, list):
-            data = [_.model_dump() for _ in value]
-        else:
-            data = value.model_dump()
+        timeout = jittered(timeout, settings.CACHE_TTL_JITTER) + stale_timeout
+        self._cache.set(key, value, timeout)
 
-        self._cache[key] = {
-            "data": data,
-            "expires": datetime.now() + timedelta(seconds=timeout),
-        }
+    async def set_raw_many(
+        self, items: dict[str, bytes], timeout: int, stale_timeout: int = 0
+    ) -> None:
+        logger.debug(f"Set many to cache {list(items)}", keys=list(items))
+
+        for key, value in items.items():
+            ttl = jittered(timeout, settings.CACHE_TTL_JITTER) + stale_timeout
+            self._cache.set(key, value, ttl)
 
     async def delete(self, key: str) -> None:
         logger.debug(f"Delete_ from cache {key}", key=key)
 
-        self._cache.pop(key, None)
+        self._cache.delete(key)
+
+    async def delete_many(self, keys: list[str]) -> None:
+        logger.debug(f"Delete many from cache {keys}", keys=keys)
+
+        for key in keys:
+            self._cache.delete(key)
 
     async def delete_namespace(self, prefix: str) -> None:
         logger.debug(f"Delete namespace from cache {prefix}", prefix=prefix)
 
-        for key in list(self._cache.keys()):
-            if key.startswith(prefix):
-                self._cache.pop(key, None)
+        self._cache.delete_prefix(prefix)
+
+    async def _reap(self) -> None:
+        while True:
+            await asyncio.sleep(self._reaper_interval)
+            if removed := self._cache.reap():
+                logger.debug("Reaped {} expired cache entries", removed)
+
+    async def start(self) -> None:
+        if self._reaper is None and self._reaper_interval > 0:
+            self._reaper = asyncio.create_task(self._reap())
+
+    async def stop(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
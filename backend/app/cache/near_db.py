@@ -0,0 +1,222 @@
+import asyncio
+import struct
+import time
+import uuid
+
+import orjson
+from loguru import logger
+
+from core.config import settings
+from utils import singleton
+from .base import AbstractCache, jittered
+from .memory_db import BoundedLRU
+from .redis_db import RedisCache
+
+_DEADLINE = struct.Struct("d")
+
+
+@singleton
+class NearCache(AbstractCache):
+    """
+    Двухуровневый кэш: локальная память воркера (L1) перед Redis (L2).
+
+    Чтение сначала идет в L1 и только при промахе — в Redis. Любая запись или удаление
+    публикуется в канал Redis, и все остальные воркеры/узлы вытесняют этот ключ из
+    своего L1. При потере подписки L1 очищается целиком, так как сообщения за время
+    разрыва могли быть пропущены.
+    """
+
+    def __init__(
+        self,
+        remote: RedisCache,
+        ttl: int = 30,
+        max_entries: int = 1_000,
+        max_bytes: int = 8 << 20,
+        channel: str = "cache:invalidate",
+    ) -> None:
+        self._remote = remote
+        self._redis = remote.client
+        self._subscriber = remote.subscriber()
+        self._local = BoundedLRU(max_entries=max_entries, max_bytes=max_bytes)
+        self._ttl = ttl
+        self._channel = channel
+        self._node = uuid.uuid4().hex
+        self._listener: asyncio.Task | None = None
+        self._invalidations = 0
+
+    async def get_raw(self, key: str) -> bytes | None:
+        return (await self.get_raw_with_ttl(key))[0]
+
+    async def get_raw_with_ttl(self, key: str) -> tuple[bytes | None, float | None]:
+        logger.debug(f"Get from cache {key}", key=key)
+
+        if (local := self._local.get(key)) is not None:
+            # перед значением хранится срок жизни записи в Redis
+            (deadline,) = _DEADLINE.unpack_from(local)
+            return local[_DEADLINE.size :], deadline - time.monotonic()
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            value, pttl = await pipe.execute()
+        if value is None:
+            return None, None
+        remote_ttl = pttl / 1000 if pttl >= 0 else None
+        self._set_local(key, value, remote_ttl)
+        return value, remote_ttl
+
+    async def get_raw_many(self, keys: list[str]) -> list[bytes | None]:
+        return [value for value, _ in await self.get_raw_many_with_ttl(keys)]
+
+    async def get_raw_many_with_ttl(
+        self, keys: list[str]
+    ) -> list[tuple[bytes | None, float | None]]:
+        logger.debug(f"Get many from cache {keys}", keys=keys)
+
+        now = time.monotonic()
+        entries: list[tuple[bytes | None, float | None]] = [(None, None)] * len(keys)
+        missing: list[int] = []
+        for i, key in enumerate(keys):
+            if (local := self._local.get(key)) is not None:
+                (deadline,) = _DEADLINE.unpack_from(local)
+                entries[i] = local[_DEADLINE.size :], deadline - now
+            else:
+                missing.append(i)
+        if not missing:
+            return entries
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.mget([keys[i] for i in missing])
+            for i in missing:
+                pipe.pttl(keys[i])
+            remote, *pttls = await pipe.execute()
+        for i, value, pttl in zip(missing, remote, pttls):
+            if value is not None:
+                remote_ttl = pttl / 1000 if pttl >= 0 else None
+                self._set_local(keys[i], value, remote_ttl)
+                entries[i] = value, remote_ttl
+        return entries
+
+    async def set_raw(
+        self, key: str, value: bytes, timeout: int, stale_timeout: int = 0
+    ) -> None:
+        logger.debug(f"Set to cache {key}", key=key)
+
+        timeout = jittered(timeout, settings.CACHE_TTL_JITTER) + stale_timeout
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(key, value, ex=timeout)
+            pipe.publish(self._channel, self._message(key=key))
+            await pipe.execute()
+        self._set_local(key, value, timeout)
+
+    async def set_raw_many(
+        self, items: dict[str, bytes], timeout: int, stale_timeout: int = 0
+    ) -> None:
+        logger.debug(f"Set many to cache {list(items)}", keys=list(items))
+
+        if not items:
+            return
+        ttls = {
+            key: jittered(timeout, settings.CACHE_TTL_JITTER) + stale_timeout
+            for key in items
+        }
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(key, value, ex=ttls[key])
+            pipe.publish(self._channel, self._message(keys=list(items)))
+            await pipe.execute()
+        for key, value in items.items():
+            self._set_local(key, value, ttls[key])
+
+    def _set_local(self, key: str, data: bytes, remote_ttl: float | None) -> None:
+        # L1 не должен пережить запись в Redis
+        if remote_ttl is None:
+            remote_ttl = self._ttl
+        deadline = time.monotonic() + remote_ttl
+        self._local.set(
+            key, _DEADLINE.pack(deadline) + data, min(self._ttl, remote_ttl)
+        )
+
+    async def delete(self, key: str) -> None:
+        logger.debug(f"Delete_ from cache {key}", key=key)
+
+        self._local.delete(key)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.delete(key)
+            pipe.publish(self._channel, self._message(key=key))
+            await pipe.execute()
+
+    async def delete_many(self, keys: list[str]) -> None:
+        logger.debug(f"Delete many from cache {keys}", keys=keys)
+
+        if not keys:
+            return
+        for key in keys:
+            self._local.delete(key)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.unlink(*keys)
+            pipe.publish(self._channel, self._message(keys=keys))
+            await pipe.execute()
+
+    async def delete_namespace(self, prefix: str) -> None:
+        logger.debug(f"Delete namespace from cache {prefix}", prefix=prefix)
+
+        self._local.delete_prefix(prefix)
+        await self._remote.delete_namespace(prefix)
+        await self._redis.publish(self._channel, self._message(prefix=prefix))
+
+    def _message(self, **payload: str | list[str]) -> bytes:
+        return orjson.dumps({"node": self._node, **payload})
+
+    def _invalidate(self, data: bytes) -> None:
+        message = orjson.loads(data)
+        if message.get("node") == self._node:
+            return
+        self._invalidations += 1
+        if key := message.get("key"):
+            self._local.delete(key)
+        elif keys := message.get("keys"):
+            for key in keys:
+                self._local.delete(key)
+        elif prefix := message.get("prefix"):
+            self._local.delete_prefix(prefix)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self._subscriber.pubsub(
+                    ignore_subscribe_messages=True
+                ) as pubsub:
+                    await pubsub.subscribe(self._channel)
+                    while True:
+                        # короче socket_timeout пула, чтобы тишина в канале не
+                        # считалась обрывом соединения
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message and message["type"] == "message":
+                            self._invalidate(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Cache invalidation channel failed {}", e)
+            # пока подписки нет, L1 мог устареть
+            self._local.clear()
+            await asyncio.sleep(1)
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+            await self._subscriber.connection_pool.disconnect()
+
+    def stats(self) -> dict:
+        return {**self._local.stats(), "invalidations": self._invalidations}
@@ -1,9 +1,12 @@
-import orjson
 from loguru import logger
 from redis.asyncio import Redis, ConnectionPool
 
+from core.config import settings
 from utils import singleton
-from .base import AbstractCache, SchemaType
+from .base import AbstractCache, jittered
+
+# сколько ключей удалять одной командой UNLINK
+_SCAN_BATCH = 500
 
 
 @singleton
@@ -29,36 +32,111 @@ class RedisCache(AbstractCache):
         )
         self._redis = Redis(connection_pool=self._pool)
 
-    async def get(self, key: str) -> SchemaType | None:
+    @property
+    def client(self) -> Redis:
+        """Клиент Redis на общем пуле соединений (для других хранилищ)."""
+        return self._redis
+
+    def subscriber(self) -> Redis:
+        """
+        Отдельный клиент с одним соединением для подписки pub/sub.
+
+        Подписка держит соединение все время, пока активна; на общем пуле она
+        занимала бы одно из `max_connections` соединений для команд.
+        """
+        pool = self._redis.connection_pool
+        return Redis(
+            connection_pool=ConnectionPool(
+                connection_class=pool.connection_class,
+                max_connections=1,
+                **pool.connection_kwargs,
+            )
+        )
+
+    async def get_raw(self, key: str) -> bytes | None:
+        logger.debug(f"Get from cache {key}", key=key)
+
+        return await self._redis.get(key)
+
+    async def get_raw_with_ttl(self, key: str) -> tuple[bytes | None, float | None]:
         logger.debug(f"Get from cache {key}", key=key)
 
-        value = await self._redis.get(key)
-        if value is not None:
-            return orjson.loads(value)
-        return None
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            value, pttl = await pipe.execute()
+        if value is None:
+            return None, None
+        return value, pttl / 1000 if pttl >= 0 else None
 
-    async def set(self, key: str, value: SchemaType, expire: int) -> None:
+    async def get_raw_many(self, keys: list[str]) -> list[bytes | None]:
+        logger.debug(f"Get many from cache {keys}", keys=keys)
+
+        if not keys:
+            return []
+        return await self._redis.mget(keys)
+
+    async def get_raw_many_with_ttl(
+        self, keys: list[str]
+    ) -> list[tuple[bytes | None, float | None]]:
+        logger.debug(f"Get many from cache {keys}", keys=keys)
+
+        if not keys:
+            return []
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.mget(keys)
+            for key in keys:
+                pipe.pttl(key)
+            values, *pttls = await pipe.execute()
+        return [
+            (value, pttl / 1000 if pttl >= 0 else None)
+            if value is not None
+            else (None, None)
+            for value, pttl in zip(values, pttls)
+        ]
+
+    async def set_raw(
+        self, key: str, value: bytes, timeout: int, stale_timeout: int = 0
+    ) -> None:
         logger.debug(f"Set to cache {key}", key=key)
 
-        if isinstance(value, list):
-            data = [_.model_dump() for _ in value]
-        else:
-            data = value.model_dump()
+        timeout = jittered(timeout, settings.CACHE_TTL_JITTER) + stale_timeout
+        await self._redis.set(key, value, ex=timeout)
 
-        if isinstance(data, dict) or isinstance(data, list):
-            data = orjson.dumps(data)
+    async def set_raw_many(
+        self, items: dict[str, bytes], timeout: int, stale_timeout: int = 0
+    ) -> None:
+        logger.debug(f"Set many to cache {list(items)}", keys=list(items))
 
-        await self._redis.set(key, data, ex=expire)
+        if not items:
+            return
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                ttl = jittered(timeout, settings.CACHE_TTL_JITTER) + stale_timeout
+                pipe.set(key, value, ex=ttl)
+            await pipe.execute()
 
     async def delete(self, key: str) -> None:
         logger.debug(f"Delete_ from cache {key}", key=key)
         await self._redis.delete(key)
 
+    async def delete_many(self, keys: list[str]) -> None:
+        logger.debug(f"Delete many from cache {keys}", keys=keys)
+
+        if keys:
+            await self._redis.unlink(*keys)
+
     async def clear(self) -> None:
         logger.debug("Clear cache")
         await self._redis.flushdb(asynchronous=True)
 
     async def delete_namespace(self, prefix: str) -> None:
         logger.debug(f"Delete namespace from cache {prefix}", prefix=prefix)
-        async for key in self._redis.scan_iter(f"{prefix}*"):
-            await self._redis.delete(key)
+        batch = []
+        async for key in self._redis.scan_iter(f"{prefix}*", count=_SCAN_BATCH):
+            batch.append(key)
+            if len(batch) >= _SCAN_BATCH:
+                await self._redis.unlink(*batch)
+                batch = []
+        if batch:
+            await self._redis.unlink(*batch)
@@ -0,0 +1,374 @@
+import asyncio
+import hashlib
+import math
+import time
+from abc import ABC, abstractmethod
+
+from loguru import logger
+
+from utils import singleton
+from .redis_db import RedisCache
+
+
+class BloomFilter:
+    """
+    Фильтр Блума для строковых ключей.
+
+    Ключ хешируется один раз (blake2b), позиции битов получаются двойным хешированием.
+    Ложноотрицательных ответов не бывает, ложноположительные — с долей `error_rate`
+    при заполнении до `capacity`.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.capacity = capacity
+        self._size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self._hashes):
+            yield (h1 + i * h2) % self._size
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key)
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+def user_key(user_id: int) -> str:
+    """Ключ фильтра и журнала для отзыва всех токенов пользователя."""
+    return f"user:{user_id}"
+
+
+class AbstractRevocationStore(ABC):
+    """
+    Авторитетный список отозванных токенов (`jti`) и пользователей с журналом
+    изменений.
+
+    Журнал и снимок возвращают ключи фильтра: `jti` отозванных токенов и
+    `user_key(id)` пользователей, у которых отозваны все ранее выданные токены.
+    """
+
+    @abstractmethod
+    async def add(self, jti: str, ttl: int) -> None:
+        """Отзывает токен на оставшийся срок его жизни."""
+        pass
+
+    @abstractmethod
+    async def claim(self, jti: str, ttl: int) -> bool:
+        """
+        Атомарно отзывает токен, если он еще не отозван.
+
+        Возвращает False, если токен уже был отозван (одноразовую ссылку уже
+        использовали).
+        """
+        pass
+
+    @abstractmethod
+    async def contains(self, jti: str) -> bool:
+        """Точная проверка, отозван ли токен."""
+        pass
+
+    @abstractmethod
+    async def set_not_before(self, user_id: int, timestamp: float, ttl: int) -> None:
+        """Отзывает токены пользователя, выданные раньше `timestamp` (unix time)."""
+        pass
+
+    @abstractmethod
+    async def not_before(self, user_id: int) -> float | None:
+        """Момент, раньше которого выданные токены пользователя недействительны."""
+        pass
+
+    @abstractmethod
+    async def changes(self, cursor: str | None) -> tuple[list[str], str | None]:
+        """Возвращает токены, отозванные после `cursor`, и новый курсор."""
+        pass
+
+    @abstractmethod
+    async def snapshot(self) -> tuple[list[str], str | None]:
+        """Возвращает все действующие отзывы и курсор журнала на момент снимка."""
+        pass
+
+
+@singleton
+class InMemoryRevocationStore(AbstractRevocationStore):
+    """Отзывы в памяти процесса (только для тестов: не общие для воркеров)."""
+
+    def __init__(self) -> None:
+        self._revoked: dict[str, float] = {}
+        self._not_before: dict[int, tuple[float, float]] = {}
+        self._log: list[str] = []
+
+    async def add(self, jti: str, ttl: int) -> None:
+        self._revoked[jti] = time.monotonic() + ttl
+        self._log.append(jti)
+
+    async def claim(self, jti: str, ttl: int) -> bool:
+        if await self.contains(jti):
+            return False
+        await self.add(jti, ttl)
+        return True
+
+    async def contains(self, jti: str) -> bool:
+        if expires := self._revoked.get(jti):
+            if expires > time.monotonic():
+                return True
+            del self._revoked[jti]
+        return False
+
+    async def set_not_before(self, user_id: int, timestamp: float, ttl: int) -> None:
+        self._not_before[user_id] = (timestamp, time.monotonic() + ttl)
+        self._log.append(user_key(user_id))
+
+    async def not_before(self, user_id: int) -> float | None:
+        if entry := self._not_before.get(user_id):
+            timestamp, expires = entry
+            if expires > time.monotonic():
+                return timestamp
+            del self._not_before[user_id]
+        return None
+
+    async def changes(self, cursor: str | None) -> tuple[list[str], str | None]:
+        start = int(cursor or 0)
+        return self._log[start:], str(len(self._log))
+
+    async def snapshot(self) -> tuple[list[str], str | None]:
+        now = time.monotonic()
+        self._revoked = {k: v for k, v in self._revoked.items() if v > now}
+        self._not_before = {k: v for k, v in self._not_before.items() if v[1] > now}
+        self._log = list(self._revoked) + [user_key(k) for k in self._not_before]
+        return list(self._log), str(len(self._log))
+
+
+@singleton
+class RedisRevocationStore(AbstractRevocationStore):
+    """
+    Отзывы в Redis.
+
+    Каждый отзыв — ключ `revoked:jti:<jti>` (или `revoked:user:<id>` с моментом
+    отзыва токенов пользователя) с TTL до истечения токенов и запись в поток
+    `revoked:log`, из которого воркеры инкрементально дочитывают изменения.
+    """
+
+    def __init__(
+        self, cache: RedisCache, prefix: str = "revoked", max_log: int = 100_000
+    ) -> None:
+        self._redis = cache.client
+        self._prefix = prefix
+        self._stream = f"{prefix}:log"
+        self._max_log = max_log
+
+    def _key(self, jti: str) -> str:
+        return f"{self._prefix}:jti:{jti}"
+
+    def _user_key(self, user_id: int) -> str:
+        return f"{self._prefix}:{user_key(user_id)}"
+
+    async def _add(self, key: str, value: str | int, ttl: int, log: str) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(key, value, ex=ttl)
+            self._log(pipe, log)
+            await pipe.execute()
+
+    def _log(self, pipe, log: str) -> None:
+        # поле называется jti, но содержит любой ключ фильтра
+        pipe.xadd(self._stream, {"jti": log}, maxlen=self._max_log, approximate=True)
+
+    async def add(self, jti: str, ttl: int) -> None:
+        await self._add(self._key(jti), 1, ttl, jti)
+
+    async def claim(self, jti: str, ttl: int) -> bool:
+        if not await self._redis.set(self._key(jti), 1, ex=ttl, nx=True):
+            return False
+        async with self._redis.pipeline(transaction=False) as pipe:
+            self._log(pipe, jti)
+            await pipe.execute()
+        return True
+
+    async def contains(self, jti: str) -> bool:
+        return bool(await self._redis.exists(self._key(jti)))
+
+    async def set_not_before(self, user_id: int, timestamp: float, ttl: int) -> None:
+        await self._add(
+            self._user_key(user_id), repr(timestamp), ttl, user_key(user_id)
+        )
+
+    async def not_before(self, user_id: int) -> float | None:
+        value = await self._redis.get(self._user_key(user_id))
+        return float(value) if value is not None else None
+
+    async def changes(self, cursor: str | None) -> tuple[list[str], str | None]:
+        start = f"({cursor}" if cursor else "-"
+        entries = await self._redis.xrange(self._stream, min=start, count=1000)
+        if not entries:
+            return [], cursor
+        jtis = [fields[b"jti"].decode() for _, fields in entries]
+        return jtis, entries[-1][0].decode()
+
+    async def snapshot(self) -> tuple[list[str], str | None]:
+        # курсор берется до сканирования: отзывы во время сканирования придут
+        # повторно из журнала, что для фильтра безопасно
+        last = await self._redis.xrevrange(self._stream, count=1)
+        cursor = last[0][0].decode() if last else None
+        offset = len(self._key(""))
+        keys = [
+            key.decode()[offset:]
+            async for key in self._redis.scan_iter(self._key("*"), count=1000)
+        ]
+        offset = len(f"{self._prefix}:")
+        keys += [
+            key.decode()[offset:]
+            async for key in self._redis.scan_iter(self._user_key("*"), count=1000)
+        ]
+        return keys, cursor
+
+
+@singleton
+class TokenRevocationList:
+    """
+    Проверка отзыва токенов с локальным фильтром Блума.
+
+    Для неотозванного токена проверка — одно обращение к фильтру в памяти.
+    Только если фильтр отвечает «возможно», выполняется точная проверка в хранилище.
+    Фильтр каждого воркера периодически дочитывает журнал отзывов, поэтому отзыв на
+    другом воркере становится виден не позже чем через интервал синхронизации.
+    """
+
+    def __init__(
+        self,
+        store: AbstractRevocationStore,
+        capacity: int = 100_000,
+        error_rate: float = 0.001,
+    ) -> None:
+        self._store = store
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._filter = BloomFilter(capacity, error_rate)
+        self._cursor: str | None = None
+        self._synced = False
+        self._task: asyncio.Task | None = None
+
+        self._checks = 0
+        self._maybe = 0
+        self._false_positives = 0
+
+    async def is_revoked(self, jti: str | None) -> bool:
+        if jti is None:
+            return False
+        self._checks += 1
+        if jti not in self._filter:
+            return False
+        self._maybe += 1
+        if await self._store.contains(jti):
+            return True
+        self._false_positives += 1
+        return False
+
+    async def revoke(self, jti: str | None, exp: int) -> None:
+        """Отзывает токен до момента `exp` (unix time)."""
+        ttl = int(exp - time.time()) + 1
+        if jti is None or ttl <= 0:
+            return
+        await self._store.add(jti, ttl)
+        self._filter.add(jti)
+
+    async def claim(self, jti: str | None, exp: int) -> bool:
+        """
+        Отзывает токен до момента `exp`, если он еще не отозван (одноразовые
+        токены).
+
+        Возвращает False, если токен уже отозван, истек или не имеет `jti`.
+        """
+        ttl = int(exp - time.time()) + 1
+        if jti is None or ttl <= 0 or not await self._store.claim(jti, ttl):
+            return False
+        self._filter.add(jti)
+        return True
+
+    async def revoke_user(self, user_id: int, ttl: int) -> None:
+        """
+        Отзывает все токены пользователя, выданные до текущего момента.
+
+        Запись хранится `ttl` секунд — не меньше срока жизни access-токена, после
+        этого все старые токены истекают сами.
+        """
+        await self._store.set_not_before(user_id, time.time(), ttl)
+        self._filter.add(user_key(user_id))
+
+    async def is_user_revoked(self, user_id: int, issued_at: float | None) -> bool:
+        """Отозван ли токен пользователя, выданный в момент `issued_at`."""
+        self._checks += 1
+        if user_key(user_id) not in self._filter:
+            return False
+        self._maybe += 1
+        if (not_before := await self._store.not_before(user_id)) is None:
+            self._false_positives += 1
+            return False
+        # токен без iat выдан до появления отзыва по пользователю
+        return issued_at is None or issued_at < not_before
+
+    async def rebuild(self) -> None:
+        """Пересобирает фильтр по действующим отзывам (истекшие выпадают)."""
+        jtis, cursor = await self._store.snapshot()
+        bloom = BloomFilter(max(self._capacity, len(jtis) * 2), self._error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        self._filter, self._cursor, self._synced = bloom, cursor, True
+        logger.debug("Revocation filter rebuilt with {} tokens", len(jtis))
+
+    async def sync(self) -> None:
+        """Дочитывает новые отзывы из журнала хранилища."""
+        if not self._synced or self._filter.count > self._filter.capacity:
+            await self.rebuild()
+            return
+        while True:
+            jtis, cursor = await self._store.changes(self._cursor)
+            for jti in jtis:
+                self._filter.add(jti)
+            if cursor == self._cursor or not jtis:
+                self._cursor = cursor
+                break
+            self._cursor = cursor
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error("Revocation sync failed {}", e)
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "filter_tokens": self._filter.count,
+            "filter_bytes": self._filter.nbytes,
+            "checks": self._checks,
+            "maybe": self._maybe,
+            "false_positives": self._false_positives,
+        }
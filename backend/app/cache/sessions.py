@@ -0,0 +1,148 @@
+import time
+from abc import ABC, abstractmethod
+
+from loguru import logger
+
+from utils import singleton
+from .redis_db import RedisCache
+
+
+class AbstractSessionStore(ABC):
+    """
+    Хранилище refresh-сессий.
+
+    Сессия `sid` принадлежит пользователю и хранит идентификатор (`jti`) последнего
+    выданного refresh-токена. У пользователя может быть несколько сессий — по одной
+    на устройство.
+    """
+
+    @abstractmethod
+    async def create(self, user_id: int, sid: str, jti: str, ttl: int) -> None:
+        """Создает сессию с текущим refresh-токеном."""
+        pass
+
+    @abstractmethod
+    async def rotate(
+        self, user_id: int, sid: str, old_jti: str, new_jti: str, ttl: int
+    ) -> bool:
+        """
+        Атомарно заменяет refresh-токен сессии.
+
+        Возвращает False, если сессии нет или предъявлен не последний токен.
+        """
+        pass
+
+    @abstractmethod
+    async def revoke(self, user_id: int, sid: str) -> bool:
+        """Удаляет сессию. Возвращает False, если ее не было."""
+        pass
+
+    @abstractmethod
+    async def revoke_all(self, user_id: int) -> int:
+        """Удаляет все сессии пользователя и возвращает их количество."""
+        pass
+
+
+@singleton
+class InMemorySessionStore(AbstractSessionStore):
+    """Сессии в памяти процесса (только для тестов: не общие для воркеров)."""
+
+    def __init__(self) -> None:
+        self._sessions: dict[tuple[int, str], tuple[str, float]] = {}
+
+    def _get(self, user_id: int, sid: str) -> str | None:
+        if entry := self._sessions.get((user_id, sid)):
+            jti, expires = entry
+            if expires > time.monotonic():
+                return jti
+            del self._sessions[(user_id, sid)]
+        return None
+
+    async def create(self, user_id: int, sid: str, jti: str, ttl: int) -> None:
+        self._sessions[(user_id, sid)] = (jti, time.monotonic() + ttl)
+
+    async def rotate(
+        self, user_id: int, sid: str, old_jti: str, new_jti: str, ttl: int
+    ) -> bool:
+        if self._get(user_id, sid) != old_jti:
+            return False
+        self._sessions[(user_id, sid)] = (new_jti, time.monotonic() + ttl)
+        return True
+
+    async def revoke(self, user_id: int, sid: str) -> bool:
+        active = self._get(user_id, sid) is not None
+        self._sessions.pop((user_id, sid), None)
+        return active
+
+    async def revoke_all(self, user_id: int) -> int:
+        keys = [key for key in self._sessions if key[0] == user_id]
+        for key in keys:
+            del self._sessions[key]
+        return len(keys)
+
+
+# Сравнение и замена за одну операцию, чтобы два параллельных refresh одним и тем
+# же токеном не получили по новой паре.
+_ROTATE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+@singleton
+class RedisSessionStore(AbstractSessionStore):
+    """Сессии в Redis с TTL, на пуле соединений `RedisCache`."""
+
+    def __init__(self, cache: RedisCache, prefix: str = "refresh") -> None:
+        self._redis = cache.client
+        self._prefix = prefix
+        self._rotate = self._redis.register_script(_ROTATE_SCRIPT)
+
+    def _key(self, user_id: int, sid: str) -> str:
+        return f"{self._prefix}:{user_id}:{sid}"
+
+    def _index(self, user_id: int) -> str:
+        """Множество `sid` сессий пользователя (для `revoke_all` без SCAN)."""
+        return f"{self._prefix}:{user_id}"
+
+    async def create(self, user_id: int, sid: str, jti: str, ttl: int) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._key(user_id, sid), jti, ex=ttl)
+            pipe.sadd(self._index(user_id), sid)
+            # у всех сессий один срок, поэтому множество переживает самую позднюю
+            pipe.expire(self._index(user_id), ttl)
+            await pipe.execute()
+
+    async def rotate(
+        self, user_id: int, sid: str, old_jti: str, new_jti: str, ttl: int
+    ) -> bool:
+        return bool(
+            await self._rotate(
+                keys=[self._key(user_id, sid), self._index(user_id)],
+                args=[old_jti, new_jti, ttl],
+            )
+        )
+
+    async def revoke(self, user_id: int, sid: str) -> bool:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._key(user_id, sid))
+            pipe.srem(self._index(user_id), sid)
+            deleted, _ = await pipe.execute()
+        return bool(deleted)
+
+    async def revoke_all(self, user_id: int) -> int:
+        sids = await self._redis.smembers(self._index(user_id))
+        keys = [self._key(user_id, sid.decode()) for sid in sids]
+        async with self._redis.pipeline(transaction=True) as pipe:
+            if keys:
+                pipe.unlink(*keys)
+            pipe.unlink(self._index(user_id))
+            result = await pipe.execute()
+        # в множестве могут остаться sid уже истекших сессий
+        revoked = result[0] if keys else 0
+        logger.debug("Revoke {} sessions of user {}", revoked, user_id)
+        return revoked
@@ -0,0 +1,140 @@
+import asyncio
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from core import metrics
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """Ведущий запрос отменен до получения результата."""
+
+
+class SingleFlight:
+    """
+    Объединение одновременных вычислений одного ключа в пределах процесса.
+
+    Первый вызов по ключу выполняет функцию, остальные ждут его результата (или
+    исключения). Если ведущий запрос отменен (клиент отключился), ожидающие не
+    получают отмену, а повторяют попытку и один из них становится ведущим.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        while (future := self._calls.get(key)) is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        # исключение без ожидающих не должно попадать в лог как «не полученное»
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        self.leaders += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+# Удаление блокировки только ее владельцем
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisSingleFlight:
+    """
+    Объединение вычислений одного ключа между воркерами и узлами через блокировку в
+    Redis.
+
+    Владелец блокировки вычисляет значение и кладет его в кэш. Остальные опрашивают
+    кэш (`probe`) до появления значения. Если блокировка освободилась без результата
+    или ожидание превысило `wait_timeout`, значение вычисляется локально, чтобы
+    запрос не зависел от чужого упавшего воркера.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        lock_timeout: float = 10,
+        wait_timeout: float = 5,
+        poll_interval: float = 0.05,
+        prefix: str = "lock",
+    ) -> None:
+        self._redis = redis
+        self._lock_timeout = lock_timeout
+        self._wait_timeout = wait_timeout
+        self._poll_interval = poll_interval
+        self._prefix = prefix
+        self._release = redis.register_script(_RELEASE_SCRIPT)
+        self.acquired = 0
+        self.waited = 0
+
+    async def do(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[T]],
+        probe: Callable[[], Awaitable[Any]],
+    ) -> T:
+        lock_key = f"{self._prefix}:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self._wait_timeout
+        while True:
+            if await self._redis.set(
+                lock_key, token, nx=True, px=int(self._lock_timeout * 1000)
+            ):
+                self.acquired += 1
+                try:
+                    return await func()
+                finally:
+                    await self._release(keys=[lock_key], args=[token])
+
+            self.waited += 1
+            while await self._redis.exists(lock_key):
+                if time.monotonic() >= deadline:
+                    logger.warning("Lock wait timeout for {}", key)
+                    return await func()
+                await asyncio.sleep(self._poll_interval)
+                if (value := await probe()) is not None:
+                    return value
+            if (value := await probe()) is not None:
+                return value
+
+    def stats(self) -> dict:
+        return {"acquired": self.acquired, "waited": self.waited}
+
+
+single_flight: SingleFlight = SingleFlight()
+metrics.register("single_flight", single_flight.stats)
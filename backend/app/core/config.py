@@ -27,20 +27,62 @@ class Settings(BaseSettings):
     DB_ECHO: bool = False
     DB_FUTURE: bool = True
     DB_POOL_PRE_PING: bool = True
+    # проверять соединение, только если оно простаивало дольше N секунд
+    # (вместо проверки при каждой выдаче); 0 - выключено
+    DB_POOL_PRE_PING_IDLE_SEC: float = 0
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SEC: float = 30.0
+    # пересоздавать соединения старше N секунд; -1 - никогда
+    DB_POOL_RECYCLE_SEC: int = 1800
+    # сколько соединений открыть при старте приложения
+    DB_POOL_WARMUP: int = 5
     DB_SESSION_AUTOFLUSH: bool = False
     DB_SESSION_AUTOCOMMIT: bool = False
     DB_SESSION_EXPIRE_ON_COMMIT: bool = False
     DB_CONNECT_ARGS: dict = {}
+    # массовая запись: верхняя граница строк в одном INSERT (дополнительно
+    # ограничивается лимитом параметров СУБД)
+    DB_BULK_CHUNK_ROWS: int = 1000
+    # запросы дольше N миллисекунд пишутся в медленный лог; 0 - выключено
+    DB_SLOW_QUERY_MS: int = 200
+    # одинаковый запрос, повторенный N раз за HTTP-запрос, - подозрение на N+1;
+    # 0 - выключено
+    DB_N_PLUS_ONE_THRESHOLD: int = 5
 
     SQLITE_FILENAME: str = "db_project"
     SQLITE_DATABASE_URI: str = f"sqlite+aiosqlite:///./{SQLITE_FILENAME}.db"
     SQLALCHEMY_DATABASE_URI: str = SQLITE_DATABASE_URI
+    # SQLite в файле: WAL, одно пишущее соединение и пул читающих
+    SQLITE_PROFILE: bool = True
+    SQLITE_READERS: int = 4
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    # отрицательное значение - размер в КиБ
+    SQLITE_CACHE_SIZE: int = -64 * 1024
+    # реплики для чтения, проверка их доступности и окно чтения своих записей
+    DB_REPLICA_URIS: list[str] = []
+    DB_REPLICA_CHECK_INTERVAL_SEC: float = 5.0
+    DB_READ_YOUR_WRITES_SEC: float = 5.0
 
     # auth
     SECRET_KEY: str = ""
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 2
     REFRESH_TOKEN_EXPIRE_HOURS: int = 24 * 2
+    # кэш проверенных JWT (на воркер), 0 - выключен
+    TOKEN_CACHE_MAX_SIZE: int = 10_000
+    TOKEN_CACHE_TTL_SEC: int = 60 * 5
+    # фильтр Блума отозванных токенов (на воркер) и период его синхронизации
+    REVOCATION_FILTER_CAPACITY: int = 100_000
+    REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    REVOCATION_SYNC_INTERVAL_SEC: float = 1.0
+    # "thread" или "process"; bcrypt отпускает GIL, поэтому потоков обычно достаточно
+    PWD_HASH_EXECUTOR: str = "thread"
+    # None - по количеству ядер
+    PWD_HASH_WORKERS: int | None = None
+    # сколько задач может ждать свободного воркера, сверх этого - 503
+    PWD_HASH_MAX_QUEUE: int = 64
 
     # Email
     EMAIL_FROM: str = ""
@@ -62,9 +104,49 @@ class Settings(BaseSettings):
 
     # cache
     CACHE_EXPIRE_SEC: int = 60 * 2
+    # сколько секунд после CACHE_EXPIRE_SEC отдавать устаревшее значение,
+    # обновляя его в фоне; 0 - выключено
+    CACHE_STALE_SEC: int = 30
+    # доля случайного сокращения TTL, чтобы ключи не истекали одновременно
+    CACHE_TTL_JITTER: float = 0.1
+    # ограничения кэша в памяти (на воркер) и период удаления истекших записей
+    CACHE_MAX_ENTRIES: int = 10_000
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_REAPER_INTERVAL_SEC: float = 30.0
+    # блокировка в Redis для объединения промахов кэша между воркерами
+    CACHE_DISTRIBUTED_LOCK: bool = False
+    CACHE_LOCK_TIMEOUT_SEC: float = 10.0
+    CACHE_LOCK_WAIT_SEC: float = 5.0
+    # локальный кэш воркера перед Redis, сбрасывается через pub/sub
+    CACHE_NEAR_ENABLED: bool = True
+    CACHE_NEAR_TTL_SEC: int = 30
+    CACHE_NEAR_MAX_ENTRIES: int = 1_000
+    CACHE_NEAR_MAX_BYTES: int = 8 * 1024 * 1024
+    # время жизни счетчика записей для total=estimated (если нет статистики БД)
+    CACHE_COUNT_TTL_SEC: int = 60
+    # максимум id в одной пачке чтения объектов по id (кэш и WHERE id IN)
+    CACHE_BATCH_MAX_KEYS: int = 500
+
+    # максимум пользователей в одном запросе массового импорта: каждая строка -
+    # хеш bcrypt, большие импорты разбиваются на несколько запросов
+    USER_IMPORT_MAX_ROWS: int = 500
+    # размер пачки строк при потоковой выгрузке (yield_per курсора БД)
+    EXPORT_YIELD_PER: int = 1000
 
     CELERY_BROKER_URL: str = ""
 
+    # архивация удаленных пользователей (задача Celery по расписанию):
+    # перенос в архив через N дней после удаления, очистка архива через N дней
+    # после переноса; 0 - не запускать по расписанию
+    USER_ARCHIVE_INTERVAL_SEC: int = 60 * 60
+    USER_ARCHIVE_AFTER_DAYS: int = 30
+    USER_PURGE_AFTER_DAYS: int = 365
+    # строк в одной транзакции, пауза между пачками и пачек за один запуск
+    # (остаток переносится следующим запуском задачи)
+    USER_ARCHIVE_BATCH_ROWS: int = 500
+    USER_ARCHIVE_BATCH_PAUSE_SEC: float = 0.5
+    USER_ARCHIVE_MAX_BATCHES: int = 100
+
 
 @lru_cache
 def get_settings():
@@ -19,6 +19,11 @@ CREDENTIALS_EXCEPTION_EXPIRED = HTTPException(
     detail="Token has expired",
     headers={"WWW-Authenticate": "Bearer"},
 )
+CREDENTIALS_EXCEPTION_REVOKED = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Token has been revoked",
+    headers={"WWW-Authenticate": "Bearer"},
+)
 CREDENTIALS_EXCEPTION_USER = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
     detail="Token dont have an user",
@@ -78,6 +83,10 @@ USER_EXCEPTION_NOT_FOUND_PAGE = HTTPException(
     status_code=status.HTTP_404_NOT_FOUND,
     detail="User Page not found",
 )
+PAGE_EXCEPTION_INVALID_CURSOR = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Invalid page cursor",
+)
 EXCEPTION_ID_NOT_FOUND = HTTPException(
     status_code=status.HTTP_404_NOT_FOUND,
     detail="Not Found",
@@ -94,3 +103,8 @@ USER_EXCEPTION_CONFLICT_EMAIL_SIGNUP = HTTPException(
     status_code=status.HTTP_409_CONFLICT,
     detail="Email already exist",
 )
+SERVICE_EXCEPTION_OVERLOADED = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Service is overloaded, try again later",
+    headers={"Retry-After": "1"},
+)
@@ -0,0 +1,19 @@
+from collections.abc import Callable
+
+_providers: dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, provider: Callable[[], dict]) -> None:
+    """
+    Регистрирует источник метрик подсистемы.
+
+    Args:
+        name: Имя подсистемы в выдаче,
+        provider: Функция без аргументов, возвращающая словарь метрик.
+    """
+    _providers[name] = provider
+
+
+def collect() -> dict[str, dict]:
+    """Собирает текущие метрики всех зарегистрированных подсистем."""
+    return {name: provider() for name, provider in _providers.items()}
@@ -0,0 +1,97 @@
+import bisect
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class WaitHistogram:
+    """
+    Гистограмма длительностей: ожидания соединения, выполнения запросов (границы
+    корзин в миллисекундах).
+    """
+
+    bounds_ms = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+    def __init__(self) -> None:
+        self._counts = [0] * (len(self.bounds_ms) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self._counts[bisect.bisect_left(self.bounds_ms, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        self.max = max(self.max, ms)
+
+    def snapshot(self) -> dict:
+        buckets = {f"le_{b}ms": n for b, n in zip(self.bounds_ms, self._counts)}
+        return {
+            **buckets,
+            "inf": self._counts[-1],
+            "count": self.count,
+            "sum_ms": round(self.sum, 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений с телеметрией.
+
+    Считает время получения соединения из пула (включая ожидание свободного,
+    открытие нового и pre-ping) и число отказов по таймауту.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.wait = WaitHistogram()
+        self.timeouts = 0
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        self.wait.observe(time.perf_counter() - start)
+        return connection
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "timeouts": self.timeouts,
+            "wait": self.wait.snapshot(),
+        }
+
+
+def enable_idle_pre_ping(engine: AsyncEngine, idle: float) -> None:
+    """
+    Проверяет соединение при выдаче из пула, только если оно простаивало дольше
+    `idle` секунд.
+
+    В отличие от `pool_pre_ping`, активно используемые соединения выдаются без
+    лишнего обращения к БД. Неответившее соединение пул заменяет новым.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "checkin")
+    def _checkin(dbapi_connection, connection_record) -> None:
+        connection_record.info["checkin_at"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+        checkin_at = connection_record.info.get("checkin_at")
+        if checkin_at is None or time.monotonic() - checkin_at < idle:
+            return
+        try:
+            sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            raise exc.DisconnectionError() from e
@@ -0,0 +1,129 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.pool import WaitHistogram
+
+
+class QueryStats:
+    """Статистика запросов к БД в пределах одного HTTP-запроса."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement: str | None = None
+        self.statements: Counter[str] = Counter()
+
+    def observe(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.statements[statement] += 1
+        if seconds > self.slowest:
+            self.slowest, self.slowest_statement = seconds, statement
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        """
+        Одинаковые запросы, выполненные не меньше `threshold` раз — кандидаты N+1.
+
+        Параметры в текст запроса не входят, поэтому выборки одной строки по разным
+        id считаются одним запросом.
+        """
+        if threshold <= 0:
+            return {}
+        return {sql: n for sql, n in self.statements.items() if n >= threshold}
+
+    def server_timing(self) -> str:
+        """Значение заголовка `Server-Timing` (время в миллисекундах)."""
+        return (
+            f'db;dur={self.total * 1000:.3f};desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest * 1000:.3f}"
+        )
+
+
+# Статистика текущего HTTP-запроса; вне запроса не собирается
+_request_stats: ContextVar[QueryStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def track_request() -> QueryStats:
+    """
+    Начинает сбор статистики запросов к БД для текущего контекста.
+
+    Объект изменяется на месте, поэтому его видит и вызывающий код (middleware),
+    и задачи, созданные позже в этом контексте.
+    """
+    stats = QueryStats()
+    _request_stats.set(stats)
+    return stats
+
+
+class QueryMonitor:
+    """
+    Учет всех запросов к БД процесса: число, время, медленные запросы и
+    подозрения на N+1.
+
+    Запросы дольше `slow_query` секунд пишутся в лог с текстом запроса (без
+    параметров) и длительностью в отдельных полях записи.
+    """
+
+    def __init__(self, slow_query: float = 0.2, n_plus_one: int = 5) -> None:
+        self.slow_query = slow_query
+        self.n_plus_one = n_plus_one
+        self.duration = WaitHistogram()
+        self.slow = 0
+        self.errors = 0
+        self.n_plus_one_suspects = 0
+
+    def instrument(self, engine: AsyncEngine) -> None:
+        """Подключает обработчики событий выполнения запросов движка."""
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            seconds = time.perf_counter() - conn.info["query_start"].pop()
+            self.observe(statement, seconds, str(sync_engine.url.database))
+
+        @event.listens_for(sync_engine, "handle_error")
+        def _error(context) -> None:
+            connection = context.connection
+            if connection is not None and connection.info.get("query_start"):
+                connection.info["query_start"].pop()
+            self.errors += 1
+
+    def observe(self, statement: str, seconds: float, database: str) -> None:
+        self.duration.observe(seconds)
+        if (stats := _request_stats.get()) is not None:
+            stats.observe(statement, seconds)
+        if 0 < self.slow_query <= seconds:
+            self.slow += 1
+            logger.bind(
+                statement=statement,
+                duration_ms=round(seconds * 1000, 3),
+                database=database,
+            ).warning("Slow query {:.1f}ms", seconds * 1000)
+
+    def report(self, stats: QueryStats, path: str) -> None:
+        """Пишет в лог подозрения на N+1 по итогам запроса."""
+        for statement, count in stats.repeated(self.n_plus_one).items():
+            self.n_plus_one_suspects += 1
+            logger.bind(statement=statement, count=count, path=path).warning(
+                "Possible N+1: statement repeated {} times in {}", count, path
+            )
+
+    def stats(self) -> dict:
+        return {
+            "duration": self.duration.snapshot(),
+            "slow": self.slow,
+            "errors": self.errors,
+            "n_plus_one_suspects": self.n_plus_one_suspects,
+        }
@@ -1,7 +1,14 @@
+import asyncio
+import hashlib
+import itertools
+import time
 from contextlib import asynccontextmanager
-from collections.abc import AsyncIterator
+from contextvars import ContextVar
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
 
 from loguru import logger
+from sqlalchemy import event, make_url, text
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -9,36 +16,307 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
     AsyncConnection,
 )
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
 
+from core import metrics
+from core.config import settings
+from core.pool import InstrumentedPool, enable_idle_pre_ping
+from core.query_stats import QueryMonitor
+from core.sqlite import apply_pragmas, is_sqlite_file
 from models.base import DeclarativeBaseModel
 from utils import singleton
 
+# Параметры размера пула, которые не применимы к SQLite в памяти (StaticPool)
+_POOL_SIZE_KWARGS = ("pool_size", "max_overflow", "pool_timeout")
+
+# Кто выполняет запрос (хеш токена) и когда в этом контексте был последний коммит
+_writer_key: ContextVar[str | None] = ContextVar("writer_key", default=None)
+_last_write: ContextVar[float | None] = ContextVar("last_write", default=None)
+
+
+def set_writer_key(authorization: str | None) -> None:
+    """Связывает текущий запрос с клиентом по заголовку Authorization."""
+    if authorization:
+        digest = hashlib.blake2b(authorization.encode(), digest_size=16).hexdigest()
+        _writer_key.set(digest)
+
+
+class _WriteTrackingSession(Session):
+    """Сессия основной БД, которая отмечает коммиты с изменениями данных."""
+
+
+@event.listens_for(_WriteTrackingSession, "do_orm_execute")
+def _track_write(state) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["writes"] = True
+
+
+@event.listens_for(_WriteTrackingSession, "after_commit")
+def _track_commit(session: Session) -> None:
+    if session.info.pop("writes", False):
+        DatabaseSessionManager().mark_write()
+
+
+@event.listens_for(_WriteTrackingSession, "after_rollback")
+def _track_rollback(session: Session) -> None:
+    session.info.pop("writes", None)
+
 
 class DataBaseError(Exception):
     pass
 
 
+class LazySession:
+    """
+    Заместитель `AsyncSession`, который создает сессию при первом обращении.
+
+    Запрос, полностью обслуженный из кэша, не создает сессию и не берет соединение
+    из пула. Сессия реплики выбирается тоже в момент первого обращения, то есть с
+    учетом записей, сделанных к этому времени. Закрывается методом `release`.
+    """
+
+    def __init__(self, factory: Callable[[], AsyncSession]) -> None:
+        self._factory = factory
+        self._session: AsyncSession | None = None
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str):
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    async def release(self, rollback: bool = False) -> None:
+        """Закрывает сессию, если она была создана."""
+        if self._session is None:
+            return
+        session, self._session = self._session, None
+        try:
+            if rollback:
+                await session.rollback()
+        finally:
+            await session.close()
+
+
+@dataclass
+class _Replica:
+    url: str
+    engine: AsyncEngine
+    session_maker: async_sessionmaker[AsyncSession]
+    healthy: bool = True
+
+
 @singleton
 class DatabaseSessionManager:
-    """Синглетон класс для базы данных с поддержкой асинхронности."""
+    """
+    Синглетон класс для базы данных с поддержкой асинхронности.
+
+    Кроме основной БД может обслуживать реплики только для чтения. Сессии чтения
+    распределяются по доступным репликам по кругу. Если реплик нет или все
+    недоступны, читается основная БД. После коммита с изменениями этот же запрос и
+    запросы того же клиента (по токену) в течение `read_your_writes` секунд читают
+    основную БД, чтобы не увидеть устаревшие данные из-за отставания реплики.
+
+    Для SQLite в файле (`sqlite_profile`) основная БД — одно пишущее соединение,
+    записи ждут его в очереди пула, а чтение идет через отдельный пул соединений
+    только для чтения. В режиме WAL они не блокируют друг друга, поэтому ошибок
+    "database is locked" нет, а читатели сразу видят зафиксированные записи.
+    """
 
     def __init__(self) -> None:
         self._engine: AsyncEngine | None = None
         self._session_maker: async_sessionmaker[AsyncSession] | None = None
+        self._replicas: list[_Replica] = []
+        self._next_replica = itertools.count()
+        self._read_your_writes = 0.0
+        self._recent_writes: dict[str, float] = {}
+        self._health_task: asyncio.Task | None = None
+        self.queries = QueryMonitor()
+
+    @property
+    def initialized(self) -> bool:
+        return self._engine is not None
 
     def init(
-        self, host: str, engine_kwargs: dict = None, session_kwargs: dict = None
+        self,
+        host: str,
+        engine_kwargs: dict = None,
+        session_kwargs: dict = None,
+        replicas: list[str] | None = None,
+        read_your_writes: float = 5.0,
+        pre_ping_idle: float = 0,
+        sqlite_profile: bool = False,
+        sqlite_readers: int = 4,
+        sqlite_pragmas: dict | None = None,
+        slow_query: float = 0.2,
+        n_plus_one: int = 5,
     ) -> None:
-        """Инициализирует соединение с базой данных."""
+        """
+        Инициализирует соединение с базой данных и репликами.
+
+        Пул соединений настраивается параметрами `engine_kwargs` (`pool_size`,
+        `max_overflow`, `pool_timeout`, `pool_recycle`) и собирает телеметрию.
+        С `pre_ping_idle` соединение проверяется при выдаче, только если оно
+        простаивало дольше этого числа секунд.
+
+        Каждый запрос к БД учитывается в `queries`: запросы дольше `slow_query`
+        секунд пишутся в медленный лог, а одинаковые запросы, повторенные в одном
+        HTTP-запросе `n_plus_one` раз, — как подозрения на N+1.
+        """
 
         engine_kwargs = engine_kwargs if engine_kwargs else {}
         session_kwargs = session_kwargs if session_kwargs else {}
-
-        self._engine = create_async_engine(host, **engine_kwargs)
+        self.queries.slow_query = slow_query
+        self.queries.n_plus_one = n_plus_one
+        sqlite_profile = sqlite_profile and is_sqlite_file(host)
+        if sqlite_profile:
+            # единственное пишущее соединение, остальные записи ждут его в пуле
+            writer_kwargs = {**engine_kwargs, "pool_size": 1, "max_overflow": 0}
+            self._engine = self._create_engine(host, writer_kwargs, pre_ping_idle)
+            apply_pragmas(self._engine, sqlite_pragmas or {})
+        else:
+            self._engine = self._create_engine(host, engine_kwargs, pre_ping_idle)
         self._session_maker = async_sessionmaker(
             bind=self._engine,
+            sync_session_class=_WriteTrackingSession,
             **session_kwargs,
         )
+        self._replicas = []
+        for url in replicas or []:
+            engine = self._create_engine(url, engine_kwargs, pre_ping_idle)
+            self._replicas.append(
+                _Replica(url, engine, async_sessionmaker(bind=engine, **session_kwargs))
+            )
+        self._read_your_writes = read_your_writes
+
+        if sqlite_profile and not self._replicas:
+            reader_kwargs = {
+                **engine_kwargs,
+                "pool_size": sqlite_readers,
+                "max_overflow": 0,
+            }
+            reader = self._create_engine(host, reader_kwargs, pre_ping_idle)
+            apply_pragmas(reader, sqlite_pragmas or {}, query_only=True)
+            self._replicas.append(
+                _Replica(
+                    host, reader, async_sessionmaker(bind=reader, **session_kwargs)
+                )
+            )
+            # в WAL читатели видят зафиксированные записи сразу
+            self._read_your_writes = 0
+
+    def _create_engine(
+        self, url: str, engine_kwargs: dict, pre_ping_idle: float
+    ) -> AsyncEngine:
+        engine_kwargs = dict(engine_kwargs)
+        if make_url(url).get_backend_name() == "sqlite" and not is_sqlite_file(url):
+            for key in _POOL_SIZE_KWARGS:
+                engine_kwargs.pop(key, None)
+        else:
+            engine_kwargs.setdefault("poolclass", InstrumentedPool)
+        engine = create_async_engine(url, **engine_kwargs)
+        if pre_ping_idle > 0:
+            enable_idle_pre_ping(engine, pre_ping_idle)
+        self.queries.instrument(engine)
+        return engine
+
+    async def warmup(self, connections: int) -> None:
+        """
+        Заранее открывает до `connections` соединений в пулах основной БД и реплик,
+        чтобы первые запросы не ждали установки соединений.
+        """
+        if self._engine is None:
+            raise DataBaseError("DatabaseSessionManager is not initialized")
+        await self._warmup_engine(self._engine, connections)
+        results = await asyncio.gather(
+            *(self._warmup_engine(r.engine, connections) for r in self._replicas),
+            return_exceptions=True,
+        )
+        for replica, result in zip(self._replicas, results):
+            if isinstance(result, Exception):
+                logger.error("Replica {} warmup failed {}", replica.engine.url, result)
+                replica.healthy = False
+
+    @staticmethod
+    async def _warmup_engine(engine: AsyncEngine, connections: int) -> None:
+        if not isinstance(engine.pool, QueuePool):
+            return
+        count = min(connections, engine.pool.size())
+        opened = await asyncio.gather(*(engine.connect().start() for _ in range(count)))
+        for connection in opened:
+            await connection.close()
+        logger.info("Database pool warmed up with {} connections", count)
+
+    def pool_stats(self) -> dict:
+        """Телеметрия пулов соединений основной БД и реплик."""
+        engines = {"primary": self._engine}
+        for i, replica in enumerate(self._replicas):
+            engines[f"replica_{i}"] = replica.engine
+        return {
+            name: engine.pool.stats()
+            for name, engine in engines.items()
+            if engine is not None and isinstance(engine.pool, InstrumentedPool)
+        }
+
+    def mark_write(self) -> None:
+        """Отмечает коммит с изменениями в текущем контексте и для клиента."""
+        until = time.monotonic() + self._read_your_writes
+        _last_write.set(until)
+        if key := _writer_key.get():
+            self._recent_writes[key] = until
+            if len(self._recent_writes) > 10_000:
+                now = time.monotonic()
+                self._recent_writes = {
+                    k: v for k, v in self._recent_writes.items() if v > now
+                }
+
+    def needs_primary(self) -> bool:
+        """Должен ли текущий контекст читать с основной БД (видеть свои записи)."""
+        now = time.monotonic()
+        if (until := _last_write.get()) is not None and until > now:
+            return True
+        key = _writer_key.get()
+        return key is not None and self._recent_writes.get(key, 0) > now
+
+    def _choose_replica(self) -> _Replica | None:
+        if not self._replicas or self.needs_primary():
+            return None
+        healthy = [replica for replica in self._replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next_replica) % len(healthy)]
+
+    async def _check_replica(self, replica: _Replica, timeout: float) -> None:
+        try:
+            async with asyncio.timeout(timeout):
+                async with replica.engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+        except Exception as e:
+            if replica.healthy:
+                logger.error("Replica {} is unavailable {}", replica.engine.url, e)
+            replica.healthy = False
+        else:
+            if not replica.healthy:
+                logger.info("Replica {} is available again", replica.engine.url)
+            replica.healthy = True
+
+    async def check_replicas(self, timeout: float = 2.0) -> None:
+        """Проверяет доступность реплик."""
+        await asyncio.gather(
+            *(self._check_replica(replica, timeout) for replica in self._replicas)
+        )
+
+    async def _run_health_checks(self, interval: float) -> None:
+        while True:
+            await self.check_replicas(timeout=min(interval, 2.0))
+            await asyncio.sleep(interval)
+
+    def start_health_checks(self, interval: float) -> None:
+        if self._replicas and self._health_task is None:
+            self._health_task = asyncio.create_task(self._run_health_checks(interval))
 
     @asynccontextmanager
     async def connect(self) -> AsyncIterator[AsyncConnection]:
@@ -60,6 +338,16 @@ class DatabaseSessionManager:
                 raise
 
     async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for replica in self._replicas:
+            await replica.engine.dispose()
+        self._replicas = []
         if self._engine is None:
             return
         await self._engine.dispose()
@@ -75,15 +363,41 @@ class DatabaseSessionManager:
         В случае возникновения исключения внутри контекста,
         откатывает транзакцию.
         """
-        if self._session_maker is None:
-            raise DataBaseError("DatabaseSessionManager is not initialized")
-        async with self._session_maker() as session:
+        async with self.new_session() as session:
+            try:
+                yield session
+            except Exception:
+                await session.rollback()
+                raise
+
+    @asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Создание асинхронной сессии только для чтения.
+
+        Сессия открывается на одной из доступных реплик или, если это невозможно или
+        нужно прочитать свои записи, на основной БД.
+        """
+        async with self.new_read_session() as session:
             try:
                 yield session
             except Exception:
                 await session.rollback()
                 raise
 
+    def new_session(self) -> AsyncSession:
+        """Новая сессия основной БД (закрывает вызывающий код)."""
+        if self._session_maker is None:
+            raise DataBaseError("DatabaseSessionManager is not initialized")
+        return self._session_maker()
+
+    def new_read_session(self) -> AsyncSession:
+        """Новая сессия чтения на реплике или основной БД (закрывает вызывающий код)."""
+        replica = self._choose_replica()
+        if replica is None:
+            return self.new_session()
+        return replica.session_maker()
+
     async def create_all(self) -> None:
         """(For testing) create all database metadata."""
         async with self._engine.begin() as coon:
@@ -96,10 +410,67 @@ class DatabaseSessionManager:
 
 
 db_manager: DatabaseSessionManager = DatabaseSessionManager()
+metrics.register("db_pool", db_manager.pool_stats)
+metrics.register("db_queries", db_manager.queries.stats)
+
+
+def init_db_manager() -> None:
+    """Инициализирует `db_manager` из настроек приложения (API и воркеры Celery)."""
+    db_manager.init(
+        settings.SQLALCHEMY_DATABASE_URI,
+        {
+            "echo": settings.DB_ECHO,
+            "future": settings.DB_FUTURE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING
+            and not settings.DB_POOL_PRE_PING_IDLE_SEC,
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT_SEC,
+            "pool_recycle": settings.DB_POOL_RECYCLE_SEC,
+            "connect_args": settings.DB_CONNECT_ARGS,
+        },
+        {
+            "autoflush": settings.DB_SESSION_AUTOFLUSH,
+            "expire_on_commit": settings.DB_SESSION_EXPIRE_ON_COMMIT,
+        },
+        replicas=settings.DB_REPLICA_URIS,
+        read_your_writes=settings.DB_READ_YOUR_WRITES_SEC,
+        pre_ping_idle=settings.DB_POOL_PRE_PING_IDLE_SEC,
+        sqlite_profile=settings.SQLITE_PROFILE,
+        sqlite_readers=settings.SQLITE_READERS,
+        sqlite_pragmas={
+            "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+            "mmap_size": settings.SQLITE_MMAP_SIZE,
+            "cache_size": settings.SQLITE_CACHE_SIZE,
+        },
+        slow_query=settings.DB_SLOW_QUERY_MS / 1000,
+        n_plus_one=settings.DB_N_PLUS_ONE_THRESHOLD,
+    )
+
+
+@asynccontextmanager
+async def _lazy_session(factory: Callable[[], AsyncSession]) -> AsyncIterator:
+    session = LazySession(factory)
+    try:
+        yield session
+    except Exception:
+        await session.release(rollback=True)
+        raise
+    finally:
+        await session.release()
 
 
 async def get_session() -> AsyncIterator[AsyncSession]:
-    """Возвращает сеанс базы данных для использования с fastapi Depends."""
-    # noinspection PyArgumentList
-    async with db_manager.session() as session:
+    """
+    Возвращает сеанс базы данных для использования с fastapi Depends.
+
+    Сессия создается при первом обращении к ней (см. `LazySession`).
+    """
+    async with _lazy_session(db_manager.new_session) as session:
+        yield session
+
+
+async def get_read_session() -> AsyncIterator[AsyncSession]:
+    """Возвращает ленивый сеанс чтения (реплика или основная БД) для fastapi Depends."""
+    async with _lazy_session(db_manager.new_read_session) as session:
         yield session
@@ -0,0 +1,35 @@
+from sqlalchemy import event, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# WAL: читатели не блокируют писателя и друг друга; synchronous=NORMAL в режиме WAL
+# не теряет целостность, а fsync выполняется только при checkpoint
+BASE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "temp_store": "MEMORY",
+}
+
+
+def is_sqlite_file(url: str) -> bool:
+    """SQLite с базой в файле (для базы в памяти отдельный профиль не нужен)."""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+def apply_pragmas(engine: AsyncEngine, pragmas: dict, query_only: bool = False) -> None:
+    """Выполняет PRAGMA на каждом новом соединении движка."""
+    pragmas = {**BASE_PRAGMAS, **pragmas}
+    if query_only:
+        pragmas["query_only"] = "ON"
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
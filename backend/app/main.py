@@ -9,29 +9,29 @@ from loguru import logger
 
 from api import routers
 from core.config import settings
-from core.session_manager import db_manager
+from cache.cache import get_cache
+from services.helpers.revocation import revocation_list
+from core.query_stats import track_request
+from core.session_manager import db_manager, init_db_manager, set_writer_key
+from services.helpers.hasher import hasher
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncIterator[None]:
     """Lifespan event handles startup and shutdown events."""
     logger.info("Server start")
-    db_manager.init(
-        settings.SQLALCHEMY_DATABASE_URI,
-        {
-            "echo": settings.DB_ECHO,
-            "future": settings.DB_FUTURE,
-            "pool_pre_ping": settings.DB_POOL_PRE_PING,
-            "connect_args": settings.DB_CONNECT_ARGS,
-        },
-        {
-            "autoflush": settings.DB_SESSION_AUTOFLUSH,
-            "expire_on_commit": settings.DB_SESSION_EXPIRE_ON_COMMIT,
-        },
-    )
+    init_db_manager()
+    await db_manager.warmup(settings.DB_POOL_WARMUP)
+    db_manager.start_health_checks(settings.DB_REPLICA_CHECK_INTERVAL_SEC)
+    await get_cache().start()
+    await revocation_list.rebuild()
+    revocation_list.start(settings.REVOCATION_SYNC_INTERVAL_SEC)
     yield
     logger.info("Server shut down")
+    await revocation_list.stop()
+    await get_cache().stop()
     await db_manager.close()
+    hasher.shutdown()
 
 
 app = FastAPI(
@@ -48,9 +48,15 @@ app = FastAPI(
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     start_time = time.time()
+    # запросы одного клиента после его записи читают основную БД, а не реплику
+    set_writer_key(request.headers.get("authorization"))
+    queries = track_request()
     response = await call_next(request)
     # time in seconds it took to process the request and generate the response
     response.headers["X-Process-Time"] = str(time.time() - start_time)
+    # запросы к БД до начала отправки ответа
+    response.headers["Server-Timing"] = queries.server_timing()
+    db_manager.queries.report(queries, request.url.path)
     return response
 
 
@@ -63,7 +69,7 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_methods=["*"],
         allow_headers=["*"],
         # custom headers that client in a browser to be able to see
-        expose_headers=["X-Process-Time"],
+        expose_headers=["X-Process-Time", "Server-Timing"],
     )
 
 app.include_router(routers.api_v1_router)
@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from core.config import settings
 from models import *  # noqa: F403
+from models.user import SEARCH_SCHEMA_OBJECTS
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -29,6 +30,11 @@ target_metadata = DeclarativeBaseModel.metadata  # noqa: F405
 # ... etc.
 
 
+def include_object(object_, name, type_, reflected, compare_to) -> bool:
+    """Не сравнивать с моделями объекты поиска, созданные DDL в миграциях."""
+    return not (reflected and name and name.startswith(SEARCH_SCHEMA_OBJECTS))
+
+
 def run_migrations_offline() -> None:
     """
     Run migrations in 'offline' mode.
@@ -43,6 +49,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -52,7 +59,11 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
@@ -0,0 +1,106 @@
+"""create user table with partial indexes on not deleted rows
+
+Revision ID: 6f1c2a9d4b7e
+Revises:
+Create Date: 2026-10-18 01:25:24.193198
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6f1c2a9d4b7e"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# условие частичных индексов в том виде, в каком его выводят запросы репозиториев
+NOT_DELETED = dict(
+    postgresql_where=sa.text("is_deleted = false"),
+    sqlite_where=sa.text("is_deleted = 0"),
+)
+
+
+def upgrade() -> None:
+    # базы, созданные до появления миграций в репозитории, уже содержат таблицу
+    # user (см. scripts/adopt_migrations.py): добавляем только недостающие индексы
+    if context.is_offline_mode() or not sa.inspect(op.get_bind()).has_table("user"):
+        create_user_table()
+    op.create_index(
+        "ix_user_active_id",
+        "user",
+        ["id"],
+        unique=False,
+        if_not_exists=True,
+        **NOT_DELETED,
+    )
+    op.create_index(
+        "ix_user_active_username",
+        "user",
+        ["username", "id"],
+        unique=False,
+        if_not_exists=True,
+        **NOT_DELETED,
+    )
+    op.create_index(
+        "ix_user_active_created_at",
+        "user",
+        ["created_at", "id"],
+        unique=False,
+        if_not_exists=True,
+        **NOT_DELETED,
+    )
+    op.create_index(
+        "ix_user_active_fullname",
+        "user",
+        ["fullname", "id"],
+        unique=False,
+        if_not_exists=True,
+        **NOT_DELETED,
+    )
+
+
+def create_user_table() -> None:
+    op.create_table(
+        "user",
+        sa.Column("username", sa.String(length=255), nullable=False),
+        sa.Column("hashed_password", sa.String(length=255), nullable=False),
+        sa.Column("fullname", sa.String(length=255), nullable=True),
+        sa.Column("email", sa.String(length=255), nullable=True),
+        sa.Column("refresh_token", sa.String(length=255), nullable=True),
+        sa.Column(
+            "is_superuser", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+        sa.Column("image", sa.String(length=255), nullable=True),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column(
+            "is_deleted", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_user")),
+        sa.UniqueConstraint("email", name=op.f("uq_user_email")),
+        sa.UniqueConstraint("username", name=op.f("uq_user_username")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_active_fullname", table_name="user")
+    op.drop_index("ix_user_active_created_at", table_name="user")
+    op.drop_index("ix_user_active_username", table_name="user")
+    op.drop_index("ix_user_active_id", table_name="user")
+    op.drop_table("user")
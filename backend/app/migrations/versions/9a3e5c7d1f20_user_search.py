@@ -0,0 +1,60 @@
+"""user search: pg_trgm index on PostgreSQL, FTS5 shadow table on SQLite
+
+Revision ID: 9a3e5c7d1f20
+Revises: 6f1c2a9d4b7e
+Create Date: 2026-10-18 01:40:12.418530
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9a3e5c7d1f20"
+down_revision: Union[str, None] = "6f1c2a9d4b7e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# DDL зафиксирован на момент ревизии (в моделях — SEARCH_DDL из models.user)
+SEARCH_DDL = {
+    "sqlite": (
+        [
+            "CREATE VIRTUAL TABLE IF NOT EXISTS user_search "
+            "USING fts5(username, fullname, email, tokenize='trigram')",
+        ],
+        "DROP TABLE IF EXISTS user_search",
+    ),
+    "postgresql": (
+        [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            'CREATE INDEX IF NOT EXISTS ix_user_search_trgm ON "user" '
+            "USING gin ((lower(username || ' ' || coalesce(fullname, '') || ' ' || "
+            "coalesce(email, ''))) gin_trgm_ops) "
+            "WHERE is_deleted = false",
+        ],
+        "DROP INDEX IF EXISTS ix_user_search_trgm",
+    ),
+}
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect not in SEARCH_DDL:
+        return
+    create, _ = SEARCH_DDL[dialect]
+    for statement in create:
+        op.execute(statement)
+    if dialect == "sqlite":
+        # существующие пользователи; дальше таблицу обновляет UserRepository
+        op.execute(
+            "INSERT INTO user_search (rowid, username, fullname, email) "
+            "SELECT id, username, fullname, email FROM user WHERE is_deleted = 0"
+        )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect in SEARCH_DDL:
+        op.execute(SEARCH_DDL[dialect][1])
@@ -0,0 +1,79 @@
+"""user archive table and partial index on deleted users
+
+Revision ID: c4d8e2b6a913
+Revises: 9a3e5c7d1f20
+Create Date: 2026-10-18 02:05:41.207316
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4d8e2b6a913"
+down_revision: Union[str, None] = "9a3e5c7d1f20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# условие частичного индекса в том виде, в каком его выводят запросы архивации
+DELETED = dict(
+    postgresql_where=sa.text("is_deleted = true"),
+    sqlite_where=sa.text("is_deleted = 1"),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("username", sa.String(length=255), nullable=False),
+        sa.Column("hashed_password", sa.String(length=255), nullable=False),
+        sa.Column("fullname", sa.String(length=255), nullable=True),
+        sa.Column("email", sa.String(length=255), nullable=True),
+        sa.Column("refresh_token", sa.String(length=255), nullable=True),
+        sa.Column(
+            "is_superuser", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+        sa.Column("image", sa.String(length=255), nullable=True),
+        sa.Column(
+            "archived_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_user_archive")),
+    )
+    op.create_index(
+        "ix_user_archive_archived_at",
+        "user_archive",
+        ["archived_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_user_deleted_updated_at",
+        "user",
+        ["updated_at", "id"],
+        unique=False,
+        **DELETED,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_deleted_updated_at", table_name="user")
+    op.drop_index("ix_user_archive_archived_at", table_name="user_archive")
+    op.drop_table("user_archive")
@@ -0,0 +1,38 @@
+"""refresh sessions table for running without Redis
+
+Revision ID: d7e3f1a5b8c2
+Revises: c4d8e2b6a913
+Create Date: 2026-10-18 03:12:09.418203
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d7e3f1a5b8c2"
+down_revision: Union[str, None] = "c4d8e2b6a913"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_session",
+        sa.Column("sid", sa.String(length=64), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("jti", sa.String(length=64), nullable=False),
+        sa.Column("expires_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("sid", name=op.f("pk_user_session")),
+    )
+    op.create_index(
+        "ix_user_session_user_id", "user_session", ["user_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_session_user_id", table_name="user_session")
+    op.drop_table("user_session")
@@ -0,0 +1,39 @@
+"""revoked tokens table for running without Redis
+
+Revision ID: e8b4c2f6a1d9
+Revises: d7e3f1a5b8c2
+Create Date: 2026-10-18 04:05:41.207316
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e8b4c2f6a1d9"
+down_revision: Union[str, None] = "d7e3f1a5b8c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "revoked_token",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("key", sa.String(length=128), nullable=False),
+        sa.Column("not_before", sa.Float(), nullable=True),
+        sa.Column("expires_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_revoked_token")),
+        sa.UniqueConstraint("key", name=op.f("uq_revoked_token_key")),
+    )
+    op.create_index(
+        "ix_revoked_token_expires_at", "revoked_token", ["expires_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_revoked_token_expires_at", table_name="revoked_token")
+    op.drop_table("revoked_token")
@@ -1,7 +1,10 @@
-from .user import User
+from .user import RevokedToken, User, UserArchive, UserSession
 from .base import DeclarativeBaseModel
 
 __all__ = [
     "DeclarativeBaseModel",
+    "RevokedToken",
     "User",
+    "UserArchive",
+    "UserSession",
 ]
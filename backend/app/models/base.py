@@ -2,7 +2,7 @@ import datetime as datetime
 import re
 
 import orjson
-from sqlalchemy import false, Boolean, func, TIMESTAMP, MetaData
+from sqlalchemy import false, true, Boolean, func, TIMESTAMP, MetaData, Index, column
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import (
     Mapped,
@@ -24,6 +24,23 @@ class IsDeletedColumn:
     )
 
 
+def not_deleted_index(name: str, *columns: str) -> Index:
+    """
+    Частичный индекс только по неудаленным строкам (`WHERE is_deleted = false`).
+
+    Условие индекса совпадает с условием, которое добавляют репозитории, поэтому
+    планировщик может его использовать; удаленные строки в индекс не попадают.
+    """
+    where = column("is_deleted", Boolean) == false()
+    return Index(name, *columns, postgresql_where=where, sqlite_where=where)
+
+
+def deleted_index(name: str, *columns: str) -> Index:
+    """Частичный индекс только по удаленным строкам (`WHERE is_deleted = true`)."""
+    where = column("is_deleted", Boolean) == true()
+    return Index(name, *columns, postgresql_where=where, sqlite_where=where)
+
+
 class UpdatedAtColumn:
     created_at: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True),
@@ -1,4 +1,20 @@
-from sqlalchemy import false, String, Boolean
+from datetime import datetime
+
+from sqlalchemy import (
+    DDL,
+    TIMESTAMP,
+    Float,
+    Index,
+    Integer,
+    func,
+    false,
+    String,
+    Boolean,
+    column,
+    event,
+    literal_column,
+    table,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import (
@@ -7,12 +23,25 @@ from .base import (
     UpdatedAtColumn,
     CreatedAtColumn,
     IdColumn,
+    deleted_index,
+    not_deleted_index,
 )
 
 
 class User(
     DeclarativeBaseModel, IdColumn, IsDeletedColumn, UpdatedAtColumn, CreatedAtColumn
 ):
+    __table_args__ = (
+        # фильтры и ключи сортировки постраничной выдачи (UserRepository.sortable);
+        # выборка по email обслуживается уникальным индексом
+        not_deleted_index("ix_user_active_id", "id"),
+        not_deleted_index("ix_user_active_username", "username", "id"),
+        not_deleted_index("ix_user_active_created_at", "created_at", "id"),
+        not_deleted_index("ix_user_active_fullname", "fullname", "id"),
+        # поиск давно удаленных для архивации (момент удаления — updated_at)
+        deleted_index("ix_user_deleted_updated_at", "updated_at", "id"),
+    )
+
     username: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
     hashed_password: Mapped[str] = mapped_column(String(255), nullable=False)
     fullname: Mapped[str] = mapped_column(String(255), nullable=True)
@@ -22,3 +51,120 @@ class User(
         Boolean, default=False, server_default=false()
     )
     image: Mapped[str] = mapped_column(String(255), nullable=True)
+
+
+class UserArchive(DeclarativeBaseModel, UpdatedAtColumn, CreatedAtColumn):
+    """
+    Архив удаленных пользователей.
+
+    Строки переносятся сюда из `user` с исходным id через `USER_ARCHIVE_AFTER_DAYS`
+    после удаления и окончательно удаляются через `USER_PURGE_AFTER_DAYS` после
+    архивации. Имя пользователя и email в архиве не уникальны: после переноса их
+    может занять новый пользователь.
+    """
+
+    __table_args__ = (Index("ix_user_archive_archived_at", "archived_at", "id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    username: Mapped[str] = mapped_column(String(255), nullable=False)
+    hashed_password: Mapped[str] = mapped_column(String(255), nullable=False)
+    fullname: Mapped[str] = mapped_column(String(255), nullable=True)
+    email: Mapped[str] = mapped_column(String(255), nullable=True)
+    refresh_token: Mapped[str] = mapped_column(String(255), nullable=True)
+    is_superuser: Mapped[bool] = mapped_column(
+        Boolean, default=False, server_default=false()
+    )
+    image: Mapped[str] = mapped_column(String(255), nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        server_default=func.now(),
+        doc="Time of archiving",
+    )
+
+
+class UserSession(DeclarativeBaseModel):
+    """
+    Refresh-сессия пользователя (хранилище сессий без Redis).
+
+    Строка хранит идентификатор (`jti`) последнего выданного refresh-токена сессии и
+    срок ее действия; истекшие строки удаляются при создании новых сессий.
+    """
+
+    __table_args__ = (Index("ix_user_session_user_id", "user_id"),)
+
+    sid: Mapped[str] = mapped_column(String(64), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    jti: Mapped[str] = mapped_column(String(64), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False
+    )
+
+
+class RevokedToken(DeclarativeBaseModel):
+    """
+    Отзыв токена (хранилище отзывов без Redis).
+
+    `key` — `jti` отозванного токена или `user:<id>` с моментом `not_before`, раньше
+    которого токены пользователя недействительны. Возрастающий `id` служит журналом,
+    из которого воркеры дочитывают новые отзывы.
+    """
+
+    __table_args__ = (Index("ix_revoked_token_expires_at", "expires_at"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    key: Mapped[str] = mapped_column(String(128), nullable=False, unique=True)
+    not_before: Mapped[float] = mapped_column(Float, nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False
+    )
+
+
+# Поиск по подстроке в username, fullname и email.
+# PostgreSQL: триграммный GIN-индекс (pg_trgm) по документу поиска; выражение в
+# запросах должно совпадать с выражением индекса.
+SEARCH_DOCUMENT_SQL = (
+    "lower(username || ' ' || coalesce(fullname, '') || ' ' || coalesce(email, ''))"
+)
+search_document = literal_column(SEARCH_DOCUMENT_SQL, String)
+
+# SQLite: теневая таблица FTS5 с триграммным токенизатором (rowid = user.id), ее
+# заполняет UserRepository при записи пользователей
+user_search = table(
+    "user_search",
+    column("rowid", Integer),
+    column("username", String),
+    column("fullname", String),
+    column("email", String),
+    # скрытые колонки FTS5: ранг (bm25) и колонка для MATCH
+    column("rank", Float),
+    column("user_search", String),
+)
+
+# Объекты поиска создаются DDL, а не метаданными, autogenerate их пропускает
+# (вместе со служебными таблицами FTS5 user_search_*)
+SEARCH_SCHEMA_OBJECTS = ("user_search", "ix_user_search_trgm")
+
+SEARCH_DDL = {
+    "sqlite": (
+        [
+            "CREATE VIRTUAL TABLE IF NOT EXISTS user_search "
+            "USING fts5(username, fullname, email, tokenize='trigram')",
+        ],
+        "DROP TABLE IF EXISTS user_search",
+    ),
+    "postgresql": (
+        [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            'CREATE INDEX IF NOT EXISTS ix_user_search_trgm ON "user" '
+            f"USING gin (({SEARCH_DOCUMENT_SQL}) gin_trgm_ops) "
+            "WHERE is_deleted = false",
+        ],
+        "DROP INDEX IF EXISTS ix_user_search_trgm",
+    ),
+}
+for dialect, (create, drop) in SEARCH_DDL.items():
+    for statement in create:
+        event.listen(
+            User.__table__, "after_create", DDL(statement).execute_if(dialect=dialect)
+        )
+    event.listen(User.__table__, "before_drop", DDL(drop).execute_if(dialect=dialect))
@@ -1,16 +1,35 @@
 from abc import ABC, abstractmethod
-from typing import TypeVar
-from collections.abc import Sequence
+import datetime
+from typing import Any, TypeVar
+from collections.abc import AsyncIterator, Sequence
 
 from pydantic import BaseModel
-from sqlalchemy import insert, select, update, delete, func, RowMapping, Result
+from sqlalchemy import (
+    false,
+    insert,
+    select,
+    update,
+    delete,
+    func,
+    tuple_,
+    text,
+    RowMapping,
+    Result,
+    DateTime,
+    String,
+    and_,
+    type_coerce,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.base import DeclarativeBaseModel
+from .bulk import BulkWriter, BulkWriteReport, OnConflict
 
 ModelType = TypeVar("ModelType", bound=DeclarativeBaseModel)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
+# Набор колонок для чтения: имена полей или схема, поля которой нужно выбрать
+Columns = Sequence[str] | type[BaseModel] | None
 
 
 class AbstractRepository(ABC):
@@ -56,6 +75,8 @@ class SQLAlchemyRepository(AbstractRepository):
     model: type[ModelType]
     create_schema: type[CreateSchemaType]
     update_schema: type[UpdateSchemaType]
+    # Поля для постраничного вывода по курсору (должны быть NOT NULL и с индексом)
+    sortable: tuple[str, ...] = ("id",)
 
     def __init__(self, session: AsyncSession):
         """
@@ -66,6 +87,24 @@ class SQLAlchemyRepository(AbstractRepository):
         """
         self.session: AsyncSession = session
 
+    @property
+    def not_deleted(self):
+        """
+        Условие «объект не удален».
+
+        Значение подставляется в запрос литералом, а не параметром: иначе условие не
+        сопоставляется с частичными индексами `WHERE is_deleted = false` (SQLite
+        никогда, PostgreSQL — в общем плане подготовленного запроса).
+        """
+        return self.model.is_deleted == false()
+
+    async def _written(self, ids: Sequence[int]) -> None:
+        """
+        Вызывается после записи (создания, изменения, удаления) строк `ids` в той же
+        транзакции. Наследники поддерживают здесь производные данные, например
+        поисковый индекс.
+        """
+
     async def add_one(self, data: CreateSchemaType) -> type[ModelType]:
         """
         Создание объекта.
@@ -78,31 +117,146 @@ class SQLAlchemyRepository(AbstractRepository):
         """
         stmt = insert(self.model).values(data).returning(self.model)
         res = await self.session.execute(stmt)
-        return res.scalar_one()
+        obj = res.scalar_one()
+        await self._written([obj.id])
+        return obj
+
+    async def add_many(
+        self,
+        data: list[CreateSchemaType],
+        on_conflict: OnConflict | None = None,
+        index_elements: Sequence[str] | None = None,
+    ) -> Sequence[ModelType]:
+        """
+        Создание нескольких объектов пачками (см. `bulk_write`).
 
-    async def add_many(self, data: list[CreateSchemaType]) -> Sequence[ModelType]:
-        stmt = insert(self.model).values(data).returning(self.model)
-        res = await self.session.execute(stmt)
-        return res.scalars().all()
+        Args:
+            data: Список вводимых данных,
+            on_conflict: Обработка конфликта уникальности ("nothing" или "update"),
+            index_elements: Уникальные колонки конфликта.
+
+        Returns:
+            Созданные (или обновленные) экземпляры модели.
+        """
+        report = await BulkWriter(self.session, self.model).write(
+            data, on_conflict, index_elements, returning=True
+        )
+        await self._written([entity.id for entity in report.entities])
+        return report.entities
+
+    async def bulk_write(
+        self,
+        data: list[dict],
+        on_conflict: OnConflict | None = None,
+        index_elements: Sequence[str] | None = None,
+        update_columns: Sequence[str] | None = None,
+        use_copy: bool = False,
+    ) -> BulkWriteReport:
+        """
+        Массовая запись без возврата объектов.
+
+        Строки делятся на пачки по лимиту параметров СУБД; конфликты уникальности
+        обрабатываются `ON CONFLICT`, на asyncpg можно использовать COPY.
+
+        Args:
+            data: Список строк (словари колонок),
+            on_conflict: Обработка конфликта уникальности ("nothing" или "update"),
+            index_elements: Уникальные колонки конфликта,
+            update_columns: Обновляемые при конфликте колонки,
+            use_copy: Писать через COPY, если возможно.
+
+        Returns:
+            Отчет по пачкам с количеством строк и временем.
+        """
+        return await BulkWriter(self.session, self.model).write(
+            data, on_conflict, index_elements, update_columns, use_copy=use_copy
+        )
+
+    def _select(self, columns: Columns = None, *required: str):
+        """
+        SELECT модели целиком или только нужных колонок.
 
-    async def find_all(self, **filter_dict) -> Sequence[ModelType] | None:
+        С `columns` выбираются только колонки таблицы, совпадающие с полями (остальные
+        поля схемы пропускаются), плюс обязательные `required`. Такой запрос не
+        создает ORM-объекты и не передает лишние данные (например, хеш пароля).
+        """
+        if columns is None:
+            return select(self.model)
+        return select(*self._columns(columns, *required))
+
+    def _columns(self, columns: Columns, *required: str) -> list:
+        if isinstance(columns, type) and issubclass(columns, BaseModel):
+            columns = list(columns.model_fields)
+        table_columns = self.model.__table__.columns
+        names = [name for name in columns if name in table_columns]
+        names += [name for name in required if name not in names]
+        return [getattr(self.model, name) for name in names]
+
+    @staticmethod
+    def _rows(res: Result, columns: Columns) -> Sequence[ModelType | RowMapping]:
+        if columns is None:
+            return res.unique().scalars().all()
+        return res.mappings().all()
+
+    async def find_all(
+        self, columns: Columns = None, **filter_dict
+    ) -> Sequence[ModelType | RowMapping] | None:
         """
         Асинхронно находит и возвращает все экземпляры модели, удовлетворяющие указанным
         критериям.
 
         Args:
+            columns: Колонки или схема для выборки (строки вместо объектов),
             **filter_dict: Критерии фильтрации в виде именованных параметров.
 
         Returns:
              Список экземпляров модели.
         """
-        stmt = select(self.model).filter_by(**filter_dict, is_deleted=0)
+        stmt = self._select(columns).filter_by(**filter_dict).where(self.not_deleted)
         res = await self.session.execute(stmt)
-        return res.scalars().all()
+        return self._rows(res, columns)
+
+    async def stream(
+        self, yield_per: int = 1000, columns: Columns = None, **filter_dict
+    ) -> AsyncIterator[ModelType | RowMapping]:
+        """
+        Асинхронно перебирает все экземпляры модели, удовлетворяющие критериям, без
+        загрузки всей выборки в память.
+
+        Строки читаются курсором на стороне сервера пачками по `yield_per`. Прочитанные
+        объекты удаляются из сессии, поэтому память не растет с размером выборки.
+
+        Args:
+            yield_per: Количество строк в одной пачке,
+            columns: Колонки или схема для выборки (строки вместо объектов),
+            **filter_dict: Критерии фильтрации в виде именованных параметров.
+
+        Returns:
+            Асинхронный итератор экземпляров модели в порядке id.
+        """
+        stmt = (
+            self._select(columns)
+            .filter_by(**filter_dict)
+            .where(self.not_deleted)
+            .order_by(self.model.id)
+            .execution_options(yield_per=yield_per)
+        )
+        if columns is not None:
+            res = await self.session.stream(stmt)
+            async for partition in res.mappings().partitions():
+                for row in partition:
+                    yield row
+            return
+
+        res = await self.session.stream_scalars(stmt)
+        async for partition in res.partitions():
+            for entity in partition:
+                yield entity
+                self.session.expunge(entity)
 
     async def find_by_page(
-        self, limit: int, offset: int = 0, **filter_dict
-    ) -> Sequence[ModelType] | None:
+        self, limit: int, offset: int = 0, columns: Columns = None, **filter_dict
+    ) -> Sequence[ModelType | RowMapping] | None:
         """
         Асинхронно находит и возвращает все экземпляры модели постранично,
         удовлетворяющие указанным критериям.
@@ -110,6 +264,7 @@ class SQLAlchemyRepository(AbstractRepository):
         Args:
             offset: Критерии номера страницы,
             limit: Критерии количества объектов на странице.
+            columns: Колонки или схема для выборки (строки вместо объектов),
             **filter_dict: Критерии фильтрации в виде именованных параметров.
 
         Returns:
@@ -117,13 +272,192 @@ class SQLAlchemyRepository(AbstractRepository):
         """
 
         stmt = (
-            select(self.model)
-            .filter_by(**filter_dict, is_deleted=0)
+            self._select(columns)
+            .filter_by(**filter_dict)
+            .where(self.not_deleted)
+            .order_by(self.model.id)
+            .offset((offset - 1) * limit)
+            .limit(limit)
+        )
+        res: Result = await self.session.execute(stmt)
+        return self._rows(res, columns)
+
+    async def find_by_page_counted(
+        self, limit: int, offset: int = 1, columns: Columns = None, **filter_dict
+    ) -> tuple[Sequence[ModelType | RowMapping], int]:
+        """
+        Страница объектов и общее количество по критериям одним запросом.
+
+        Количество считается оконной функцией `count(*) OVER ()` по всем строкам,
+        прошедшим фильтр, до применения LIMIT/OFFSET. Для страницы за пределами
+        выборки строк нет, и количество возвращается как 0.
+
+        Args:
+            offset: Номер страницы,
+            limit: Количество объектов на странице,
+            columns: Колонки или схема для выборки (строки вместо объектов),
+            **filter_dict: Критерии фильтрации в виде именованных параметров.
+
+        Returns:
+            Список экземпляров модели и общее количество.
+        """
+        total = func.count().over().label("total")
+        stmt = (
+            self._select(columns)
+            .add_columns(total)
+            .filter_by(**filter_dict)
+            .where(self.not_deleted)
+            .order_by(self.model.id)
             .offset((offset - 1) * limit)
             .limit(limit)
         )
         res: Result = await self.session.execute(stmt)
-        return res.unique().scalars().all()
+        rows = res.all()
+        if columns is None:
+            entities = [row[0] for row in rows]
+        else:
+            # без последней колонки с количеством
+            entities = [dict(zip(row._fields[:-1], row[:-1])) for row in rows]
+        return entities, rows[0].total if rows else 0
+
+    async def estimate_count(self) -> int | None:
+        """
+        Оценка количества строк таблицы по статистике планировщика.
+
+        Поддерживается PostgreSQL (`pg_class.reltuples`, обновляется ANALYZE и
+        autovacuum). Для других СУБД и таблиц без статистики возвращает None.
+        """
+        bind = self.session.get_bind()
+        if bind.dialect.name != "postgresql":
+            return None
+        name = bind.dialect.identifier_preparer.format_table(self.model.__table__)
+        res = await self.session.execute(
+            text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": name},
+        )
+        reltuples = res.scalar_one_or_none()
+        if reltuples is None or reltuples < 0:
+            return None
+        return int(reltuples)
+
+    async def find_by_keyset(
+        self,
+        limit: int,
+        sort: str = "id",
+        after: Sequence[Any] | None = None,
+        before: Sequence[Any] | None = None,
+        columns: Columns = None,
+        **filter_dict,
+    ) -> tuple[Sequence[ModelType | RowMapping], bool]:
+        """
+        Постраничный вывод по ключу сортировки (keyset) вместо OFFSET.
+
+        Страница начинается сразу после (или перед) ключа `(sort, id)` последней
+        показанной записи, поэтому по индексу читается только сама страница, и время
+        ответа не зависит от глубины.
+
+        Args:
+            limit: Количество объектов на странице,
+            sort: Поле сортировки из `sortable`, префикс "-" — по убыванию,
+            after: Ключ `(значение sort, id)`, после которого начинается страница,
+            before: Ключ `(значение sort, id)`, перед которым заканчивается страница,
+            columns: Колонки или схема для выборки (строки вместо объектов, ключ
+                сортировки и id добавляются всегда),
+            **filter_dict: Критерии фильтрации в виде именованных параметров.
+
+        Returns:
+            Объекты страницы в порядке сортировки и признак, что дальше
+            (в направлении чтения) есть еще объекты.
+        """
+        descending = sort.startswith("-")
+        column = getattr(self.model, sort.removeprefix("-"))
+
+        stmt = (
+            self._select(columns, column.key, "id")
+            .filter_by(**filter_dict)
+            .where(self.not_deleted)
+        )
+        return await self._keyset_page(
+            stmt, column, limit, descending, after, before, columns
+        )
+
+    async def _keyset_page(
+        self,
+        stmt,
+        column,
+        limit: int,
+        descending: bool = False,
+        after: Sequence[Any] | None = None,
+        before: Sequence[Any] | None = None,
+        columns: Columns = None,
+    ) -> tuple[Sequence[ModelType | RowMapping], bool]:
+        """Страница запроса `stmt` по ключу `(column, id)` (см. `find_by_keyset`)."""
+        if after is not None:
+            stmt = stmt.where(self._keyset_after(column, after, not descending))
+        if before is not None:
+            stmt = stmt.where(self._keyset_after(column, before, descending))
+
+        # страница перед ключом читается в обратном порядке и разворачивается
+        backward = before is not None
+        if descending != backward:
+            stmt = stmt.order_by(column.desc(), self.model.id.desc())
+        else:
+            stmt = stmt.order_by(column.asc(), self.model.id.asc())
+
+        res: Result = await self.session.execute(stmt.limit(limit + 1))
+        entities = list(self._rows(res, columns))
+        has_more = len(entities) > limit
+        entities = entities[:limit]
+        if backward:
+            entities.reverse()
+        return entities, has_more
+
+    def _keyset_after(self, column, values: Sequence[Any], greater: bool):
+        """Условие: ключ `(column, id)` больше (`greater`) или меньше `values`."""
+        value, _id = values
+        key, bound = tuple_(column, self.model.id), tuple_(value, _id)
+        if not isinstance(column.type, DateTime):
+            return key > bound if greater else key < bound
+
+        # в курсоре даты хранятся строкой ISO 8601
+        if isinstance(value, str):
+            value = datetime.datetime.fromisoformat(value)
+        bound = tuple_(value, _id)
+        if self.session.get_bind().dialect.name != "sqlite":
+            return key > bound if greater else key < bound
+
+        # SQLite хранит даты строкой: CURRENT_TIMESTAMP — без долей секунды, а
+        # параметр — с микросекундами, и строки одного момента сравниваются неверно.
+        # Ключ сравнивается по julianday, а диапазон по самой колонке с точностью до
+        # секунды оставляет в работе индекс
+        second = value.replace(microsecond=0, tzinfo=None)
+        if not greater:
+            second += datetime.timedelta(seconds=1)
+        second = second.isoformat(" ")
+        key = tuple_(func.julianday(column), self.model.id)
+        bound = tuple_(func.julianday(value), _id)
+        if greater:
+            return and_(type_coerce(column, String) >= second, key > bound)
+        return and_(type_coerce(column, String) < second, key < bound)
+
+    async def find_by_ids(
+        self, _ids: Sequence[int], columns: Columns = None
+    ) -> Sequence[ModelType | RowMapping]:
+        """
+        Находит объекты по списку идентификаторов одним запросом `WHERE id IN (...)`.
+
+        Args:
+            _ids: Идентификаторы объектов,
+            columns: Колонки или схема для выборки (строки с колонкой `id`).
+
+        Returns:
+            Найденные объекты в произвольном порядке; отсутствующих и удаленных нет.
+        """
+        stmt = self._select(columns, "id").where(
+            self.model.id.in_(_ids), self.not_deleted
+        )
+        res = await self.session.execute(stmt)
+        return self._rows(res, columns)
 
     async def find_one(self, **filter_dict) -> type[ModelType] | None:
         """
@@ -135,22 +469,27 @@ class SQLAlchemyRepository(AbstractRepository):
         Returns:
             Type[ModelType]: экземпляр модель БД.
         """
-        stmt = select(self.model).filter_by(**filter_dict, is_deleted=0)
+        stmt = select(self.model).filter_by(**filter_dict).where(self.not_deleted)
         res = await self.session.execute(stmt)
         return res.scalar_one()
 
-    async def find_one_or_none(self, **filter_dict) -> type[ModelType] | None:
+    async def find_one_or_none(
+        self, columns: Columns = None, **filter_dict
+    ) -> type[ModelType] | RowMapping | None:
         """
         Находит только один объект или ничего.
 
         Args:
+           columns: Колонки или схема для выборки (строка вместо объекта),
            **filter_dict: Критерии фильтрации в виде именованных параметров.
 
         Returns:
             Type[ModelType]: экземпляр модель БД.
         """
-        stmt = select(self.model).filter_by(**filter_dict, is_deleted=0)
+        stmt = self._select(columns).filter_by(**filter_dict).where(self.not_deleted)
         res = await self.session.execute(stmt)
+        if columns is not None:
+            return res.mappings().one_or_none()
         return res.scalar_one_or_none()
 
     async def edit_one(self, _id: int, data) -> type[ModelType]:
@@ -166,7 +505,44 @@ class SQLAlchemyRepository(AbstractRepository):
         """
         stmt = update(self.model).values(**data).filter_by(id=_id).returning(self.model)
         res = await self.session.execute(stmt)
-        return res.scalar_one()
+        obj = res.scalar_one()
+        await self._written([obj.id])
+        return obj
+
+    async def edit_one_or_none(
+        self, _id: int, data: dict, columns: Columns = None, **filter_dict
+    ) -> type[ModelType] | RowMapping | None:
+        """
+        Условное обновление объекта одним запросом.
+
+        `UPDATE ... WHERE id = :id AND <условия> RETURNING ...` заменяет проверку
+        существования перед записью и чтение после нее. Нарушение уникальности
+        выбрасывает `IntegrityError` из этого же запроса.
+
+        Args:
+            _id: Идентификатор объекта,
+            data: Данные, которые нужно обновить,
+            columns: Колонки или схема для RETURNING (строка вместо объекта),
+            **filter_dict: Дополнительные условия обновления.
+
+        Returns:
+            Измененный объект или None, если объект не найден (или удален).
+        """
+        stmt = (
+            update(self.model)
+            .values(**data)
+            .filter_by(id=_id, **filter_dict)
+            .where(self.not_deleted)
+        )
+        if columns is None:
+            res = await self.session.execute(stmt.returning(self.model))
+            obj = res.scalar_one_or_none()
+        else:
+            res = await self.session.execute(stmt.returning(*self._columns(columns)))
+            obj = res.mappings().one_or_none()
+        if obj is not None:
+            await self._written([_id])
+        return obj
 
     async def edit_many(
         self, _ids: list[int], data: UpdateSchemaType
@@ -178,7 +554,9 @@ class SQLAlchemyRepository(AbstractRepository):
             .returning(self.model)
         )
         res = await self.session.execute(stmt)
-        return res.scalars().all()
+        objs = res.scalars().all()
+        await self._written([obj.id for obj in objs])
+        return objs
 
     async def delete_one(self, _id: int) -> type[ModelType]:
         """
@@ -192,12 +570,16 @@ class SQLAlchemyRepository(AbstractRepository):
         """
         stmt = delete(self.model).filter_by(id=_id).returning(self.model)
         res = await self.session.execute(stmt)
-        return res.scalar_one()
+        obj = res.scalar_one()
+        await self._written([obj.id])
+        return obj
 
     async def delete_many(self, **filter_by):
         stmt = delete(self.model).filter_by(**filter_by).returning(self.model)
         res = await self.session.execute(stmt)
-        return res.scalars().all()
+        objs = res.scalars().all()
+        await self._written([obj.id for obj in objs])
+        return objs
 
     async def count(self, **filter_dict) -> int:
         """
@@ -209,7 +591,11 @@ class SQLAlchemyRepository(AbstractRepository):
         Returns:
            Количество объектов
         """
-        stmt = select(func.count(self.model.id)).filter_by(**filter_dict, is_deleted=0)
+        stmt = (
+            select(func.count(self.model.id))
+            .filter_by(**filter_dict)
+            .where(self.not_deleted)
+        )
         res: Result = await self.session.execute(stmt)
         return res.unique().scalars().first()
 
@@ -0,0 +1,202 @@
+import sqlite3
+import time
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import Any, Literal
+
+from loguru import logger
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from models.base import DeclarativeBaseModel
+
+OnConflict = Literal["nothing", "update"]
+
+# Лимит параметров одного запроса для СУБД
+_MAX_PARAMS = {
+    "postgresql": 32767,
+    "sqlite": 32766 if sqlite3.sqlite_version_info >= (3, 32) else 999,
+}
+_DEFAULT_MAX_PARAMS = 999
+
+
+@dataclass(slots=True)
+class ChunkReport:
+    """Результат записи одной пачки."""
+
+    index: int
+    rows: int
+    written: int
+    seconds: float
+
+
+@dataclass(slots=True)
+class BulkWriteReport:
+    """Результат массовой записи по пачкам."""
+
+    method: str = "insert"
+    chunks: list[ChunkReport] = field(default_factory=list)
+    entities: list[Any] = field(default_factory=list)
+
+    @property
+    def rows(self) -> int:
+        return sum(chunk.rows for chunk in self.chunks)
+
+    @property
+    def written(self) -> int:
+        return sum(chunk.written for chunk in self.chunks)
+
+    @property
+    def skipped(self) -> int:
+        return self.rows - self.written
+
+    @property
+    def seconds(self) -> float:
+        return sum(chunk.seconds for chunk in self.chunks)
+
+
+class BulkWriter:
+    """
+    Массовая запись строк модели пачками.
+
+    Размер пачки подбирается так, чтобы число параметров одного INSERT не превышало
+    лимит СУБД. Конфликты уникальности обрабатываются `ON CONFLICT DO NOTHING/UPDATE`
+    (SQLite и PostgreSQL). На asyncpg без обработки конфликтов можно писать через
+    `COPY`, что для больших объемов в разы быстрее INSERT.
+
+    Все пачки выполняются в транзакции сессии, фиксирует ее вызывающий код.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        model: type[DeclarativeBaseModel],
+        chunk_rows: int = settings.DB_BULK_CHUNK_ROWS,
+    ) -> None:
+        self.session = session
+        self.model = model
+        self.chunk_rows = chunk_rows
+
+    @property
+    def dialect(self):
+        return self.session.get_bind().dialect
+
+    def chunks(self, rows: Sequence[dict]) -> Iterator[list[dict]]:
+        """Делит строки на пачки с учетом лимита параметров СУБД."""
+        if not rows:
+            return
+        columns = max(len(row) for row in rows)
+        max_params = _MAX_PARAMS.get(self.dialect.name, _DEFAULT_MAX_PARAMS)
+        size = max(1, min(self.chunk_rows, max_params // max(columns, 1)))
+        for start in range(0, len(rows), size):
+            yield list(rows[start : start + size])
+
+    def _statement(
+        self,
+        chunk: list[dict],
+        on_conflict: OnConflict | None,
+        index_elements: Sequence[str] | None,
+        update_columns: Sequence[str] | None,
+    ):
+        if on_conflict is None:
+            return insert(self.model).values(chunk)
+
+        dialects = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+        if self.dialect.name not in dialects:
+            raise NotImplementedError(f"ON CONFLICT for {self.dialect.name}")
+        stmt = dialects[self.dialect.name](self.model).values(chunk)
+        if on_conflict == "nothing":
+            return stmt.on_conflict_do_nothing(index_elements=index_elements)
+
+        if not index_elements:
+            raise ValueError("index_elements are required for on_conflict='update'")
+        columns = update_columns or [
+            column for column in chunk[0] if column not in index_elements
+        ]
+        return stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={column: stmt.excluded[column] for column in columns},
+        )
+
+    def _can_copy(self, on_conflict: OnConflict | None, returning: bool) -> bool:
+        return (
+            on_conflict is None
+            and not returning
+            and self.dialect.name == "postgresql"
+            and self.dialect.driver == "asyncpg"
+        )
+
+    async def _copy(self, chunk: list[dict]) -> int:
+        table = self.model.__table__
+        columns = list(chunk[0])
+        connection = await self.session.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            table.name,
+            records=[tuple(row.get(column) for column in columns) for row in chunk],
+            columns=columns,
+            schema_name=table.schema,
+        )
+        # COPY идет мимо сессии, отмечаем изменения для чтения своих записей
+        self.session.info["writes"] = True
+        return len(chunk)
+
+    async def write(
+        self,
+        rows: Sequence[dict],
+        on_conflict: OnConflict | None = None,
+        index_elements: Sequence[str] | None = None,
+        update_columns: Sequence[str] | None = None,
+        use_copy: bool = False,
+        returning: bool = False,
+    ) -> BulkWriteReport:
+        """
+        Записывает строки пачками.
+
+        Args:
+            rows: Строки в виде словарей колонок (одинаковый набор ключей),
+            on_conflict: None — ошибка при конфликте, "nothing" — пропустить строку,
+                "update" — обновить существующую,
+            index_elements: Уникальные колонки конфликта (для "update" обязательно),
+            update_columns: Обновляемые колонки, по умолчанию все, кроме конфликта,
+            use_copy: Использовать COPY, если это возможно (asyncpg, без конфликтов),
+            returning: Вернуть записанные объекты в `entities`.
+
+        Returns:
+            Отчет по пачкам: число строк, записанных строк и время.
+        """
+        if use_copy and not self._can_copy(on_conflict, returning):
+            logger.debug("COPY is not available, falling back to INSERT")
+            use_copy = False
+        report = BulkWriteReport(method="copy" if use_copy else "insert")
+        for index, chunk in enumerate(self.chunks(rows)):
+            start = time.perf_counter()
+            if use_copy:
+                written = await self._copy(chunk)
+            else:
+                stmt = self._statement(
+                    chunk, on_conflict, index_elements, update_columns
+                )
+                if returning:
+                    res = await self.session.execute(stmt.returning(self.model))
+                    entities = res.scalars().all()
+                    report.entities.extend(entities)
+                    written = len(entities)
+                else:
+                    res = await self.session.execute(stmt)
+                    written = max(res.rowcount, 0)
+            report.chunks.append(
+                ChunkReport(index, len(chunk), written, time.perf_counter() - start)
+            )
+        logger.info(
+            "Bulk {} into {}: {} rows, {} written in {:.3f}s ({} chunks)",
+            report.method,
+            self.model.__tablename__,
+            report.rows,
+            report.written,
+            report.seconds,
+            len(report.chunks),
+        )
+        return report
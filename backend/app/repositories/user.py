@@ -1,9 +1,211 @@
-from models.user import User
-from repositories.base import SQLAlchemyRepository
+import datetime
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import RowMapping, bindparam, delete, func, insert, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models.user import User, UserArchive, search_document, user_search
+from repositories.base import Columns, SQLAlchemyRepository
+from repositories.bulk import BulkWriteReport, OnConflict
 from schemas.user import UserCreateDBSchema, UserUpdateSchema
 
+# Максимум id в одном IN (...) при обновлении поискового индекса
+_REINDEX_CHUNK = 500
+
+
+def _like(term: str) -> str:
+    """Шаблон LIKE для поиска подстроки (с экранированием через "/")."""
+    escaped = term.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return f"%{escaped}%"
+
 
 class UserRepository(SQLAlchemyRepository):
     model = User
     create_schema: UserCreateDBSchema
     update_schema: UserUpdateSchema
+    sortable = ("id", "username", "created_at")
+    # Минимальная длина слова поиска (триграммные индексы)
+    search_min_length = 3
+
+    @property
+    def _search_shadow(self) -> bool:
+        """Поиск через теневую таблицу FTS5, которую нужно обновлять при записи."""
+        return self.session.get_bind().dialect.name == "sqlite"
+
+    async def _written(self, ids: Sequence[int]) -> None:
+        if not ids or not self._search_shadow:
+            return
+        for i in range(0, len(ids), _REINDEX_CHUNK):
+            chunk = ids[i : i + _REINDEX_CHUNK]
+            await self.session.execute(
+                delete(user_search).where(user_search.c.rowid.in_(chunk))
+            )
+            # удаленные пользователи в индекс не попадают
+            await self.session.execute(
+                insert(user_search).from_select(
+                    ["rowid", "username", "fullname", "email"],
+                    select(User.id, User.username, User.fullname, User.email).where(
+                        User.id.in_(chunk), self.not_deleted
+                    ),
+                )
+            )
+
+    async def bulk_write(
+        self,
+        data: list[dict],
+        on_conflict: OnConflict | None = None,
+        index_elements: Sequence[str] | None = None,
+        update_columns: Sequence[str] | None = None,
+        use_copy: bool = False,
+    ) -> BulkWriteReport:
+        report = await super().bulk_write(
+            data, on_conflict, index_elements, update_columns, use_copy
+        )
+        if self._search_shadow:
+            # массовая запись не возвращает id, записанные строки ищутся по username
+            usernames = [row["username"] for row in data]
+            ids = []
+            for i in range(0, len(usernames), _REINDEX_CHUNK):
+                res = await self.session.execute(
+                    select(User.id).where(
+                        User.username.in_(usernames[i : i + _REINDEX_CHUNK])
+                    )
+                )
+                ids += res.scalars().all()
+            await self._written(ids)
+        return report
+
+    @classmethod
+    def search_terms(cls, query: str) -> list[str]:
+        """Слова поискового запроса, по которым работает индекс."""
+        return [
+            term.lower() for term in query.split() if len(term) >= cls.search_min_length
+        ]
+
+    async def search(
+        self,
+        query: str,
+        limit: int,
+        after: Sequence[Any] | None = None,
+        before: Sequence[Any] | None = None,
+        columns: Columns = None,
+        **filter_dict,
+    ) -> tuple[Sequence[RowMapping], bool]:
+        """
+        Поиск пользователей по подстрокам в username, fullname и email.
+
+        Находятся пользователи, содержащие все слова запроса. Выдача упорядочена по
+        рангу (`rank`, меньше — релевантнее) и id и разбита на страницы по ключу
+        `(rank, id)`, как в `find_by_keyset`. На SQLite ранг — bm25 по теневой
+        таблице FTS5, на PostgreSQL — `word_similarity` по триграммному индексу.
+
+        Ранг не хранится, а вычисляется при каждом запросе: bm25 зависит от статистики
+        всей таблицы FTS5, `word_similarity` — от текста пользователя. Если между
+        запросами страниц пользователей добавляют, меняют или удаляют, ранги сдвигаются
+        и курсор может пропустить или повторить строки. Стабильный порядок без этих
+        оговорок дают только фильтры и курсоры `find_by_keyset`.
+
+        Args:
+            query: Поисковый запрос (слова короче `search_min_length` не учитываются),
+            limit: Количество объектов на странице,
+            after: Ключ `(rank, id)`, после которого начинается страница,
+            before: Ключ `(rank, id)`, перед которым заканчивается страница,
+            columns: Колонки или схема для выборки (по умолчанию все колонки),
+            **filter_dict: Критерии фильтрации в виде именованных параметров.
+
+        Returns:
+            Строки страницы с колонкой `rank` и признак, что дальше (в направлении
+            чтения) есть еще объекты.
+        """
+        terms = self.search_terms(query)
+        if not terms:
+            raise ValueError("Search query has no terms to match")
+
+        columns = columns or list(self.model.__table__.columns.keys())
+        stmt = (
+            self._select(columns, "id").filter_by(**filter_dict).where(self.not_deleted)
+        )
+        if self._search_shadow:
+            rank = user_search.c.rank
+            # каждое слово — фраза, триграммный токенизатор ищет ее как подстроку
+            match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+            stmt = stmt.join(user_search, user_search.c.rowid == User.id).where(
+                user_search.c.user_search.match(match)
+            )
+        else:
+            rank = -func.word_similarity(" ".join(terms), search_document)
+            stmt = stmt.where(
+                *(
+                    search_document.like(bindparam(f"term_{i}", _like(term)), "/")
+                    for i, term in enumerate(terms)
+                )
+            )
+        stmt = stmt.add_columns(rank.label("rank"))
+        return await self._keyset_page(
+            stmt, rank, limit, after=after, before=before, columns=columns
+        )
+
+    async def archive_deleted(
+        self, deleted_before: datetime.datetime, limit: int
+    ) -> list[int]:
+        """
+        Переносит в архив до `limit` пользователей, удаленных раньше
+        `deleted_before` (момент удаления — `updated_at`).
+
+        Копирование в `user_archive` и удаление из `user` выполняются в транзакции
+        сессии, поэтому пачка переносится целиком или не переносится вовсе.
+        Повторный перенос уже архивированной строки пропускается (`ON CONFLICT DO
+        NOTHING`), так что одновременные запуски не мешают друг другу.
+
+        Returns:
+            Идентификаторы перенесенных пользователей.
+        """
+        res = await self.session.execute(
+            select(User.id)
+            .where(User.is_deleted == true(), User.updated_at < deleted_before)
+            .order_by(User.updated_at, User.id)
+            .limit(limit)
+        )
+        ids = list(res.scalars().all())
+        if not ids:
+            return ids
+
+        names = [
+            name
+            for name in UserArchive.__table__.columns.keys()
+            if name != "archived_at"
+        ]
+        dialect = self.session.get_bind().dialect.name
+        dialect_insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+        stmt = dialect_insert.get(dialect, insert)(UserArchive).from_select(
+            names,
+            select(*(getattr(User, name) for name in names)).where(User.id.in_(ids)),
+        )
+        if dialect in dialect_insert:
+            stmt = stmt.on_conflict_do_nothing()
+        await self.session.execute(stmt)
+        await self.session.execute(delete(User).where(User.id.in_(ids)))
+        await self._written(ids)
+        return ids
+
+    async def purge_archived(
+        self, archived_before: datetime.datetime, limit: int
+    ) -> int:
+        """
+        Окончательно удаляет из архива до `limit` пользователей, архивированных
+        раньше `archived_before`.
+
+        Returns:
+            Количество удаленных строк.
+        """
+        ids = (
+            select(UserArchive.id)
+            .where(UserArchive.archived_at < archived_before)
+            .order_by(UserArchive.archived_at, UserArchive.id)
+            .limit(limit)
+        )
+        res = await self.session.execute(
+            delete(UserArchive).where(UserArchive.id.in_(ids.scalar_subquery()))
+        )
+        return res.rowcount
@@ -14,3 +14,17 @@ class TokenUserData(IdResponse, ValidEmail):
     username: str
     is_superuser: bool = False
     is_deleted: bool = False
+
+
+class TokenClaims(ValidEmail):
+    """Проверенная полезная нагрузка JWT."""
+
+    exp: int
+    iat: float | None = None
+    token_type: str | None = None
+    jti: str | None = None
+    sid: str | None = None
+    id: int | None = None
+    username: str | None = None
+    is_superuser: bool = False
+    is_deleted: bool = False
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class BulkChunkResponse(BaseModel):
+    index: int = Field(title="Chunk number")
+    rows: int = Field(title="Rows sent")
+    written: int = Field(title="Rows inserted or updated")
+    seconds: float = Field(title="Execution time")
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BulkWriteResponse(BaseModel):
+    method: str = Field(title="Write method", description="insert or copy")
+    rows: int = Field(title="Rows sent")
+    written: int = Field(title="Rows inserted or updated")
+    skipped: int = Field(title="Rows skipped on conflict")
+    seconds: float = Field(title="Total execution time")
+    chunks: list[BulkChunkResponse]
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from fastapi import Query
 from pydantic import BaseModel, Field
 
@@ -17,6 +19,23 @@ class PagedParamsSchema(BaseModel):
         description="Start page number",
         alias="page[number]",
     )
+    mode: Literal["offset", "cursor"] | None = Query(
+        default="offset",
+        description="Pagination mode: by page number or by cursor (keyset)",
+    )
+    cursor: str | None = Query(
+        default=None,
+        description="Opaque cursor from next_cursor/previous_cursor (cursor mode)",
+    )
+    sort: str | None = Query(
+        default="id",
+        description="Sort key in cursor mode, '-' prefix for descending order",
+    )
+    total: Literal["exact", "estimated", "none"] | None = Query(
+        default=None,
+        description="Total count: exact, estimated (statistics/cached) or none; "
+        "by default exact in offset mode and none in cursor mode",
+    )
 
 
 class PageInfoResponse(BaseModel):
@@ -31,6 +50,10 @@ class PageInfoResponse(BaseModel):
     last: int | None
     previous: int | None
     next: int | None
+    next_cursor: str | None = Field(default=None, title="Cursor of the next page")
+    previous_cursor: str | None = Field(
+        default=None, title="Cursor of the previous page"
+    )
 
 
 class PageResponse(BaseModel):
@@ -1,7 +1,7 @@
 from typing import Self
 
 # from core.const import PWD_SPECIAL_CHARS
-from pydantic import BaseModel, EmailStr, field_validator, model_validator
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
 
 from core import exceptions
 from schemas.base import OutMixin
@@ -78,6 +78,16 @@ class UserFilterSchema(ValidEmail):
             return value.lower()
 
 
+class UserSearchSchema(BaseModel):
+    q: str | None = Field(
+        default=None,
+        min_length=3,
+        max_length=255,
+        description="Search by substrings of username, fullname and email "
+        "(words of 3+ characters); results are ranked and paged by cursor",
+    )
+
+
 class UserResponse(UserSchema, OutMixin):
     image: str | None = None
 
@@ -0,0 +1,59 @@
+"""
+Перевод существующей базы на ревизии Alembic из репозитория.
+
+Раньше ревизии создавались при сборке образа (`alembic revision --autogenerate`) и в
+репозиторий не попадали, поэтому `alembic_version` таких баз ссылается на ревизии,
+которых нет в `migrations/versions`, и `alembic upgrade head` завершается ошибкой.
+Скрипт снимает такую отметку (`alembic stamp --purge base`), после чего
+`alembic upgrade head` применяет ревизии репозитория: первая из них не пересоздает
+существующую таблицу user, а только добавляет недостающие индексы. Базы с известной
+ревизией или без отметки не изменяются.
+
+Запуск из каталога `backend/app` перед `alembic upgrade head`:
+
+    python -m scripts.adopt_migrations
+"""
+
+import asyncio
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from loguru import logger
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from core.config import settings
+
+
+async def stamped_revisions(url: str) -> set[str]:
+    """Ревизии из таблицы alembic_version (пустое множество, если таблицы нет)."""
+    engine = create_async_engine(url)
+    try:
+        async with engine.connect() as conn:
+            if not await conn.run_sync(
+                lambda sync_conn: inspect(sync_conn).has_table("alembic_version")
+            ):
+                return set()
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+            return set(result.scalars())
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    config = Config("alembic.ini")
+    known = {
+        script.revision
+        for script in ScriptDirectory.from_config(config).walk_revisions()
+    }
+    unknown = asyncio.run(stamped_revisions(settings.SQLALCHEMY_DATABASE_URI)) - known
+    if not unknown:
+        logger.info("alembic_version: неизвестных ревизий нет")
+        return
+    logger.warning("alembic_version: снимается отметка {}", ", ".join(sorted(unknown)))
+    command.stamp(config, "base", purge=True)
+
+
+if __name__ == "__main__":
+    main()
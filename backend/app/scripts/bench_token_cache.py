@@ -0,0 +1,65 @@
+"""
+Сравнение накладных расходов аутентификации на запрос.
+
+Запуск из каталога `backend/app` (нужен непустой SECRET_KEY в окружении или .env):
+
+    python -m scripts.bench_token_cache [количество итераций]
+"""
+
+import sys
+import time
+from datetime import timedelta
+
+from loguru import logger
+
+from schemas.auth import TokenUserData
+from services.helpers.security import (
+    create_token,
+    decode_token,
+    get_token_user,
+)
+from services.helpers.token_cache import token_cache
+
+
+def legacy_get_token_user(token: str) -> TokenUserData:
+    """Прежний путь: `verify_token` декодирует токен, затем он декодируется снова."""
+    payload = decode_token(token)
+    if payload.get("token_type") != "access":
+        raise ValueError("wrong token type")
+    TokenUserData(**payload)
+    payload = decode_token(token)
+    return TokenUserData(**payload)
+
+
+def measure(func, token: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(token)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def main(iterations: int) -> None:
+    user = TokenUserData(id=1, username="bench", email="bench@example.com")
+    token = create_token(
+        {**user.model_dump(), "token_type": "access"}, timedelta(minutes=5)
+    )
+
+    legacy = measure(legacy_get_token_user, token, iterations)
+
+    token_cache.clear()
+    cold = measure(
+        lambda t: (token_cache.clear(), get_token_user(t)), token, iterations
+    )
+
+    token_cache.clear()
+    warm = measure(get_token_user, token, iterations)
+
+    logger.info("iterations:           {}", iterations)
+    logger.info("legacy (2x decode):   {:8.2f} us/request", legacy)
+    logger.info("cache miss:           {:8.2f} us/request", cold)
+    logger.info("cache hit:            {:8.2f} us/request", warm)
+    logger.info("speedup (hit/legacy): {:8.1f}x", legacy / warm)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
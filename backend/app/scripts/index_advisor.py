@@ -0,0 +1,208 @@
+"""
+Проверка индексов: выполняет запросы, которые строит `UserRepository`, на базе с
+тестовыми данными и показывает их планы (EXPLAIN), отмечая полный просмотр таблицы
+и сортировку без индекса.
+
+Запуск из каталога `backend/app` (нужен непустой SECRET_KEY в окружении или .env):
+
+    python -m scripts.index_advisor [количество строк] [URL базы данных]
+
+По умолчанию используется временная база SQLite. Для PostgreSQL укажите пустую
+тестовую базу: таблица создается и заполняется в ней. Код возврата 1, если у
+какого-либо запроса найдены проблемы.
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from loguru import logger
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from models.base import DeclarativeBaseModel
+from repositories.user import UserRepository
+from schemas.user import UserResponse
+
+# Запросы, которые обслуживают API пользователей
+QUERIES: dict[str, Callable[[UserRepository], Awaitable]] = {
+    "find_one_or_none(id)": lambda r: r.find_one_or_none(id=777),
+    "find_one_or_none(username)": lambda r: r.find_one_or_none(username="user0000777"),
+    "find_one_or_none(email)": lambda r: r.find_one_or_none(
+        email="user777@example.com"
+    ),
+    "find_all(fullname)": lambda r: r.find_all(fullname="Name 7", columns=UserResponse),
+    "count()": lambda r: r.count(),
+    "find_by_page(page=5)": lambda r: r.find_by_page(20, 5, columns=UserResponse),
+    "find_by_page_counted(page=5)": lambda r: r.find_by_page_counted(
+        20, 5, columns=UserResponse
+    ),
+    **{
+        f"find_by_keyset(sort={sort})": (
+            lambda r, sort=sort: r.find_by_keyset(20, sort, columns=UserResponse)
+        )
+        for sort in UserRepository.sortable
+    },
+    "find_by_keyset(sort=username, after)": lambda r: r.find_by_keyset(
+        20, "username", after=["user0000500", 501], columns=UserResponse
+    ),
+    "find_by_keyset(sort=-created_at, after)": lambda r: r.find_by_keyset(
+        20,
+        "-created_at",
+        after=["2030-01-01T00:00:00", 501],
+        columns=UserResponse,
+    ),
+    "search(q)": lambda r: r.search("user00007", 20, columns=UserResponse),
+}
+
+# Запросы, которым полный просмотр таблицы не в упрек: точный подсчет читает все
+# неудаленные строки (для больших таблиц есть total=estimated), а SQLite хранит
+# таблицу в порядке первичного ключа, и выборка по id с LIMIT просматривает ее
+# по порядку с остановкой. Поиск находит строки по индексу, но сортирует найденное
+# по релевантности
+EXPECTED_SCANS = {
+    "search(q)",
+    "count()",
+    "find_by_page_counted(page=5)",
+    "find_by_page(page=5)",
+    "find_by_keyset(sort=id)",
+}
+
+
+@dataclass
+class Report:
+    name: str
+    statement: str
+    plan: list[str] = field(default_factory=list)
+    problems: list[str] = field(default_factory=list)
+    expected: bool = False
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.problems) and not self.expected
+
+
+async def seed(engine: AsyncEngine, rows: int) -> None:
+    """Создает таблицы и заполняет их пользователями (каждый десятый удален)."""
+    async with engine.begin() as connection:
+        await connection.run_sync(DeclarativeBaseModel.metadata.create_all)
+    async with async_sessionmaker(engine)() as session:
+        await UserRepository(session).bulk_write(
+            [
+                dict(
+                    username=f"user{i:07d}",
+                    hashed_password="-",
+                    fullname=f"Name {i % 1000}",
+                    email=f"user{i}@example.com",
+                    is_deleted=i % 10 == 0,
+                )
+                for i in range(rows)
+            ]
+        )
+        await session.commit()
+    async with engine.begin() as connection:
+        await connection.execute(text("ANALYZE"))
+
+
+def _sqlite_problems(plan: list[str]) -> list[str]:
+    problems = []
+    for detail in plan:
+        if detail.startswith("SCAN ") and "INDEX" not in detail:
+            problems.append(f"full scan: {detail}")
+        if "TEMP B-TREE" in detail:
+            problems.append(f"sort without index: {detail}")
+    return problems
+
+
+def _postgresql_plan(node: dict, plan: list[str], problems: list[str]) -> None:
+    detail = " ".join(
+        filter(
+            None, [node["Node Type"], node.get("Relation Name"), node.get("Index Name")]
+        )
+    )
+    plan.append(detail)
+    if node["Node Type"] == "Seq Scan":
+        problems.append(f"full scan: {detail}")
+    if node["Node Type"] == "Sort":
+        problems.append(f"sort without index: {', '.join(node.get('Sort Key', []))}")
+    for child in node.get("Plans", []):
+        _postgresql_plan(child, plan, problems)
+
+
+async def explain(engine: AsyncEngine, statement: str, parameters) -> Report:
+    report = Report(name="", statement=statement)
+    async with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            rows = await connection.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            )
+            report.plan = [row[-1] for row in rows]
+            report.problems = _sqlite_problems(report.plan)
+        else:
+            rows = await connection.exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {statement}", parameters
+            )
+            result = rows.scalar_one()
+            result = json.loads(result) if isinstance(result, str) else result
+            _postgresql_plan(result[0]["Plan"], report.plan, report.problems)
+    return report
+
+
+async def advise(engine: AsyncEngine) -> list[Report]:
+    """Выполняет запросы репозитория и возвращает планы каждого из них."""
+    captured: list[tuple[str, object]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith("EXPLAIN"):
+            captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    reports = []
+    try:
+        for name, query in QUERIES.items():
+            captured.clear()
+            async with async_sessionmaker(engine)() as session:
+                await query(UserRepository(session))
+            for statement, parameters in list(captured):
+                report = await explain(engine, statement, parameters)
+                report.name = name
+                report.expected = name in EXPECTED_SCANS
+                reports.append(report)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+    return reports
+
+
+async def main(rows: int, url: str | None) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(url or f"sqlite+aiosqlite:///{tmp}/advisor.db")
+        try:
+            await seed(engine, rows)
+            reports = await advise(engine)
+        finally:
+            await engine.dispose()
+
+    for report in reports:
+        status = "PROBLEM" if report.failed else "expected" if report.problems else "ok"
+        log = logger.error if report.failed else logger.info
+        log("[{}] {}", status, report.name)
+        log("    {}", " ".join(report.statement.split()))
+        for line in report.plan:
+            log("    > {}", line)
+        for problem in report.problems:
+            log("    ! {}", problem)
+    return int(any(report.failed for report in reports))
+
+
+if __name__ == "__main__":
+    sys.exit(
+        asyncio.run(
+            main(
+                int(sys.argv[1]) if len(sys.argv) > 1 else 20_000,
+                sys.argv[2] if len(sys.argv) > 2 else None,
+            )
+        )
+    )
@@ -0,0 +1,80 @@
+import asyncio
+import datetime
+from dataclasses import dataclass
+
+from loguru import logger
+
+from cache.cache import get_cache
+from core.session_manager import db_manager, init_db_manager
+from repositories.user import UserRepository
+
+
+@dataclass(slots=True)
+class ArchiveReport:
+    """Результат одного запуска архивации."""
+
+    archived: int = 0
+    purged: int = 0
+    batches: int = 0
+    # остались ли строки сверх лимита пачек этого запуска
+    done: bool = True
+
+
+async def archive_users(
+    archive_after: datetime.timedelta,
+    purge_after: datetime.timedelta,
+    batch_rows: int = 500,
+    max_batches: int = 100,
+    pause: float = 0.5,
+) -> ArchiveReport:
+    """
+    Переносит давно удаленных пользователей в архив и очищает старый архив.
+
+    Каждая пачка — отдельная короткая транзакция, между пачками выдерживается пауза,
+    чтобы не занимать соединение с БД (и единственного писателя SQLite) надолго.
+    Обработанные строки уходят из выборки, поэтому прерванный запуск продолжается
+    следующим с того же места. Кэш перенесенных пользователей сбрасывается.
+    """
+    if not db_manager.initialized:
+        init_db_manager()
+    cache = get_cache()
+    report = ArchiveReport()
+    now = datetime.datetime.now(datetime.UTC)
+
+    for _ in range(max_batches):
+        async with db_manager.session() as session:
+            ids = await UserRepository(session).archive_deleted(
+                now - archive_after, batch_rows
+            )
+            await session.commit()
+        if ids:
+            await cache.delete_many([f"user:{_id}" for _id in ids])
+            report.archived += len(ids)
+            report.batches += 1
+        if len(ids) < batch_rows:
+            break
+        await asyncio.sleep(pause)
+    else:
+        report.done = False
+
+    for _ in range(max_batches):
+        async with db_manager.session() as session:
+            purged = await UserRepository(session).purge_archived(
+                now - purge_after, batch_rows
+            )
+            await session.commit()
+        report.purged += purged
+        report.batches += bool(purged)
+        if purged < batch_rows:
+            break
+        await asyncio.sleep(pause)
+    else:
+        report.done = False
+
+    logger.info(
+        "Users archived: {}, purged: {} in {} batches",
+        report.archived,
+        report.purged,
+        report.batches,
+    )
+    return report
@@ -2,6 +2,9 @@ from sqlalchemy.exc import IntegrityError
 
 from cache.base import AbstractCache
 from cache.cache import get_cache
+from services.helpers.revocation import revocation_list
+from cache.sessions import AbstractSessionStore
+from services.helpers.sessions import get_session_store
 from core import exceptions
 from core.config import settings
 from repositories.user import UserRepository
@@ -10,9 +13,11 @@ from schemas.user import UserCreateSchema, UserCreateDBSchema, UserResponse
 from services import celery
 from services.base import QueryService
 from services.helpers.security import (
-    verify_pwd,
+    verify_pwd_async,
     get_token_user,
     create_jwt_tokens,
+    decode_claims,
+    new_token_id,
     get_token_email,
     confirm_pwd,
 )
@@ -20,11 +25,14 @@ from services.helpers.security import (
 
 class AuthService(QueryService):
     cache: AbstractCache = get_cache()
+    sessions: AbstractSessionStore = get_session_store()
     exp: int = settings.CACHE_EXPIRE_SEC
 
     async def create_one(self, info_form: UserCreateSchema):
         try:
-            password = confirm_pwd(info_form.password, info_form.confirmation_password)
+            password = await confirm_pwd(
+                info_form.password, info_form.confirmation_password
+            )
             user = info_form.model_dump()
             user["hashed_password"] = password
             _obj = await UserRepository(self.session).add_one(
@@ -39,43 +47,42 @@ class AuthService(QueryService):
             raise exceptions.USER_EXCEPTION_CONFLICT_USERNAME_SIGNUP
 
     async def login(self, form_data):
+        ttl = settings.REFRESH_TOKEN_EXPIRE_HOURS * 60 * 60
+        refresh_id = new_token_id()
         if form_data.grant_type == "refresh_token":
-            user = await self.authenticate_user_token(token=form_data.refresh_token)
+            user, claims = await self.authenticate_user_token(
+                token=form_data.refresh_token
+            )
+            if not await self.sessions.rotate(
+                user.id, claims.sid, claims.jti, refresh_id, ttl
+            ):
+                # повторное использование старого refresh токена: сессия скомпрометирована
+                await self.sessions.revoke(user.id, claims.sid)
+                raise exceptions.CREDENTIALS_EXCEPTION_INVALID
             tokens = create_jwt_tokens(
                 user_data=TokenUserData.model_validate(user),
-                refresh_token=form_data.refresh_token,
+                session_id=claims.sid,
+                refresh_id=refresh_id,
             )
         else:
             user = await self.authenticate_user_pwd(
                 username=form_data.username,
                 password=form_data.password,
             )
-            tokens = create_jwt_tokens(TokenUserData.model_validate(user.to_dict()))
-        if not user:
-            raise exceptions.USER_EXCEPTION_WRONG_PARAMETER
-        _obj = await UserRepository(self.session).edit_one(
-            user.id, {"refresh_token": tokens.refresh_token}
-        )
-        if not _obj:
-            raise exceptions.CREDENTIALS_EXCEPTION_LOGIN
-        await self.session.commit()
+            session_id = new_token_id()
+            await self.sessions.create(user.id, session_id, refresh_id, ttl)
+            tokens = create_jwt_tokens(
+                TokenUserData.model_validate(user.to_dict()), session_id, refresh_id
+            )
         return tokens
 
     async def logout(self, token):
+        claims = decode_claims(token)
         user_token = get_token_user(token)
 
-        user_db = await UserRepository(self.session).find_one_or_none(
-            username=user_token.username
-        )
-
-        if not user_db or not user_db.refresh_token:
+        if not claims.sid or not await self.sessions.revoke(user_token.id, claims.sid):
             raise exceptions.USER_EXCEPTION_WRONG_PARAMETER
-        _obj = await UserRepository(self.session).edit_one(
-            user_db.id, {"refresh_token": None}
-        )
-        if not _obj:
-            raise exceptions.CREDENTIALS_EXCEPTION_LOGOUT
-        await self.session.commit()
+        await revocation_list.revoke(claims.jti, claims.exp)
         return {"detail": "Logout successful"}
 
     async def forgot_password(self, email):
@@ -91,14 +98,26 @@ class AuthService(QueryService):
         }
 
     async def reset_password(self, token, pwd_data):
+        claims = decode_claims(token)
+        if await revocation_list.is_revoked(claims.jti):
+            raise exceptions.CREDENTIALS_EXCEPTION_REVOKED
         email = get_token_email(token)
         user_db = await self._identification_by_email(email)
-        password = confirm_pwd(pwd_data.password, pwd_data.confirmation_password)
-        _obj = await UserRepository(self.session).edit_one(
+        await self.release_connection()
+        password = await confirm_pwd(pwd_data.password, pwd_data.confirmation_password)
+        # ссылка для сброса пароля одноразовая: из параллельных запросов с ней
+        # пароль меняет только тот, кто первым отозвал ее jti
+        if not await revocation_list.claim(claims.jti, claims.exp):
+            raise exceptions.CREDENTIALS_EXCEPTION_REVOKED
+        await UserRepository(self.session).edit_one(
             user_db.id, dict(hashed_password=password)
         )
         await self.session.commit()
-        await self.session.refresh(_obj)
+        await self.sessions.revoke_all(user_db.id)
+        # уже выданные access-токены действуют до истечения, их отзываем все сразу
+        await revocation_list.revoke_user(
+            user_db.id, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60 + 1
+        )
         return {"detail": "Success", "success": True}
 
     async def _identification_by_username(self, username):
@@ -115,15 +134,22 @@ class AuthService(QueryService):
 
     async def authenticate_user_pwd(self, username, password):
         user = await self._identification_by_username(username=username)
-        if not user or not verify_pwd(password, user.hashed_password):
+        # проверка пароля долгая, соединение на это время не нужно
+        await self.release_connection()
+        if not user or not await verify_pwd_async(password, user.hashed_password):
             raise exceptions.USER_EXCEPTION_WRONG_PARAMETER
         return user
 
     async def authenticate_user_token(self, token):
+        claims = decode_claims(token, "refresh")
         user = get_token_user(token, "refresh")
+        if not claims.sid or not claims.jti:
+            raise exceptions.CREDENTIALS_EXCEPTION_INVALID
         user_db = await UserRepository(self.session).find_one_or_none(
             username=user.username
         )
         if not user_db:
             raise exceptions.USER_EXCEPTION_WRONG_PARAMETER
-        return user
+        # дальше сессия refresh-токена меняется в хранилище сессий
+        await self.release_connection()
+        return user, claims
@@ -4,6 +4,7 @@ from typing import TypeVar
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.session_manager import LazySession
 from repositories.base import SQLAlchemyRepository
 
 RepositoryType = TypeVar("RepositoryType", bound=SQLAlchemyRepository)
@@ -46,4 +47,18 @@ class QueryService(ABC):
     def __init__(self, session: AsyncSession):
         self.session: AsyncSession = session
 
+    async def release_connection(self) -> None:
+        """
+        Возвращает соединение сессии в пул перед долгой работой без БД (например,
+        хешированием пароля) или перед обращением к БД через другую сессию.
+
+        Загруженные объекты остаются доступны, следующий запрос сессии возьмет
+        соединение заново. С профилем SQLite пишущее соединение одно на процесс, и
+        удерживать его без запросов нельзя.
+        """
+        if isinstance(self.session, LazySession):
+            await self.session.release()
+        else:
+            await self.session.close()
+
     repository: SQLAlchemyRepository
@@ -1,28 +1,74 @@
 import asyncio
+import datetime
+import threading
 
 from celery import Celery
 
 from core.config import settings
+from services.archive import archive_users
 from services.mailer import send_reset_pwd
 
 celery = Celery(__name__)
 if settings.CELERY_BROKER_URL:
     celery.conf.broker_url = settings.CELERY_BROKER_URL
     celery.conf.broker_connection_retry_on_startup = True
-    loop = asyncio.get_event_loop()
 else:
     celery.conf.task_always_eager = True
+# цикл событий процесса для корутин задач (соединения пула БД привязаны к нему)
+loop = asyncio.new_event_loop()
+# цикл не может выполнять две задачи сразу (пул потоков или gevent у воркера)
+_loop_lock = threading.Lock()
+# задачи, запущенные в eager-режиме в работающем цикле приложения
+_background: set[asyncio.Task] = set()
+
+if settings.USER_ARCHIVE_INTERVAL_SEC:
+    celery.conf.beat_schedule = {
+        "archive-users": {
+            "task": "archive_users_task",
+            "schedule": settings.USER_ARCHIVE_INTERVAL_SEC,
+        },
+    }
 
 
 def perform_async_task(coro):
+    """
+    Выполняет корутину задачи и возвращает ее результат.
+
+    В eager-режиме (без брокера) задача может быть вызвана из работающего цикла
+    приложения: тогда корутина запускается в нем в фоне, а результат — None.
+    """
     if celery.conf.task_always_eager:
-        asyncio.gather(coro)
-    else:
-        task = loop.create_task(coro)
-        loop.run_until_complete(task)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            task = running.create_task(coro)
+            _background.add(task)
+            task.add_done_callback(_background.discard)
+            return None
+    with _loop_lock:
+        return loop.run_until_complete(coro)
 
 
 @celery.task(name="send_reset_pwd_task", ignore_result=True)
 def send_reset_pwd_task(email: str):
     """Задача отправки ссылки для сброса пароля."""
     send_reset_pwd(email)
+
+
+@celery.task(name="archive_users_task", bind=True, ignore_result=True)
+def archive_users_task(self):
+    """Задача переноса удаленных пользователей в архив и очистки архива."""
+    report = perform_async_task(
+        archive_users(
+            archive_after=datetime.timedelta(days=settings.USER_ARCHIVE_AFTER_DAYS),
+            purge_after=datetime.timedelta(days=settings.USER_PURGE_AFTER_DAYS),
+            batch_rows=settings.USER_ARCHIVE_BATCH_ROWS,
+            max_batches=settings.USER_ARCHIVE_MAX_BATCHES,
+            pause=settings.USER_ARCHIVE_BATCH_PAUSE_SEC,
+        )
+    )
+    if report is not None and not report.done:
+        # остаток — следующим запуском, не дожидаясь расписания
+        self.apply_async(countdown=settings.USER_ARCHIVE_BATCH_PAUSE_SEC)
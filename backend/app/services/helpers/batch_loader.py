@@ -0,0 +1,206 @@
+import asyncio
+import contextvars
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from loguru import logger
+
+from cache.base import AbstractCache
+from core.session_manager import db_manager
+from repositories.base import Columns, SQLAlchemyRepository
+
+
+class BatchLoader:
+    """
+    Объединение чтений объектов по id, сделанных за один проход цикла событий.
+
+    Все вызовы `load`, пришедшие до следующего прохода цикла (в том числе из разных
+    HTTP-запросов), обслуживаются одним чтением нескольких ключей кэша и одним
+    запросом `WHERE id IN (...)` для промахов. Найденное в БД записывается в кэш
+    одним обращением, затем каждому вызову возвращаются его байты.
+
+    Запрос к БД выполняется в отдельной сессии: пачка общая и не принадлежит
+    ни одному из запросов. Если хотя бы одному вызову нужно видеть свои записи,
+    пачка читает с основной БД, а не с реплики. Одновременный вызов по id, который
+    уже загружается, ждет ту же загрузку.
+
+    С `stale_timeout` запись кэша живет `timeout + stale_timeout` секунд. Последние
+    `stale_timeout` секунд она отдается как устаревшая, а пачка запускает одно
+    фоновое обновление таких id (не более одного на id в воркере).
+    """
+
+    def __init__(
+        self,
+        repository: type[SQLAlchemyRepository],
+        namespace: str,
+        dump: Callable[[Any], bytes],
+        columns: Columns,
+        cache: AbstractCache,
+        timeout: int,
+        stale_timeout: int = 0,
+        max_keys: int = 500,
+    ) -> None:
+        """
+        Args:
+            repository: Класс репозитория модели,
+            namespace: Префикс ключей кэша (`{namespace}:{id}`),
+            dump: Преобразование строки БД в байты для кэша и ответа,
+            columns: Колонки или схема для выборки,
+            cache: Кэш объектов,
+            timeout: Время жизни записи кэша,
+            stale_timeout: Дополнительное время жизни устаревшей записи,
+            max_keys: Максимум id в одной пачке.
+        """
+        self.repository = repository
+        self.namespace = namespace
+        self.dump = dump
+        self.columns = columns
+        self.cache = cache
+        self.timeout = timeout
+        self.stale_timeout = stale_timeout
+        self.max_keys = max_keys
+        # ожидают следующего прохода цикла и уже загружаются
+        self._queued: dict[int, asyncio.Future] = {}
+        self._in_flight: dict[int, asyncio.Future] = {}
+        self._primary = False
+        self._tasks: set[asyncio.Task] = set()
+        self._refreshing: set[int] = set()
+        self.loads = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.cache_hits = 0
+        self.db_queries = 0
+        self.refreshes = 0
+
+    async def load(self, _id: int) -> bytes | None:
+        """Возвращает байты объекта по id или None, если его нет (или он удален)."""
+        self.loads += 1
+        primary = db_manager.needs_primary()
+        future = self._queued.get(_id)
+        if future is None and not primary:
+            # загрузка с реплики могла начаться до своей записи вызывающего
+            future = self._in_flight.get(_id)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            # исключение без ожидающих не должно попадать в лог как «не полученное»
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            if not self._queued:
+                # пачка не должна унаследовать контекст первого запроса
+                asyncio.get_running_loop().call_soon(
+                    self._dispatch, context=contextvars.Context()
+                )
+            self._queued[_id] = future
+        self._primary = self._primary or primary
+        # отмена одного вызова не отменяет загрузку для остальных
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        queued, self._queued = self._queued, {}
+        primary, self._primary = self._primary, False
+        ids = list(queued)
+        for i in range(0, len(ids), self.max_keys):
+            batch = {_id: queued[_id] for _id in ids[i : i + self.max_keys]}
+            self._in_flight.update(batch)
+            task = asyncio.create_task(self._load_batch(batch, primary))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _load_batch(
+        self, batch: dict[int, asyncio.Future], primary: bool
+    ) -> None:
+        self.batches += 1
+        try:
+            results = await self._fetch(list(batch), primary)
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.warning("Batch load of {} failed: {}", self.namespace, e)
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _id, future in batch.items():
+                if not future.done():
+                    future.set_result(results.get(_id))
+        finally:
+            for _id, future in batch.items():
+                if self._in_flight.get(_id) is future:
+                    del self._in_flight[_id]
+
+    async def _fetch(self, ids: Sequence[int], primary: bool) -> dict[int, bytes]:
+        keys = [f"{self.namespace}:{_id}" for _id in ids]
+        if self.stale_timeout:
+            entries = await self.cache.get_raw_many_with_ttl(keys)
+            values = [value for value, _ in entries]
+            stale = [
+                _id
+                for _id, (value, ttl) in zip(ids, entries)
+                if value is not None and ttl is not None and ttl <= self.stale_timeout
+            ]
+            if stale:
+                self._refresh_in_background(stale)
+        else:
+            values = await self.cache.get_raw_many(keys)
+        results = {_id: value for _id, value in zip(ids, values) if value is not None}
+        self.cache_hits += len(results)
+        missing = [_id for _id in ids if _id not in results]
+        if not missing:
+            return results
+
+        found = await self._load_from_db(missing, primary)
+        return results | found
+
+    async def _load_from_db(
+        self, ids: Sequence[int], primary: bool
+    ) -> dict[int, bytes]:
+        self.db_queries += 1
+        session_factory = db_manager.session if primary else db_manager.read_session
+        async with session_factory() as session:
+            rows = await self.repository(session).find_by_ids(ids, columns=self.columns)
+        found = {row["id"]: self.dump(row) for row in rows}
+        if found:
+            await self.cache.set_raw_many(
+                {f"{self.namespace}:{_id}": value for _id, value in found.items()},
+                self.timeout,
+                self.stale_timeout,
+            )
+        return found
+
+    def _refresh_in_background(self, ids: Sequence[int]) -> None:
+        ids = [_id for _id in ids if _id not in self._refreshing]
+        if not ids:
+            return
+        self._refreshing.update(ids)
+        task = asyncio.get_running_loop().create_task(
+            self._refresh(ids), context=contextvars.Context()
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, ids: Sequence[int]) -> None:
+        self.refreshes += 1
+        try:
+            found = await self._load_from_db(ids, primary=False)
+            # удаленные за это время объекты не должны отдаваться из кэша
+            gone = [f"{self.namespace}:{_id}" for _id in ids if _id not in found]
+            if gone:
+                await self.cache.delete_many(gone)
+        except Exception as e:
+            logger.warning("Background refresh of {} failed: {}", self.namespace, e)
+        finally:
+            self._refreshing.difference_update(ids)
+
+    def stats(self) -> dict:
+        return {
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "cache_hits": self.cache_hits,
+            "db_queries": self.db_queries,
+            "refreshes": self.refreshes,
+            "in_flight": len(self._in_flight),
+        }
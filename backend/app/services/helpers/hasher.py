@@ -0,0 +1,126 @@
+import asyncio
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any
+
+from loguru import logger
+
+from core import exceptions, metrics
+from core.config import settings
+from utils import singleton
+
+
+def _timed_call(func: Callable[..., Any], *args: Any) -> tuple[Any, float]:
+    """Выполняет функцию в воркере и возвращает результат и время выполнения."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+@singleton
+class PasswordHasher:
+    """
+    Пул воркеров для CPU-тяжелых операций с паролями (bcrypt).
+
+    Вызовы выполняются вне цикла событий. Количество ожидающих задач ограничено:
+    при переполнении очереди новая задача отклоняется с ответом 503, чтобы всплеск
+    логинов не копил бесконечную очередь и не держал соединения клиентов.
+    """
+
+    def __init__(
+        self,
+        executor: str = "thread",
+        workers: int | None = None,
+        max_queue: int = 64,
+    ) -> None:
+        self._executor_type = executor
+        self._workers = workers or os.cpu_count() or 1
+        self._max_pending = self._workers + max_queue
+        self._executor: Executor | None = None
+
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self._workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers, thread_name_prefix="pwd-hasher"
+                )
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполняет функцию в пуле воркеров.
+
+        Args:
+            func: Синхронная функция уровня модуля (для пула процессов должна
+                сериализоваться pickle),
+            *args: Аргументы функции.
+
+        Raises:
+            HTTPException: 503, если очередь пула заполнена.
+        """
+        if self._pending >= self._max_pending:
+            self._rejected += 1
+            logger.warning("Password hasher is saturated, pending={}", self._pending)
+            raise exceptions.SERVICE_EXCEPTION_OVERLOADED
+
+        self._pending += 1
+        submitted = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, run_time = await loop.run_in_executor(
+                self._get_executor(), _timed_call, func, *args
+            )
+        finally:
+            self._pending -= 1
+
+        total = time.perf_counter() - submitted
+        self._completed += 1
+        self._run_total += run_time
+        self._wait_total += max(total - run_time, 0.0)
+        self._run_max = max(self._run_max, run_time)
+        return result
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    def stats(self) -> dict:
+        """Метрики пула: глубина очереди, отказы и задержки (в секундах)."""
+        completed = self._completed or 1
+        return {
+            "executor": self._executor_type,
+            "workers": self._workers,
+            "pending": self._pending,
+            "queued": max(self._pending - self._workers, 0),
+            "max_pending": self._max_pending,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_wait": self._wait_total / completed,
+            "avg_run": self._run_total / completed,
+            "max_run": self._run_max,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hasher: PasswordHasher = PasswordHasher(
+    executor=settings.PWD_HASH_EXECUTOR,
+    workers=settings.PWD_HASH_WORKERS,
+    max_queue=settings.PWD_HASH_MAX_QUEUE,
+)
+metrics.register("password_hasher", hasher.stats)
@@ -1,6 +1,25 @@
-def paginate(limit: int, offset: int, total: int) -> dict[str, int | None]:
-    last_page = total // limit + 1 if total % limit else total // limit
-    next_page = offset + 1 if offset < last_page else None
+import base64
+import binascii
+from typing import Any
+
+import orjson
+
+
+def paginate(
+    limit: int, offset: int, total: int | None, size: int | None = None
+) -> dict[str, int | None]:
+    """
+    Номера страниц для постраничного вывода.
+
+    Без `total` последняя страница неизвестна, и следующая страница считается
+    существующей, если текущая заполнена (`size == limit`).
+    """
+    if total is None:
+        last_page = None
+        next_page = offset + 1 if size == limit else None
+    else:
+        last_page = total // limit + 1 if total % limit else total // limit
+        next_page = offset + 1 if offset < last_page else None
     prev_page = offset - 1 if (offset - 1) > 0 else None
 
     pagination_info = {
@@ -14,3 +33,25 @@ def paginate(limit: int, offset: int, total: int) -> dict[str, int | None]:
     }
 
     return pagination_info
+
+
+def encode_cursor(sort: str, direction: str, key: tuple[Any, Any]) -> str:
+    """
+    Кодирует курсор страницы: поле сортировки, направление и ключ `(sort, id)`.
+
+    Для клиента курсор непрозрачен (base64 без выравнивания).
+    """
+    data = orjson.dumps([sort, direction, *key])
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, str, tuple[Any, Any]]:
+    """Разбирает курсор `encode_cursor`, при ошибке — `ValueError`."""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort, direction, value, _id = orjson.loads(data)
+    except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if direction not in ("next", "prev") or not isinstance(sort, str):
+        raise ValueError("Invalid cursor")
+    return sort, direction, (value, _id)
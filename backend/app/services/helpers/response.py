@@ -0,0 +1,50 @@
+import hashlib
+from dataclasses import dataclass
+
+from fastapi import Request, Response, status
+from pydantic import BaseModel
+
+_SEPARATOR = b"\n"
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+    """
+    Готовое тело JSON-ответа с типом содержимого и ETag.
+
+    В кэше хранится одной байтовой строкой (`dump`), поэтому при попадании ответ
+    отдается как есть: без валидации по `response_model` и повторной сериализации.
+    """
+
+    body: bytes
+    etag: str
+    media_type: str = "application/json"
+
+    @classmethod
+    def from_model(cls, model: BaseModel) -> "CachedResponse":
+        body = model.model_dump_json().encode()
+        return cls(body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+
+    def dump(self) -> bytes:
+        return _SEPARATOR.join(
+            (self.etag.encode(), self.media_type.encode(), self.body)
+        )
+
+    @classmethod
+    def load(cls, data: bytes) -> "CachedResponse":
+        etag, media_type, body = data.split(_SEPARATOR, 2)
+        return cls(body, etag.decode(), media_type.decode())
+
+    def matches(self, if_none_match: str | None) -> bool:
+        """Проверяет заголовок `If-None-Match` (слабое сравнение)."""
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags
+
+    def to_response(self, request: Request | None = None) -> Response:
+        """Возвращает ответ, или 304 без тела, если у клиента та же версия."""
+        headers = {"ETag": self.etag}
+        if request is not None and self.matches(request.headers.get("if-none-match")):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(self.body, media_type=self.media_type, headers=headers)
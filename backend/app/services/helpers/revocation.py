@@ -0,0 +1,120 @@
+import datetime
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from cache.cache import get_redis_cache
+from cache.revocation import (
+    AbstractRevocationStore,
+    RedisRevocationStore,
+    TokenRevocationList,
+    user_key,
+)
+from core import metrics
+from core.config import settings
+from core.session_manager import db_manager
+from models.user import RevokedToken
+
+
+class DatabaseRevocationStore(AbstractRevocationStore):
+    """
+    Отзывы в таблице `revoked_token` основной БД (запуск без Redis).
+
+    Общие для всех воркеров и переживают перезапуск. Возрастающий `id` строки —
+    курсор журнала; повторный отзыв пользователя заменяет строку, поэтому попадает
+    в журнал заново. Уникальный `key` делает `claim` атомарным.
+    """
+
+    @staticmethod
+    def _now() -> datetime.datetime:
+        return datetime.datetime.now(datetime.UTC)
+
+    async def _insert(
+        self, key: str, ttl: int, not_before: float | None = None, replace=False
+    ) -> bool:
+        now = self._now()
+        stale = RevokedToken.key == key
+        if not replace:
+            # истекший отзыв с тем же ключом не мешает новому
+            stale &= RevokedToken.expires_at <= now
+        async with db_manager.session() as session:
+            await session.execute(delete(RevokedToken).where(stale))
+            try:
+                await session.execute(
+                    insert(RevokedToken).values(
+                        key=key,
+                        not_before=not_before,
+                        expires_at=now + datetime.timedelta(seconds=ttl),
+                    )
+                )
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+                return False
+        return True
+
+    async def _active(self, key: str) -> RevokedToken | None:
+        async with db_manager.session() as session:
+            return await session.scalar(
+                select(RevokedToken).where(
+                    RevokedToken.key == key, RevokedToken.expires_at > self._now()
+                )
+            )
+
+    async def add(self, jti: str, ttl: int) -> None:
+        await self._insert(jti, ttl)
+
+    async def claim(self, jti: str, ttl: int) -> bool:
+        return await self._insert(jti, ttl)
+
+    async def contains(self, jti: str) -> bool:
+        return await self._active(jti) is not None
+
+    async def set_not_before(self, user_id: int, timestamp: float, ttl: int) -> None:
+        await self._insert(user_key(user_id), ttl, timestamp, replace=True)
+
+    async def not_before(self, user_id: int) -> float | None:
+        entry = await self._active(user_key(user_id))
+        return entry.not_before if entry is not None else None
+
+    async def changes(self, cursor: str | None) -> tuple[list[str], str | None]:
+        async with db_manager.session() as session:
+            res = await session.execute(
+                select(RevokedToken.id, RevokedToken.key)
+                .where(RevokedToken.id > int(cursor or 0))
+                .order_by(RevokedToken.id)
+                .limit(1000)
+            )
+            rows = res.all()
+        if not rows:
+            return [], cursor
+        return [key for _, key in rows], str(rows[-1].id)
+
+    async def snapshot(self) -> tuple[list[str], str | None]:
+        async with db_manager.session() as session:
+            await session.execute(
+                delete(RevokedToken).where(RevokedToken.expires_at <= self._now())
+            )
+            await session.commit()
+            res = await session.execute(
+                select(RevokedToken.id, RevokedToken.key).order_by(RevokedToken.id)
+            )
+            rows = res.all()
+        cursor = str(rows[-1].id) if rows else None
+        return [key for _, key in rows], cursor
+
+
+def get_revocation_store() -> AbstractRevocationStore:
+    """Возвращает хранилище отзывов в зависимости от настроек приложения."""
+    if settings.REDIS_HOST:
+        return RedisRevocationStore(get_redis_cache())
+    # отзывы в памяти видны только воркеру, который их сделал
+    return DatabaseRevocationStore()
+
+
+revocation_list: TokenRevocationList = TokenRevocationList(
+    get_revocation_store(),
+    capacity=settings.REVOCATION_FILTER_CAPACITY,
+    error_rate=settings.REVOCATION_FILTER_ERROR_RATE,
+)
+metrics.register("token_revocation", revocation_list.stats)
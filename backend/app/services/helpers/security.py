@@ -1,3 +1,4 @@
+import uuid
 from datetime import datetime, timedelta, timezone
 
 import bcrypt
@@ -5,10 +6,13 @@ import jwt
 from fastapi import Form
 from fastapi import Request, WebSocket
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from pydantic import ValidationError
 
 from core import exceptions
 from core.config import settings
-from schemas.auth import TokenUserData, TokenResponse
+from schemas.auth import TokenUserData, TokenResponse, TokenClaims
+from services.helpers.hasher import hasher
+from services.helpers.token_cache import token_cache
 
 
 def now_utc():
@@ -67,6 +71,16 @@ def verify_pwd(plain_pwd: str, hashed_pwd: str) -> bool:
     return bcrypt.checkpw(*to_bits(plain_pwd, hashed_pwd))
 
 
+async def hash_pwd_async(pwd: str) -> str:
+    """Хеширует пароль в пуле воркеров, не блокируя цикл событий."""
+    return await hasher.run(hash_pwd, pwd)
+
+
+async def verify_pwd_async(plain_pwd: str, hashed_pwd: str) -> bool:
+    """Проверяет пароль в пуле воркеров, не блокируя цикл событий."""
+    return await hasher.run(verify_pwd, plain_pwd, hashed_pwd)
+
+
 def encode_token(data: dict) -> str:
     return jwt.encode(data, settings.SECRET_KEY, settings.ALGORITHM)
 
@@ -75,10 +89,15 @@ def decode_token(data) -> dict:
     return jwt.decode(data, settings.SECRET_KEY, [settings.ALGORITHM])
 
 
-def confirm_pwd(password, confirmation_password):
+async def confirm_pwd(password, confirmation_password):
     if password != confirmation_password:
         raise exceptions.USER_EXCEPTION_CONFIRMATION_PASSWORD
-    return hash_pwd(password)
+    return await hash_pwd_async(password)
+
+
+def new_token_id() -> str:
+    """Случайный идентификатор токена (`jti`) или сессии (`sid`)."""
+    return uuid.uuid4().hex
 
 
 def create_token(data: dict, delta: timedelta) -> str:
@@ -90,36 +109,90 @@ def create_token(data: dict, delta: timedelta) -> str:
     Returns:
         Закодированный токен.
     """
-    expires_delta = now_utc() + delta
-    data.update({"exp": expires_delta})
+    now = now_utc()
+    # дробное iat: токен, выданный сразу после сброса пароля, новее отзыва
+    data.update({"exp": now + delta, "iat": now.timestamp()})
+    data.setdefault("jti", new_token_id())
 
     return encode_token(data)
 
 
 def create_jwt_tokens(
-    user_data: TokenUserData, refresh_token: str | None = None
+    user_data: TokenUserData, session_id: str, refresh_id: str
 ) -> TokenResponse:
     """Создает пару токенов: access_token, refresh_token.
-    Если есть refresh токен, то он не обновляется
+    Оба токена привязаны к сессии устройства `session_id`.
     Args:
         user_data: данные пользователя,
-        refresh_token: refresh токен.
+        session_id: идентификатор refresh-сессии,
+        refresh_id: идентификатор (`jti`) нового refresh токена.
 
     Returns:
         `TokenResponse`.
     """
     access_token = create_token(
-        {**user_data.model_dump(), "token_type": "access"},
+        {**user_data.model_dump(), "token_type": "access", "sid": session_id},
         timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
     )
-    if not refresh_token:
-        refresh_token: str = create_token(
-            {**user_data.model_dump(), "token_type": "refresh"},
-            timedelta(hours=settings.REFRESH_TOKEN_EXPIRE_HOURS),
-        )
+    refresh_token = create_token(
+        {
+            **user_data.model_dump(),
+            "token_type": "refresh",
+            "sid": session_id,
+            "jti": refresh_id,
+        },
+        timedelta(hours=settings.REFRESH_TOKEN_EXPIRE_HOURS),
+    )
     return TokenResponse(access_token=access_token, refresh_token=refresh_token)
 
 
+def decode_claims(token: str, token_type: str | None = None) -> TokenClaims:
+    """
+    Проверяет токен и возвращает его полезную нагрузку.
+
+    Подпись проверяется один раз, результат кэшируется до истечения срока токена,
+    поэтому повторные запросы с тем же токеном не декодируют его заново.
+    Если нет типа токена, то тип не проверяется.
+
+    Args:
+        token: Закодированный токен,
+        token_type: Тип токена (access или refresh или None).
+
+    Returns:
+        TokenClaims: Проверенные данные токена.
+
+    Raises:
+        CredentialsException: токен недействителен.
+    """
+    return _decode_cached(token, token_type)[0]
+
+
+def _decode_cached(
+    token: str, token_type: str | None = None
+) -> tuple[TokenClaims, TokenUserData | None]:
+    if (cached := token_cache.get(token)) is None:
+        try:
+            payload = decode_token(token)
+        except jwt.ExpiredSignatureError:
+            raise exceptions.CREDENTIALS_EXCEPTION_EXPIRED
+        except jwt.InvalidTokenError:
+            raise exceptions.CREDENTIALS_EXCEPTION_INVALID
+        try:
+            claims = TokenClaims(**payload)
+        except ValidationError:
+            raise exceptions.CREDENTIALS_EXCEPTION_INVALID
+        user = None
+        if claims.id is not None and claims.username is not None:
+            user = TokenUserData(**claims.model_dump())
+        token_cache.set(token, claims, user)
+        cached = claims, user
+
+    claims = cached[0]
+    if token_type and claims.token_type != token_type:
+        raise exceptions.CREDENTIALS_EXCEPTION_TYPE
+    return cached
+
+
 def verify_token(token: str, token_type: str | None = None) -> bool:
     """Проверяет токен на валидность.
     Если есть нет типа токена, то тип не проверяется.
@@ -133,19 +206,9 @@ def verify_token(token: str, token_type: str | None = None) -> bool:
     Raises:
         CredentialsException: токен недействителен.
     """
-    try:
-        payload = decode_token(token)
-    except jwt.ExpiredSignatureError:
-        raise exceptions.CREDENTIALS_EXCEPTION_EXPIRED
-    except jwt.InvalidTokenError:
-        raise exceptions.CREDENTIALS_EXCEPTION_INVALID
-    if token_type:
-        payload_token_type: str = payload.get("token_type")
-        if not payload_token_type or payload_token_type != token_type:
-            raise exceptions.CREDENTIALS_EXCEPTION_TYPE
-        user = TokenUserData(**payload)
-        if user is None:
-            raise exceptions.CREDENTIALS_EXCEPTION_USER
+    claims, user = _decode_cached(token, token_type)
+    if token_type and user is None:
+        raise exceptions.CREDENTIALS_EXCEPTION_USER
     return True
 
 
@@ -163,10 +226,10 @@ def get_token_user(token, token_type: str | None = None) -> TokenUserData:
     Raises:
         CredentialsException: Если токен недействителен.
     """
-    if verify_token(token, token_type):
-        payload = decode_token(token)
-        user = TokenUserData(**payload)
-        return user
+    _, user = _decode_cached(token, token_type)
+    if user is None:
+        raise exceptions.CREDENTIALS_EXCEPTION_USER
+    return user
 
 
 def get_token_email(token):
@@ -177,12 +240,9 @@ def get_token_email(token):
         token: Закодированный токен.
 
     Returns:
-        TokenUserData: Схема данных о пользователе.
+        str: Email из токена.
 
     Raises:
         CredentialsException: Если токен недействителен.
     """
-    if verify_token(token):
-        payload = decode_token(token)
-        email = payload.get("email")
-        return email
+    return decode_claims(token).email
@@ -0,0 +1,87 @@
+import datetime
+
+from sqlalchemy import delete, insert, update
+
+from cache.cache import get_redis_cache
+from cache.sessions import AbstractSessionStore, RedisSessionStore
+from core.config import settings
+from core.session_manager import db_manager
+from models.user import UserSession
+
+
+class DatabaseSessionStore(AbstractSessionStore):
+    """
+    Сессии в таблице `user_session` основной БД (запуск без Redis).
+
+    Общие для всех воркеров и переживают перезапуск. Замена токена — один
+    условный `UPDATE`, поэтому два параллельных refresh одним токеном не получат по
+    новой паре.
+    """
+
+    @staticmethod
+    def _now() -> datetime.datetime:
+        return datetime.datetime.now(datetime.UTC)
+
+    async def create(self, user_id: int, sid: str, jti: str, ttl: int) -> None:
+        now = self._now()
+        async with db_manager.session() as session:
+            await session.execute(
+                delete(UserSession).where(
+                    UserSession.user_id == user_id, UserSession.expires_at <= now
+                )
+            )
+            await session.execute(
+                insert(UserSession).values(
+                    sid=sid,
+                    user_id=user_id,
+                    jti=jti,
+                    expires_at=now + datetime.timedelta(seconds=ttl),
+                )
+            )
+            await session.commit()
+
+    async def rotate(
+        self, user_id: int, sid: str, old_jti: str, new_jti: str, ttl: int
+    ) -> bool:
+        now = self._now()
+        async with db_manager.session() as session:
+            res = await session.execute(
+                update(UserSession)
+                .where(
+                    UserSession.sid == sid,
+                    UserSession.user_id == user_id,
+                    UserSession.jti == old_jti,
+                    UserSession.expires_at > now,
+                )
+                .values(jti=new_jti, expires_at=now + datetime.timedelta(seconds=ttl))
+            )
+            await session.commit()
+        return res.rowcount == 1
+
+    async def revoke(self, user_id: int, sid: str) -> bool:
+        async with db_manager.session() as session:
+            res = await session.execute(
+                delete(UserSession).where(
+                    UserSession.sid == sid,
+                    UserSession.user_id == user_id,
+                    UserSession.expires_at > self._now(),
+                )
+            )
+            await session.commit()
+        return res.rowcount > 0
+
+    async def revoke_all(self, user_id: int) -> int:
+        async with db_manager.session() as session:
+            res = await session.execute(
+                delete(UserSession).where(UserSession.user_id == user_id)
+            )
+            await session.commit()
+        return res.rowcount
+
+
+def get_session_store() -> AbstractSessionStore:
+    """Возвращает хранилище refresh-сессий в зависимости от настроек приложения."""
+    if settings.REDIS_HOST:
+        return RedisSessionStore(get_redis_cache())
+    # сессии в памяти не общие для воркеров и теряются при перезапуске
+    return DatabaseSessionStore()
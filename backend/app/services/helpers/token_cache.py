@@ -0,0 +1,81 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from core import metrics
+from core.config import settings
+from schemas.auth import TokenClaims, TokenUserData
+from utils import singleton
+
+
+def token_digest(token: str) -> bytes:
+    """Ключ кэша: хеш токена, чтобы не хранить сами токены в памяти."""
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+
+@singleton
+class TokenClaimsCache:
+    """
+    Ограниченный LRU-кэш проверенных токенов.
+
+    Запись живет не дольше `ttl` секунд и не дольше срока действия самого токена
+    (`exp`), поэтому просроченный токен всегда проходит повторную проверку подписи и
+    получает ошибку.
+    """
+
+    def __init__(self, max_size: int = 10_000, ttl: int = 300) -> None:
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: OrderedDict[
+            bytes, tuple[TokenClaims, TokenUserData | None, float]
+        ] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, token: str) -> tuple[TokenClaims, TokenUserData | None] | None:
+        key = token_digest(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        claims, user, expires = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return claims, user
+
+    def set(self, token: str, claims: TokenClaims, user: TokenUserData | None) -> None:
+        if self._max_size <= 0:
+            return
+        lifetime = min(self._ttl, claims.exp - time.time())
+        if lifetime <= 0:
+            return
+        key = token_digest(token)
+        self._entries[key] = (claims, user, time.monotonic() + lifetime)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, token: str) -> None:
+        self._entries.pop(token_digest(token), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self._max_size,
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+
+token_cache: TokenClaimsCache = TokenClaimsCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL_SEC,
+)
+metrics.register("token_cache", token_cache.stats)
@@ -1,21 +1,52 @@
+import asyncio
+import csv
+import io
+from collections.abc import AsyncIterator
+
 from loguru import logger
+from sqlalchemy.exc import IntegrityError
 
 from cache.base import AbstractCache
-from cache.cache import get_cache
-from core import exceptions
+from cache.cache import get_cache, get_or_set
+from core import exceptions, metrics
 from core.config import settings
+from core.session_manager import db_manager
 from repositories.user import UserRepository
 from schemas.auth import TokenUserData
 from schemas.base import IdResponse
 from schemas.page import PageResponse, PageInfoResponse, PagedParamsSchema
-from schemas.user import UserUpdateSchema, UserResponse, UserFilterSchema
+from schemas.bulk import BulkWriteResponse
+from schemas.user import (
+    UserUpdateSchema,
+    UserResponse,
+    UserFilterSchema,
+    UserCreateSchema,
+    UserCreateDBSchema,
+)
 from services.base import QueryService
-from services.helpers.page import paginate
+from services.helpers.batch_loader import BatchLoader
+from services.helpers.hasher import hasher
+from services.helpers.page import paginate, encode_cursor, decode_cursor
+from services.helpers.response import CachedResponse
+from services.helpers.security import confirm_pwd
 
 
 class UserService(QueryService):
     cache: AbstractCache = get_cache()
     exp: int = settings.CACHE_EXPIRE_SEC
+    # чтения пользователей по id из всех запросов воркера объединяются в пачки
+    loader: BatchLoader = BatchLoader(
+        UserRepository,
+        "user",
+        lambda row: CachedResponse.from_model(
+            UserResponse.model_construct(**row)
+        ).dump(),
+        columns=UserResponse,
+        cache=cache,
+        timeout=exp,
+        stale_timeout=settings.CACHE_STALE_SEC,
+        max_keys=settings.CACHE_BATCH_MAX_KEYS,
+    )
 
     async def edit_me(
         self,
@@ -23,129 +54,322 @@ class UserService(QueryService):
         update_form: UserUpdateSchema,
     ):
         data = update_form.model_dump(exclude_none=True)
-        if update_form.email:
-            if await UserRepository(self.session).find_one_or_none(
-                email=update_form.email
-            ):
+        return await self._edit(current_active_user.id, data)
+
+    async def _edit(self, user_id: int, data: dict) -> UserResponse:
+        """
+        Обновляет пользователя одним запросом `UPDATE ... RETURNING`.
+
+        Отсутствующий (или удаленный) пользователь и занятый email определяются по
+        результату этого же запроса, без предварительных SELECT и чтения после
+        коммита.
+        """
+        repository = UserRepository(self.session)
+        if not data:
+            user = await repository.find_one_or_none(columns=UserResponse, id=user_id)
+        else:
+            try:
+                user = await repository.edit_one_or_none(
+                    user_id, data, columns=UserResponse
+                )
+                await self.session.commit()
+            except IntegrityError:
+                await self.session.rollback()
                 raise exceptions.USER_EXCEPTION_CONFLICT_EMAIL_SIGNUP
-        _obj = await UserRepository(self.session).edit_one(current_active_user.id, data)
-        if _obj:
-            cache_key = f"user:{current_active_user.id}"
-            await self.cache.delete(cache_key)
+        if user is None:
+            raise exceptions.USER_EXCEPTION_NOT_FOUND_USER
 
-            await self.session.commit()
-            await self.session.refresh(_obj)
-            return UserResponse.model_validate(_obj)
+        await self.cache.delete(f"user:{user_id}")
+        return UserResponse.model_construct(**user)
 
     async def find_one(
         self,
         user_id: IdResponse,
-    ):
-        cache_key = f"user:{user_id}"
-        if cache_user := await self.cache.get(cache_key):
-            return cache_user
-
-        user_db = await UserRepository(self.session).find_one_or_none(id=user_id)
-        if user_db:
-            user_db = UserResponse.model_validate(user_db)
-            await self.cache.set(cache_key, user_db, self.exp)
-            return UserResponse.model_validate(user_db)
-        raise exceptions.USER_EXCEPTION_NOT_FOUND_USER
+    ) -> CachedResponse:
+        data = await self.loader.load(user_id)
+        if data is None:
+            raise exceptions.USER_EXCEPTION_NOT_FOUND_USER
+        return CachedResponse.load(data)
 
     async def edit_one(
         self,
         user_id: IdResponse,
         update_form: UserUpdateSchema,
     ):
-        data = update_form.model_dump()
-        if update_form.email:
-            if await UserRepository(self.session).find_one_or_none(email=data["email"]):
-                raise exceptions.USER_EXCEPTION_CONFLICT_EMAIL_SIGNUP
-
-        if not await UserRepository(self.session).find_one_or_none(id=user_id):
-            raise exceptions.USER_EXCEPTION_NOT_FOUND_USER
-
-        _obj = await UserRepository(self.session).edit_one(user_id, data)
-        if _obj:
-            cache_key = f"user:{user_id}"
-            await self.cache.delete(cache_key)
-
-            await self.session.commit()
-            await self.session.refresh(_obj)
-            return UserResponse.model_validate(_obj)
+        return await self._edit(user_id, update_form.model_dump())
 
     async def delete_one(self, user_id: IdResponse):
-        if await UserRepository(self.session).find_one_or_none(id=user_id):
-            _obj = await UserRepository(self.session).edit_one(
-                _id=user_id, data=dict(is_deleted=1)
-            )
-            if _obj:
-                cache_key = f"user:{user_id}"
-                await self.cache.delete(cache_key)
-
-                await self.session.commit()
-                await self.session.refresh(_obj)
-                return {"detail": f"Deleted id={_obj.id}"}
-
-        raise exceptions.USER_EXCEPTION_NOT_FOUND_USER
+        user = await UserRepository(self.session).edit_one_or_none(
+            user_id, dict(is_deleted=1), columns=["id"]
+        )
+        if user is None:
+            raise exceptions.USER_EXCEPTION_NOT_FOUND_USER
+        await self.session.commit()
+        await self.cache.delete(f"user:{user_id}")
+        return {"detail": f"Deleted id={user['id']}"}
 
     async def find_all(
         self,
         limit_offset: PagedParamsSchema,
         filter_schema: UserFilterSchema,
-    ):
+        search: str | None = None,
+    ) -> CachedResponse:
         filters = filter_schema.model_dump(exclude_none=True)
+        if search is not None and not UserRepository.search_terms(search):
+            raise exceptions.USER_EXCEPTION_WRONG_PARAMETER
         limit_offset = limit_offset.model_dump(exclude_none=True)
         logger.info(limit_offset)
         cache_key_filters = ":".join(f"{k}:{v}" for k, v in filters.items())
         cache_key_limit_offset = ":".join(f"{k}:{v}" for k, v in limit_offset.items())
         cache_key_users = f"users:{cache_key_filters}:{cache_key_limit_offset}"
-        cache_key_page_info = f"page_info:{cache_key_filters}:{cache_key_limit_offset}"
+        if search is not None:
+            cache_key_users += f":q:{search}"
 
-        cache_users = await self.cache.get(cache_key_users)
-        cache_page_info = await self.cache.get(cache_key_page_info)
+        mode = limit_offset.pop("mode", "offset")
+        cursor = limit_offset.pop("cursor", None)
+        sort = limit_offset.pop("sort", "id")
+        # по курсору страница не зависит от размера таблицы, подсчет — только по
+        # явному запросу клиента
+        total_mode = limit_offset.pop("total", None)
 
-        if cache_users and cache_page_info:
-            return PageResponse(
-                page_info=cache_page_info,
-                page_data=cache_users,
+        async def load_page():
+            if search is not None:
+                # поиск всегда постранично по курсору, в порядке релевантности
+                page_entities, page_info = await self._find_by_cursor(
+                    limit_offset["limit"], "rank", cursor, filters, "none", search
+                )
+            elif mode == "cursor" or cursor:
+                page_entities, page_info = await self._find_by_cursor(
+                    limit_offset["limit"], sort, cursor, filters, total_mode or "none"
+                )
+            else:
+                page_entities, page_info = await self._find_by_page(
+                    limit_offset["limit"],
+                    limit_offset["offset"],
+                    filters,
+                    total_mode or "exact",
+                )
+            if not page_entities:
+                raise exceptions.USER_EXCEPTION_NOT_FOUND_PAGE
+
+            page = PageResponse(
+                page_info=page_info,
+                # строки из БД уже соответствуют схеме, повторная валидация не нужна
+                page_data=[UserResponse.model_construct(**_) for _ in page_entities],
             )
+            return CachedResponse.from_model(page).dump()
 
-        page_entities = await UserRepository(self.session).find_by_page(
-            **limit_offset, **filters
+        # в кэше готовое тело страницы целиком;
+        # одновременные промахи по одной странице выполняют запрос один раз
+        data = await get_or_set(
+            cache_key_users, load_page, self.exp, cache=self.cache, raw=True
         )
-        total = await UserRepository(self.session).count(**filters)
-        pagination_info = paginate(**limit_offset, total=total)
-        if not page_entities:
-            raise exceptions.USER_EXCEPTION_NOT_FOUND_PAGE
+        return CachedResponse.load(data)
 
-        db_users = [UserResponse.model_validate(entity) for entity in page_entities]
+    async def _find_by_page(
+        self, limit: int, offset: int, filters: dict, total_mode: str
+    ):
+        if total_mode == "exact":
+            # страница и количество одним запросом
+            page_entities, total = await UserRepository(
+                self.session
+            ).find_by_page_counted(limit, offset, columns=UserResponse, **filters)
+        else:
+            page_entities = await UserRepository(self.session).find_by_page(
+                limit, offset, columns=UserResponse, **filters
+            )
+            total = await self._count(total_mode, filters)
+
+        pagination_info = paginate(limit, offset, total, size=len(page_entities))
+        return page_entities, PageInfoResponse(**pagination_info)
 
-        db_page_info = PageInfoResponse(**pagination_info)
+    async def _count(self, total_mode: str, filters: dict) -> int | None:
+        """
+        Количество пользователей по фильтрам для режима `total`.
 
-        await self.cache.set(cache_key_users, db_users, self.exp)
-        await self.cache.set(cache_key_page_info, db_page_info, self.exp)
+        `estimated` без фильтров берет статистику планировщика, а если ее нет (или
+        есть фильтры) — точное количество из кэша, которое может отставать на
+        `CACHE_COUNT_TTL_SEC`.
+        """
+        if total_mode == "none":
+            return None
+        repository = UserRepository(self.session)
+        if total_mode == "exact":
+            return await repository.count(**filters)
 
-        return PageResponse(
-            page_info=db_page_info,
-            page_data=db_users,
+        if not filters and (estimate := await repository.estimate_count()) is not None:
+            return estimate
+        cache_key_filters = ":".join(f"{k}:{v}" for k, v in filters.items())
+        return await get_or_set(
+            f"count:users:{cache_key_filters}",
+            lambda: repository.count(**filters),
+            settings.CACHE_COUNT_TTL_SEC,
+            cache=self.cache,
         )
 
+    async def _find_by_cursor(
+        self,
+        limit: int,
+        sort: str,
+        cursor: str | None,
+        filters: dict,
+        total_mode: str = "none",
+        search: str | None = None,
+    ):
+        if search is None and sort.removeprefix("-") not in UserRepository.sortable:
+            raise exceptions.USER_EXCEPTION_WRONG_PARAMETER
+
+        direction, key = "next", None
+        if cursor:
+            try:
+                cursor_sort, direction, key = decode_cursor(cursor)
+            except ValueError as e:
+                raise exceptions.PAGE_EXCEPTION_INVALID_CURSOR from e
+            if cursor_sort != sort:
+                raise exceptions.PAGE_EXCEPTION_INVALID_CURSOR
+
+        backward = direction == "prev"
+        repository = UserRepository(self.session)
+        if search is not None:
+            page_entities, has_more = await repository.search(
+                search,
+                limit,
+                after=None if backward else key,
+                before=key if backward else None,
+                columns=UserResponse,
+                **filters,
+            )
+        else:
+            page_entities, has_more = await repository.find_by_keyset(
+                limit,
+                sort,
+                after=None if backward else key,
+                before=key if backward else None,
+                columns=UserResponse,
+                **filters,
+            )
+        total = await self._count(total_mode, filters)
+
+        def key_of(entity) -> tuple:
+            return entity[sort.removeprefix("-")], entity["id"]
+
+        # в сторону чтения страница есть, только если нашлась лишняя запись;
+        # в обратную — если на эту страницу пришли по курсору
+        has_next = key is not None if backward else has_more
+        has_prev = has_more if backward else key is not None
+        next_cursor = previous_cursor = None
+        if page_entities and has_next:
+            next_cursor = encode_cursor(sort, "next", key_of(page_entities[-1]))
+        if page_entities and has_prev:
+            previous_cursor = encode_cursor(sort, "prev", key_of(page_entities[0]))
+
+        page_info = PageInfoResponse(
+            total=total,
+            page=None,
+            size=limit,
+            first=None,
+            last=None,
+            previous=None,
+            next=None,
+            next_cursor=next_cursor,
+            previous_cursor=previous_cursor,
+        )
+        return page_entities, page_info
+
     async def edit_superuser(
         self,
         user_id: IdResponse,
         is_superuser: bool,
     ):
-        if not await UserRepository(self.session).find_one_or_none(id=user_id):
-            raise exceptions.USER_EXCEPTION_NOT_FOUND_USER
+        return await self._edit(user_id, dict(is_superuser=is_superuser))
 
-        _obj = await UserRepository(self.session).edit_one(
-            user_id, dict(is_superuser=is_superuser)
-        )
-        if _obj:
-            cache_key = f"user:{user_id}"
-            await self.cache.delete(cache_key)
+    @staticmethod
+    async def export(
+        filter_schema: UserFilterSchema, fmt: str = "ndjson"
+    ) -> AsyncIterator[bytes]:
+        """
+        Потоковая выгрузка пользователей в NDJSON или CSV.
 
+        Генератор читается ответом уже после закрытия сессии запроса, поэтому
+        открывает свою. Данные отдаются пачками по `EXPORT_YIELD_PER` строк.
+        """
+        filters = filter_schema.model_dump(exclude_none=True)
+        fields = list(UserResponse.model_fields)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields)
+        if fmt == "csv":
+            writer.writeheader()
+
+        rows = 0
+        async with db_manager.read_session() as session:
+            async for row in UserRepository(session).stream(
+                settings.EXPORT_YIELD_PER, columns=UserResponse, **filters
+            ):
+                user = UserResponse.model_construct(**row)
+                if fmt == "csv":
+                    writer.writerow(user.model_dump(mode="json"))
+                else:
+                    buffer.write(user.model_dump_json())
+                    buffer.write("\n")
+                rows += 1
+                if rows % settings.EXPORT_YIELD_PER == 0:
+                    yield buffer.getvalue().encode()
+                    buffer.seek(0)
+                    buffer.truncate()
+        if chunk := buffer.getvalue():
+            yield chunk.encode()
+
+    async def import_users(
+        self,
+        users: list[UserCreateSchema],
+        on_conflict: str = "skip",
+    ) -> BulkWriteResponse:
+        """
+        Массовый импорт пользователей.
+
+        Пароли хешируются группами не больше числа воркеров хеширования, чтобы
+        импорт не занимал очередь, которую делят с ним логины, затем пользователи
+        записываются пачками одной транзакцией. При конфликте по
+        username пользователь пропускается ("skip"), обновляется ("update") или
+        импорт отменяется целиком ("error").
+        """
+        if len(users) > settings.USER_IMPORT_MAX_ROWS:
+            raise exceptions.USER_EXCEPTION_WRONG_PARAMETER
+
+        # повторы в одном импорте: побеждает последняя запись
+        users = list({user.username: user for user in users}.values())
+        group = hasher.workers
+        rows = []
+        for start in range(0, len(users), group):
+            batch = users[start : start + group]
+            passwords = await asyncio.gather(
+                *(confirm_pwd(u.password, u.confirmation_password) for u in batch)
+            )
+            for user, password in zip(batch, passwords):
+                row = user.model_dump()
+                row["hashed_password"] = password
+                rows.append(UserCreateDBSchema(**row).__dict__)
+
+        conflict = {"skip": "nothing", "update": "update"}.get(on_conflict)
+        try:
+            report = await UserRepository(self.session).bulk_write(
+                rows,
+                on_conflict=conflict,
+                index_elements=["username"] if conflict == "update" else None,
+            )
             await self.session.commit()
-            await self.session.refresh(_obj)
-            return UserResponse.model_validate(_obj)
+        except IntegrityError as e:
+            await self.session.rollback()
+            # при "update" конфликт по username обновляет строку, ошибка может
+            # быть только по email
+            if "email" in str(e.orig):
+                raise exceptions.USER_EXCEPTION_CONFLICT_EMAIL_SIGNUP
+            raise exceptions.USER_EXCEPTION_CONFLICT_USERNAME_SIGNUP
+
+        if report.written:
+            # обновленные пользователи и списки могли измениться
+            await self.cache.delete_namespace("user")
+        return BulkWriteResponse.model_validate(report)
+
+
+metrics.register("user_loader", UserService.loader.stats)
@@ -2,9 +2,11 @@ from typing import Any
 from collections.abc import Callable, Awaitable
 
 import pytest
+from fakeredis import FakeAsyncRedis
 from faker import Faker
 from httpx import AsyncClient, ASGITransport
 
+from cache.redis_db import RedisCache
 from core.session_manager import db_manager
 from main import app
 from schemas.user import UserCreateSchema, UserResponse
@@ -30,6 +32,15 @@ async def engine():
     await db_manager.drop_all()
 
 
+@pytest.fixture
+async def redis_cache() -> RedisCache:
+    """RedisCache on an in-process fake Redis server."""
+    cache = RedisCache.__wrapped__(host="localhost", port=6379, db=0)
+    cache._redis = FakeAsyncRedis()
+    yield cache
+    await cache._redis.aclose()
+
+
 @pytest.fixture(scope="function")
 async def client(engine) -> AsyncClient:
     transport = ASGITransport(app=app)
@@ -1,3 +1,4 @@
+import asyncio
 from datetime import timedelta
 from collections.abc import Callable
 
@@ -162,3 +163,143 @@ async def test_reset_password_token(
 
     # создан email
     assert response.status_code == status.HTTP_200_OK
+
+    response = await client.post(f"/auth/reset-password/{token}", json=data_pwd)
+
+    # ссылка одноразовая
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_refresh_rotation(
+    client: AsyncClient, fake: Faker, registered_user: Callable
+) -> None:
+    """Test refresh token rotation and per-device sessions."""
+
+    username = fake.user_name()
+    password = fake.password()
+    await registered_user(client, username=username, password=password)
+    payload_pwd = dict(grant_type="password", username=username, password=password)
+
+    # две сессии одного пользователя (два устройства)
+    device_1 = (await client.post("/auth/token", data=payload_pwd)).json()
+    device_2 = (await client.post("/auth/token", data=payload_pwd)).json()
+
+    payload_refresh = dict(
+        grant_type="refresh_token", refresh_token=device_1["refresh_token"]
+    )
+    response = await client.post("/auth/token", data=payload_refresh)
+    assert response.status_code == status.HTTP_200_OK
+    rotated = response.json()
+    assert rotated["refresh_token"] != device_1["refresh_token"]
+
+    # старый refresh токен больше не действует
+    response = await client.post("/auth/token", data=payload_refresh)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    # выход с одного устройства не затрагивает другое
+    headers = {"Authorization": f"Bearer {device_2['access_token']}"}
+    response = await client.post("/auth/logout", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    payload_refresh = dict(
+        grant_type="refresh_token", refresh_token=device_2["refresh_token"]
+    )
+    response = await client.post("/auth/token", data=payload_refresh)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_logout_revokes_access_token(
+    client: AsyncClient, fake: Faker, registered_user: Callable
+) -> None:
+    """Test that access token is rejected after logout."""
+
+    username = fake.user_name()
+    password = fake.password()
+    await registered_user(client, username=username, password=password)
+    payload_pwd = dict(grant_type="password", username=username, password=password)
+    tokens = (await client.post("/auth/token", data=payload_pwd)).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await client.post("/auth/logout", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    # токен отозван
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_reset_password_revokes_access_tokens(
+    client: AsyncClient, fake: Faker, registered_user: Callable
+) -> None:
+    """Test that access tokens issued before a password reset are rejected."""
+
+    username = fake.user_name()
+    email = fake.email()
+    password = fake.password()
+    await registered_user(client, username=username, email=email, password=password)
+    payload_pwd = dict(grant_type="password", username=username, password=password)
+    tokens = (await client.post("/auth/token", data=payload_pwd)).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    token = create_token(
+        data=dict(email=email),
+        delta=timedelta(minutes=test_settings.FORGET_PASSWORD_LINK_EXPIRE_MINUTES),
+    )
+    data_pwd = dict(password="new-password", confirmation_password="new-password")
+    response = await client.post(f"/auth/reset-password/{token}", json=data_pwd)
+    assert response.status_code == status.HTTP_200_OK
+
+    # старый access-токен и refresh-токен больше не действуют
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    payload_refresh = dict(
+        grant_type="refresh_token", refresh_token=tokens["refresh_token"]
+    )
+    response = await client.post("/auth/token", data=payload_refresh)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    # токены, выданные после сброса, действуют
+    payload_pwd["password"] = "new-password"
+    tokens = (await client.post("/auth/token", data=payload_pwd)).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+
+async def test_reset_password_link_is_one_time_concurrently(
+    client: AsyncClient, fake: Faker, registered_user: Callable
+) -> None:
+    """Test that concurrent resets with one link change the password once."""
+
+    username = fake.user_name()
+    email = fake.email()
+    await registered_user(client, username=username, email=email)
+    token = create_token(
+        data=dict(email=email),
+        delta=timedelta(minutes=test_settings.FORGET_PASSWORD_LINK_EXPIRE_MINUTES),
+    )
+    passwords = ["first-password", "second-password"]
+    responses = await asyncio.gather(
+        *(
+            client.post(
+                f"/auth/reset-password/{token}",
+                json=dict(password=pwd, confirmation_password=pwd),
+            )
+            for pwd in passwords
+        )
+    )
+
+    codes = sorted(response.status_code for response in responses)
+    assert codes == [status.HTTP_200_OK, status.HTTP_401_UNAUTHORIZED]
+
+    # действует только пароль запроса, который использовал ссылку
+    winner = passwords[[r.status_code for r in responses].index(status.HTTP_200_OK)]
+    for pwd in passwords:
+        payload = dict(grant_type="password", username=username, password=pwd)
+        response = await client.post("/auth/token", data=payload)
+        assert (response.status_code == status.HTTP_200_OK) == (pwd == winner)
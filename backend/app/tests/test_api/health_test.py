@@ -0,0 +1,22 @@
+from collections.abc import Callable
+
+from fastapi import status
+from httpx import AsyncClient
+
+
+async def test_ping(client: AsyncClient) -> None:
+    response = await client.get("/ping")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"detail": "pong"}
+
+
+async def test_metrics(client: AsyncClient, registered_user: Callable) -> None:
+    # регистрация хеширует пароль в пуле воркеров
+    await registered_user(client)
+    response = await client.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    hasher = response.json()["password_hasher"]
+    assert hasher["completed"] > 0
+    assert hasher["pending"] == 0
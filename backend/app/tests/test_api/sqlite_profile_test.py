@@ -0,0 +1,85 @@
+import asyncio
+from collections.abc import AsyncIterator
+from datetime import timedelta
+
+import pytest
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from core.config import settings
+from core.session_manager import db_manager
+from main import app
+from models import DeclarativeBaseModel
+from services.helpers.security import create_token
+from tests.conftest import BASE_URL
+
+
+@pytest.fixture
+async def profile_client(tmp_path, monkeypatch, engine) -> AsyncIterator[AsyncClient]:
+    """Client of the app started by its lifespan on SQLite with the profile enabled."""
+    url = f"sqlite+aiosqlite:///{tmp_path}/app.db"
+    monkeypatch.setattr(settings, "SQLALCHEMY_DATABASE_URI", url)
+    # схема создается до запуска, как миграциями: lifespan уже читает отзывы
+    schema_engine = create_async_engine(url)
+    async with schema_engine.begin() as conn:
+        await conn.run_sync(DeclarativeBaseModel.metadata.create_all)
+    await schema_engine.dispose()
+    monkeypatch.setattr(settings, "SQLITE_PROFILE", True)
+    # соединение, удержанное дольше этого, — ошибка, а не ожидание
+    monkeypatch.setattr(settings, "DB_POOL_TIMEOUT_SEC", 3.0)
+    # lifespan переинициализирует общий db_manager, тестовую БД вернем после
+    saved = dict(vars(db_manager))
+    try:
+        async with app.router.lifespan_context(app):
+            assert db_manager.pool_stats()["primary"]["size"] == 1
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url=BASE_URL) as client:
+                yield client
+    finally:
+        vars(db_manager).update(saved)
+
+
+async def test_auth_with_single_writer(profile_client: AsyncClient, fake) -> None:
+    users = [(fake.unique.user_name(), fake.unique.email()) for _ in range(6)]
+    for username, email in users:
+        payload = dict(
+            username=username,
+            email=email,
+            password="secret",
+            confirmation_password="secret",
+        )
+        response = await profile_client.post("/auth/signup", json=payload)
+        assert response.status_code == status.HTTP_201_CREATED
+
+    async def login(username: str) -> dict:
+        payload = dict(grant_type="password", username=username, password="secret")
+        response = await profile_client.post("/auth/token", data=payload)
+        assert response.status_code == status.HTTP_200_OK
+        return response.json()
+
+    # одновременные логины не держат пишущее соединение на время bcrypt
+    tokens = await asyncio.gather(*(login(username) for username, _ in users))
+
+    async def refresh(token: dict) -> None:
+        payload = dict(grant_type="refresh_token", refresh_token=token["refresh_token"])
+        response = await profile_client.post("/auth/token", data=payload)
+        assert response.status_code == status.HTTP_200_OK
+
+    async def reset(email: str) -> None:
+        token = create_token(data=dict(email=email), delta=timedelta(minutes=5))
+        data_pwd = dict(password="changed", confirmation_password="changed")
+        response = await profile_client.post(
+            f"/auth/reset-password/{token}", json=data_pwd
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    await asyncio.gather(
+        *(refresh(token) for token in tokens[:3]),
+        *(reset(email) for _, email in users[3:]),
+    )
+
+    headers = {"Authorization": f"Bearer {tokens[0]['access_token']}"}
+    response = await profile_client.get("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert db_manager.pool_stats()["primary"]["timeouts"] == 0
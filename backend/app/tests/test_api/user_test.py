@@ -1,9 +1,16 @@
+import asyncio
 from collections.abc import Callable
 
+import orjson
 from fastapi import status
 from httpx import AsyncClient
+from sqlalchemy import text
 
-from schemas.user import UserUpdateSchema
+from cache.memory_db import InMemoryCache
+from core.session_manager import db_manager
+from repositories.user import UserRepository
+from schemas.user import UserUpdateSchema, UserResponse
+from services.helpers.batch_loader import BatchLoader
 
 
 async def test_get_me(client: AsyncClient, authenticate_client: Callable) -> None:
@@ -18,6 +25,9 @@ async def test_get_me(client: AsyncClient, authenticate_client: Callable) -> Non
     # авторизован
     assert response.status_code == status.HTTP_200_OK
 
+    # время запросов к БД
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
 
 async def test_patch_me(client: AsyncClient, authenticate_client: Callable) -> None:
     user_in = UserUpdateSchema(fullname="New First Name")
@@ -120,6 +130,12 @@ async def test_del_user(
     # ищем удаленный объект
     assert response_get.status_code != status.HTTP_200_OK
 
+    # удаленный объект нельзя ни удалить, ни изменить повторно
+    response = await client.delete(f"/users/{test_user_id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = await client.patch(f"/users/{test_user_id}", json={"fullname": "x"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
 
 async def test_list_users(
     client: AsyncClient,
@@ -147,3 +163,317 @@ async def test_list_users(
     response = await client.get("/users/", params={"email": email})
 
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_list_users_total(
+    client: AsyncClient,
+    batch_test_user_in_db: Callable,
+) -> None:
+    await batch_test_user_in_db(count=5)
+
+    response = await client.get("/users/", params={"limit": 2})
+    page_info = response.json()["page_info"]
+    assert page_info["total"] >= 5
+    assert page_info["last"] == (page_info["total"] + 1) // 2
+
+    response = await client.get("/users/", params={"limit": 2, "total": "estimated"})
+    assert response.json()["page_info"]["total"] == page_info["total"]
+
+    response = await client.get("/users/", params={"limit": 2, "total": "none"})
+    page_info = response.json()["page_info"]
+    assert page_info["total"] is None
+    assert page_info["last"] is None
+    assert page_info["next"] == 2
+
+
+async def test_list_users_cursor(
+    client: AsyncClient,
+    batch_test_user_in_db: Callable,
+) -> None:
+    await batch_test_user_in_db(count=7)
+    params = {"mode": "cursor", "limit": 3}
+
+    pages = []
+    cursor = None
+    while True:
+        response = await client.get(
+            "/users/", params={**params, "cursor": cursor} if cursor else params
+        )
+        assert response.status_code == status.HTTP_200_OK
+        body = response.json()
+        pages.append([user["id"] for user in body["page_data"]])
+        cursor = body["page_info"]["next_cursor"]
+        if cursor is None:
+            break
+
+    # по умолчанию страницы по курсору без COUNT(*)
+    assert body["page_info"]["total"] is None
+    ids = [_id for page in pages for _id in page]
+    assert ids == sorted(ids)
+    assert len(ids) == len(set(ids)) >= 7
+    assert all(len(page) == 3 for page in pages[:-1])
+
+    # назад с последней страницы — предпоследняя
+    previous = body["page_info"]["previous_cursor"]
+    response = await client.get("/users/", params={**params, "cursor": previous})
+    assert [user["id"] for user in response.json()["page_data"]] == pages[-2]
+
+    response = await client.get("/users/", params={**params, "total": "exact"})
+    assert response.json()["page_info"]["total"] == len(ids)
+
+    response = await client.get("/users/", params={**params, "cursor": "xx"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_list_users_cursor_same_created_at(
+    client: AsyncClient,
+    batch_test_user_in_db: Callable,
+) -> None:
+    await batch_test_user_in_db(count=7)
+    # как у строк, вставленных одной пачкой: CURRENT_TIMESTAMP без долей секунды
+    async with db_manager.session() as session:
+        await session.execute(
+            text("UPDATE user SET created_at = '2030-01-01 00:00:00'")
+        )
+        await session.commit()
+
+    for sort in ("created_at", "-created_at"):
+        params = {"mode": "cursor", "limit": 3, "sort": sort}
+        ids, cursor = [], None
+        while True:
+            response = await client.get(
+                "/users/", params={**params, "cursor": cursor} if cursor else params
+            )
+            body = response.json()
+            ids += [user["id"] for user in body["page_data"]]
+            cursor = body["page_info"]["next_cursor"]
+            if cursor is None:
+                break
+
+        # одинаковые даты упорядочены по id, ни одна строка не пропущена
+        assert ids == sorted(ids, reverse=sort.startswith("-"))
+        assert len(ids) == len(set(ids)) >= 7
+
+
+async def test_list_users_search(
+    client: AsyncClient,
+    registered_user: Callable,
+) -> None:
+    for i in range(5):
+        await registered_user(
+            client, username=f"searchalpha{i}", email=f"alpha{i}@example.com"
+        )
+    await registered_user(client, username="searchbeta", email="beta@example.com")
+
+    found, cursor = [], None
+    while True:
+        params = {"q": "SearchAlph", "limit": 2}
+        response = await client.get(
+            "/users/", params={**params, "cursor": cursor} if cursor else params
+        )
+        assert response.status_code == status.HTTP_200_OK
+        body = response.json()
+        found += [user["username"] for user in body["page_data"]]
+        cursor = body["page_info"]["next_cursor"]
+        if cursor is None:
+            break
+
+    # подстрока без учета регистра, все совпадения по одному разу
+    assert sorted(found) == [f"searchalpha{i}" for i in range(5)]
+
+    # все слова запроса; поиск и по email
+    response = await client.get("/users/", params={"q": "beta example.com"})
+    assert [u["username"] for u in response.json()["page_data"]] == ["searchbeta"]
+
+    # удаленный пользователь пропадает из поиска
+    async with db_manager.session() as session:
+        user = await UserRepository(session).find_one_or_none(username="searchbeta")
+        await UserRepository(session).edit_one_or_none(user.id, dict(is_deleted=1))
+        await session.commit()
+    response = await client.get("/users/", params={"q": "searchbeta"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    # слов не короче трех символов нет
+    for q in ("ab", "ab cd"):
+        response = await client.get("/users/", params={"q": q})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_get_user_etag(
+    client: AsyncClient,
+    test_user_in_db: Callable,
+) -> None:
+    test_user = await test_user_in_db()
+    response = await client.get(f"/users/{test_user.get('id')}")
+    etag = response.headers["etag"]
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/json"
+
+    # повторный запрос с той же версией — без тела
+    response = await client.get(
+        f"/users/{test_user.get('id')}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["etag"] == etag
+    assert not response.content
+
+
+async def test_export_users(
+    client: AsyncClient,
+    authenticate_client: Callable,
+    batch_test_user_in_db: Callable,
+) -> None:
+    await batch_test_user_in_db(count=3)
+    response = await client.get("/users/export")
+
+    # не авторизован
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    client = await authenticate_client(client, is_superuser=True)
+    response = await client.get("/users/export")
+    lines = response.text.splitlines()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert len(lines) >= 3
+    assert all("id" in orjson.loads(line) for line in lines)
+
+    response = await client.get("/users/export", params={"format": "csv"})
+    rows = response.text.splitlines()
+
+    assert response.headers["content-type"].startswith("text/csv")
+    assert rows[0] == ",".join(UserResponse.model_fields)
+    assert len(rows) == len(lines) + 1
+
+
+async def test_import_users(
+    client: AsyncClient,
+    authenticate_client: Callable,
+    test_user_in_db: Callable,
+    fake,
+) -> None:
+    existing = await test_user_in_db()
+    payload = [
+        {
+            "username": username,
+            "email": fake.unique.email(),
+            "fullname": "Imported",
+            "password": "secret",
+            "confirmation_password": "secret",
+        }
+        for username in (existing["username"], "imported1", "imported2")
+    ]
+    response = await client.post("/users/import", json=payload)
+
+    # не авторизован
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    client = await authenticate_client(client, is_superuser=True)
+    response = await client.post("/users/import", json=payload)
+    report = response.json()
+
+    # существующий username пропущен
+    assert response.status_code == status.HTTP_200_OK
+    assert (report["rows"], report["written"], report["skipped"]) == (3, 2, 1)
+    assert sum(chunk["rows"] for chunk in report["chunks"]) == 3
+
+    response = await client.post(
+        "/users/import", json=payload[:1], params={"on_conflict": "update"}
+    )
+    assert response.json()["written"] == 1
+    response = await client.get(f"/users/{existing['id']}")
+    assert response.json()["fullname"] == "Imported"
+
+    response = await client.post(
+        "/users/import", json=payload[1:], params={"on_conflict": "error"}
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    # email другого пользователя — конфликт по email, а не по username
+    taken = [{**payload[0], "email": payload[1]["email"]}]
+    response = await client.post(
+        "/users/import", json=taken, params={"on_conflict": "update"}
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.json()["detail"] == "Email already exist"
+
+
+def make_loader(cache: InMemoryCache, stale_timeout: int = 0) -> BatchLoader:
+    return BatchLoader(
+        UserRepository,
+        "user",
+        lambda row: UserResponse.model_construct(**row).model_dump_json().encode(),
+        columns=UserResponse,
+        cache=cache,
+        timeout=60,
+        stale_timeout=stale_timeout,
+    )
+
+
+async def test_batch_loader_one_query_per_tick(
+    client: AsyncClient,
+    test_user_in_db: Callable,
+) -> None:
+    users = [await test_user_in_db() for _ in range(3)]
+    ids = [user["id"] for user in users]
+    cache = InMemoryCache.__wrapped__()
+    loader = make_loader(cache)
+
+    # повторный id и несуществующий пользователь в той же пачке
+    results = await asyncio.gather(*(loader.load(_id) for _id in [*ids, ids[0], -1]))
+
+    assert [UserResponse.model_validate_json(r).id for r in results[:4]] == [
+        *ids,
+        ids[0],
+    ]
+    assert results[4] is None
+    assert loader.loads == 5 and loader.coalesced == 1
+    assert loader.batches == 1 and loader.db_queries == 1
+    assert await cache.get_raw(f"user:{ids[1]}") == results[1]
+
+    # во второй раз все берется из кэша одним чтением, без запроса к БД
+    await asyncio.gather(*(loader.load(_id) for _id in ids))
+    assert loader.batches == 2 and loader.db_queries == 1
+    assert loader.cache_hits == 3 and loader.stats()["in_flight"] == 0
+
+
+async def test_batch_loader_propagates_error() -> None:
+    class BrokenCache(InMemoryCache.__wrapped__):
+        async def get_raw_many(self, keys: list[str]) -> list[bytes | None]:
+            raise ConnectionError("cache is down")
+
+    loader = make_loader(BrokenCache())
+    results = await asyncio.gather(
+        loader.load(1), loader.load(2), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert loader.stats()["in_flight"] == 0
+
+
+async def test_batch_loader_refreshes_stale(
+    client: AsyncClient,
+    test_user_in_db: Callable,
+) -> None:
+    user = await test_user_in_db()
+    cache = InMemoryCache.__wrapped__()
+    loader = make_loader(cache, stale_timeout=30)
+    # записи в последних stale_timeout секундах жизни: пользователь и удаленный
+    await cache.set_raw_many(
+        {f"user:{user['id']}": b"stale", "user:-1": b"gone"}, 0, 30
+    )
+
+    # устаревшее отдается сразу, обновление идет в фоне
+    assert await asyncio.gather(loader.load(user["id"]), loader.load(-1)) == [
+        b"stale",
+        b"gone",
+    ]
+    for _ in range(100):
+        if await cache.get_raw("user:-1") is None:
+            break
+        await asyncio.sleep(0.01)
+
+    value, ttl = await cache.get_raw_with_ttl(f"user:{user['id']}")
+    assert UserResponse.model_validate_json(value).id == user["id"] and ttl > 30
+    assert loader.refreshes == 1 and loader.db_queries == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from cache import redis_db
+from cache.base import AbstractCache
+from cache.memory_db import InMemoryCache
+from cache.near_db import NearCache
+from cache.redis_db import RedisCache
+
+
+@pytest.fixture(params=["memory", "redis", "near"])
+def cache(request, redis_cache: RedisCache) -> AbstractCache:
+    if request.param == "memory":
+        return InMemoryCache.__wrapped__()
+    if request.param == "redis":
+        return redis_cache
+    return NearCache.__wrapped__(redis_cache)
+
+
+async def test_batch_operations(cache: AbstractCache) -> None:
+    assert await cache.get_many([]) == []
+    await cache.set_many({}, 60)
+
+    await cache.set_many({"user:1": {"id": 1}, "user:2": [1, 2]}, 60)
+    await cache.set("user:3", "three", 60)
+    # порядок значений — порядок ключей, отсутствующие — None
+    assert await cache.get_many(["user:2", "user:4", "user:1", "user:3"]) == [
+        [1, 2],
+        None,
+        {"id": 1},
+        "three",
+    ]
+    value, ttl = await cache.get_with_ttl("user:1")
+    assert value == {"id": 1} and 0 < ttl <= 60
+
+    await cache.delete_many(["user:1", "user:3", "user:4"])
+    await cache.delete_many([])
+    assert await cache.get_many(["user:1", "user:2", "user:3"]) == [None, [1, 2], None]
+
+
+async def test_set_many_stale_timeout(cache: AbstractCache) -> None:
+    await cache.set_raw_many({"user:1": b"1"}, 60, stale_timeout=30)
+
+    # запись живет timeout + stale_timeout
+    _, ttl = await cache.get_raw_with_ttl("user:1")
+    assert 60 < ttl <= 90
+
+    # то же время жизни видно при чтении нескольких ключей
+    (value, ttl), missing = await cache.get_raw_many_with_ttl(["user:1", "user:2"])
+    assert value == b"1" and 60 < ttl <= 90
+    assert missing == (None, None)
+    assert await cache.get_raw_many_with_ttl([]) == []
+
+
+async def test_delete_namespace(cache: AbstractCache, monkeypatch) -> None:
+    # несколько пачек UNLINK и неполная последняя
+    monkeypatch.setattr(redis_db, "_SCAN_BATCH", 3)
+    await cache.set_many({f"users:{i}": i for i in range(8)}, 60)
+    await cache.set("user:1", 1, 60)
+
+    await cache.delete_namespace("users")
+    assert await cache.get_many([f"users:{i}" for i in range(8)]) == [None] * 8
+    assert await cache.get("user:1") == 1
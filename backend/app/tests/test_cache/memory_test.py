@@ -0,0 +1,47 @@
+import time
+
+from cache.memory_db import BoundedLRU
+
+
+def test_lru_evicts_least_recent() -> None:
+    lru = BoundedLRU(max_entries=2)
+    lru.set("user:1", b"1", 60)
+    lru.set("user:2", b"2", 60)
+    # чтение делает ключ недавно использованным
+    assert lru.get("user:1") == b"1"
+    lru.set("user:3", b"3", 60)
+
+    assert lru.get("user:2") is None
+    assert lru.get("user:1") == b"1"
+    assert lru.evictions == 1
+
+
+def test_lru_bytes_limit() -> None:
+    lru = BoundedLRU(max_entries=100, max_bytes=10)
+    lru.set("a", b"12345", 60)
+    lru.set("b", b"12345", 60)
+    lru.set("c", b"12345", 60)
+
+    assert len(lru) == 2
+    assert lru.get("a") is None
+    assert lru.stats()["bytes"] == 10
+
+
+def test_lru_reap_expired() -> None:
+    lru = BoundedLRU()
+    lru.set("users:1", b"1", 0.01)
+    lru.set("users:2", b"2", 60)
+    time.sleep(0.02)
+
+    assert lru.reap() == 1
+    assert len(lru) == 1
+
+
+def test_lru_delete_prefix() -> None:
+    lru = BoundedLRU()
+    for key in ("users:email:a", "users:email:b", "user:1", "page_info:1"):
+        lru.set(key, b"x", 60)
+
+    assert lru.delete_prefix("users:email:") == 2
+    assert lru.delete_prefix("user") == 1
+    assert lru.get("page_info:1") == b"x"
@@ -0,0 +1,80 @@
+import asyncio
+
+from cache.near_db import NearCache
+from cache.redis_db import RedisCache
+
+
+async def wait_for(predicate, timeout: float = 2.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not await predicate():
+            await asyncio.sleep(0.01)
+
+
+async def test_near_cache_local_hit(redis_cache: RedisCache) -> None:
+    cache = NearCache.__wrapped__(redis_cache, ttl=30)
+    await cache.set_raw("user:1", b"1", 60)
+
+    # значение читается из L1, без обращения к Redis
+    await redis_cache.client.delete("user:1")
+    assert await cache.get_raw("user:1") == b"1"
+    value, ttl = await cache.get_raw_with_ttl("user:1")
+    assert value == b"1" and 0 < ttl <= 60
+    assert await cache.get_raw_many(["user:1", "user:2"]) == [b"1", None]
+    assert cache.stats()["hits"] == 3
+
+    # промах L1 читается из Redis и кладется в L1
+    await redis_cache.client.set("user:3", b"3", ex=60)
+    assert await cache.get_raw("user:3") == b"3"
+    assert cache.stats()["entries"] == 2
+
+
+async def test_near_cache_size_bound(redis_cache: RedisCache) -> None:
+    cache = NearCache.__wrapped__(redis_cache, max_entries=2)
+    await cache.set_raw_many({f"user:{i}": b"x" for i in range(5)}, 60)
+
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 3
+    # вытесненные из L1 ключи по-прежнему читаются из Redis
+    assert await cache.get_raw("user:0") == b"x"
+
+
+async def test_near_cache_invalidation(redis_cache: RedisCache) -> None:
+    # два воркера с общим Redis
+    first = NearCache.__wrapped__(redis_cache)
+    second = NearCache.__wrapped__(redis_cache)
+    await first.start()
+    await second.start()
+    try:
+        # подписка — отдельное соединение, не из пула команд
+        assert (
+            first._subscriber.connection_pool is not redis_cache.client.connection_pool
+        )
+
+        await first.set_raw("user:1", b"old", 60)
+        await first.set_raw("user:2", b"old", 60)
+        await first.set_raw("users:a", b"old", 60)
+        for key in ("user:1", "user:2", "users:a"):
+            assert await second.get_raw(key) == b"old"
+
+        async def subscribed() -> bool:
+            [(_, count)] = await redis_cache.client.pubsub_numsub("cache:invalidate")
+            return count == 2
+
+        await wait_for(subscribed)
+
+        await first.set_raw("user:1", b"new", 60)
+        await first.delete_many(["user:2"])
+        await first.delete_namespace("users")
+
+        async def invalidated() -> bool:
+            return second.stats()["invalidations"] >= 3
+
+        await wait_for(invalidated)
+        assert await second.get_raw("user:1") == b"new"
+        assert await second.get_raw("user:2") is None
+        assert await second.get_raw("users:a") is None
+        # свои сообщения воркер пропускает
+        assert first.stats()["invalidations"] == 0
+    finally:
+        await first.stop()
+        await second.stop()
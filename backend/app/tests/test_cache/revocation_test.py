@@ -0,0 +1,51 @@
+import time
+
+from cache.redis_db import RedisCache
+from cache.revocation import (
+    AbstractRevocationStore,
+    InMemoryRevocationStore,
+    RedisRevocationStore,
+    TokenRevocationList,
+)
+from services.helpers.revocation import DatabaseRevocationStore
+
+
+async def check_user_revocation(store: AbstractRevocationStore) -> None:
+    issued = time.time()
+    revocation = TokenRevocationList.__wrapped__(store, capacity=100)
+    await revocation.revoke_user(1, 60)
+
+    # отзыв виден другому воркеру после синхронизации фильтра
+    other = TokenRevocationList.__wrapped__(store, capacity=100)
+    assert not await other.is_user_revoked(1, issued)
+    await other.sync()
+    for worker in (revocation, other):
+        assert await worker.is_user_revoked(1, issued)
+        assert await worker.is_user_revoked(1, None)
+        assert not await worker.is_user_revoked(1, time.time())
+        assert not await worker.is_user_revoked(2, issued)
+
+    # и после пересборки фильтра по снимку
+    await revocation.rebuild()
+    assert await revocation.is_user_revoked(1, issued)
+
+    # одноразовый токен отзывается только первым из запросов
+    exp = int(time.time()) + 60
+    assert await revocation.claim("jti-1", exp)
+    assert not await revocation.claim("jti-1", exp)
+    assert not await other.claim("jti-1", exp)
+    assert not await revocation.claim("jti-2", int(time.time()) - 1)
+    await other.sync()
+    assert await other.is_revoked("jti-1")
+
+
+async def test_memory_user_revocation() -> None:
+    await check_user_revocation(InMemoryRevocationStore.__wrapped__())
+
+
+async def test_redis_user_revocation(redis_cache: RedisCache) -> None:
+    await check_user_revocation(RedisRevocationStore.__wrapped__(redis_cache))
+
+
+async def test_database_user_revocation(engine) -> None:
+    await check_user_revocation(DatabaseRevocationStore())
@@ -0,0 +1,42 @@
+from cache.redis_db import RedisCache
+from cache.sessions import AbstractSessionStore, RedisSessionStore
+from services.helpers.sessions import DatabaseSessionStore
+
+
+async def check_store(store: AbstractSessionStore) -> None:
+    await store.create(1, "a", "jti-1", 60)
+    await store.create(1, "b", "jti-2", 60)
+    await store.create(2, "c", "jti-3", 60)
+
+    # заменить можно только последним токеном и только один раз
+    assert await store.rotate(1, "a", "jti-1", "jti-4", 60)
+    assert not await store.rotate(1, "a", "jti-1", "jti-5", 60)
+    assert not await store.rotate(2, "a", "jti-4", "jti-5", 60)
+
+    assert await store.revoke(1, "b")
+    assert not await store.revoke(1, "b")
+    await store.create(1, "e", "jti-8", 60)
+    assert await store.revoke_all(1) >= 2
+    assert not await store.rotate(1, "a", "jti-4", "jti-9", 60)
+    assert await store.rotate(2, "c", "jti-3", "jti-10", 60)
+
+
+async def test_database_session_store(engine) -> None:
+    store = DatabaseSessionStore()
+    await check_store(store)
+
+    # истекшая сессия не заменяется и не отзывается
+    await store.create(4, "d", "jti-6", -1)
+    assert not await store.rotate(4, "d", "jti-6", "jti-7", 60)
+    assert not await store.revoke(4, "d")
+
+
+async def test_redis_session_store(redis_cache: RedisCache) -> None:
+    store = RedisSessionStore.__wrapped__(redis_cache)
+    await check_store(store)
+
+    # revoke_all читает множество сессий пользователя, а не весь keyspace
+    await store.create(3, "f", "jti-11", 60)
+    assert await redis_cache.client.smembers("refresh:3") == {b"f"}
+    assert await store.revoke_all(3) == 1
+    assert not await redis_cache.client.exists("refresh:3", "refresh:3:f")
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from cache.single_flight import SingleFlight
+
+
+async def test_single_flight_coalesces() -> None:
+    flight = SingleFlight()
+    calls = 0
+
+    async def load() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 42
+
+    results = await asyncio.gather(*(flight.do("user:1", load) for _ in range(10)))
+
+    assert results == [42] * 10
+    assert calls == 1
+    assert flight.stats()["coalesced"] == 9
+
+
+async def test_single_flight_propagates_error() -> None:
+    flight = SingleFlight()
+
+    async def load() -> int:
+        await asyncio.sleep(0.01)
+        raise ValueError("not found")
+
+    results = await asyncio.gather(
+        *(flight.do("user:1", load) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+async def test_single_flight_leader_cancelled() -> None:
+    flight = SingleFlight()
+    calls = 0
+
+    async def load() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    leader = asyncio.create_task(flight.do("user:1", load))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("user:1", load))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    # ожидающий не отменяется, а вычисляет значение сам
+    assert await follower == 2
@@ -0,0 +1,37 @@
+import asyncio
+
+from cache.base import jittered
+from cache.cache import get_or_set
+from cache.memory_db import InMemoryCache
+
+
+def test_jittered_ttl() -> None:
+    values = {jittered(100, 0.1) for _ in range(200)}
+
+    assert all(90 <= value <= 100 for value in values)
+    assert len(values) > 1
+
+
+async def test_stale_while_revalidate() -> None:
+    cache = InMemoryCache()
+    calls = 0
+
+    async def loader() -> dict:
+        nonlocal calls
+        calls += 1
+        return {"version": calls}
+
+    async def read() -> dict:
+        return await get_or_set(
+            "test:swr", loader, timeout=0.05, cache=cache, stale_timeout=30
+        )
+
+    assert await read() == {"version": 1}
+    await asyncio.sleep(0.1)
+
+    # устаревшее значение отдается сразу, обновление идет в фоне
+    assert await read() == {"version": 1}
+    await asyncio.sleep(0.01)
+    assert await read() == {"version": 2}
+    assert calls == 2
+    await cache.delete("test:swr")
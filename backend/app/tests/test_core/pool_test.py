@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+from sqlalchemy import exc, text
+
+from core import metrics
+from core.session_manager import DatabaseSessionManager, db_manager
+
+
+async def test_pool_warmup_and_telemetry(tmp_path) -> None:
+    manager = DatabaseSessionManager.__wrapped__()
+    manager.init(
+        f"sqlite+aiosqlite:///{tmp_path}/pool.db",
+        {"pool_size": 2, "max_overflow": 0, "pool_timeout": 0.1},
+        pre_ping_idle=0.01,
+    )
+    await manager.warmup(5)
+    stats = manager.pool_stats()["primary"]
+
+    # открыто не больше размера пула
+    assert (stats["size"], stats["checked_in"], stats["checked_out"]) == (2, 2, 0)
+
+    await asyncio.sleep(0.02)
+    async with manager.session() as session:
+        # соединение простаивало — проверяется перед выдачей
+        assert await session.scalar(text("SELECT 1")) == 1
+
+    async with manager.connect(), manager.connect():
+        with pytest.raises(exc.TimeoutError):
+            async with manager.connect():
+                pass
+
+    stats = manager.pool_stats()["primary"]
+    assert stats["timeouts"] == 1
+    assert stats["wait"]["count"] >= 5
+    await manager.close()
+
+
+def test_pool_metrics_of_global_manager() -> None:
+    DatabaseSessionManager.__wrapped__()
+
+    # отдельные экземпляры (тесты, скрипты) не подменяют метрики приложения
+    assert metrics._providers["db_pool"] == db_manager.pool_stats
+    assert metrics._providers["db_queries"] == db_manager.queries.stats
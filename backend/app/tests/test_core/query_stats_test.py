@@ -0,0 +1,28 @@
+from sqlalchemy import text
+
+from core.query_stats import track_request
+from core.session_manager import DatabaseSessionManager
+
+
+async def test_query_stats() -> None:
+    manager = DatabaseSessionManager.__wrapped__()
+    manager.init("sqlite+aiosqlite://", slow_query=1e-9, n_plus_one=3)
+    stats = track_request()
+
+    async with manager.session() as session:
+        for i in range(3):
+            await session.execute(text("SELECT :i"), {"i": i})
+        await session.execute(text("SELECT 1"))
+
+    # повторяющийся запрос с разными параметрами — подозрение на N+1
+    assert stats.count == 4
+    assert stats.repeated(3) == {"SELECT ?": 3}
+    assert stats.total >= stats.slowest > 0
+    assert stats.server_timing().startswith("db;dur=")
+    assert 'desc="4 queries"' in stats.server_timing()
+
+    manager.queries.report(stats, "/users/")
+    queries = manager.queries.stats()
+    assert queries["n_plus_one_suspects"] == 1
+    assert queries["slow"] == queries["duration"]["count"] == 4
+    await manager.close()
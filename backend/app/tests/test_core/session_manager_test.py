@@ -0,0 +1,50 @@
+from sqlalchemy import text
+
+from core.session_manager import DatabaseSessionManager, LazySession
+
+
+async def test_read_session_routing() -> None:
+    manager = DatabaseSessionManager.__wrapped__()
+    manager.init(
+        "sqlite+aiosqlite://",
+        replicas=["sqlite+aiosqlite://", "sqlite+aiosqlite:////nonexistent/db.sqlite"],
+    )
+    primary, replica = manager._engine, manager._replicas[0].engine
+
+    # недоступная реплика исключается после проверки
+    await manager.check_replicas()
+    assert [r.healthy for r in manager._replicas] == [True, False]
+    for _ in range(3):
+        async with manager.read_session() as session:
+            assert session.bind is replica
+
+    # после своей записи чтение идет в основную БД
+    manager.mark_write()
+    async with manager.read_session() as session:
+        assert session.bind is primary
+
+    await manager.close()
+
+
+async def test_lazy_session() -> None:
+    manager = DatabaseSessionManager.__wrapped__()
+    manager.init("sqlite+aiosqlite://")
+    created = []
+
+    def factory():
+        created.append(manager.new_session())
+        return created[-1]
+
+    # не использованная сессия не создается
+    session = LazySession(factory)
+    await session.release()
+    assert not created
+
+    session = LazySession(factory)
+    assert await session.scalar(text("SELECT 1")) == 1
+    assert await session.scalar(text("SELECT 2")) == 2
+    assert len(created) == 1 and session.started
+
+    await session.release()
+    assert not session.started
+    await manager.close()
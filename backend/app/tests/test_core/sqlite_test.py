@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+from sqlalchemy import exc, text
+
+from core.session_manager import DatabaseSessionManager
+
+
+async def test_sqlite_profile(tmp_path) -> None:
+    manager = DatabaseSessionManager.__wrapped__()
+    manager.init(
+        f"sqlite+aiosqlite:///{tmp_path}/profile.db",
+        sqlite_profile=True,
+        sqlite_readers=2,
+        sqlite_pragmas={"busy_timeout": 1000},
+    )
+    async with manager.connect() as connection:
+        await connection.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY)"))
+
+    async def write(i: int) -> None:
+        async with manager.session() as session:
+            await session.execute(text("INSERT INTO item VALUES (:id)"), {"id": i})
+            await asyncio.sleep(0)
+            await session.commit()
+
+    # одновременные записи ждут единственное пишущее соединение
+    await asyncio.gather(*(write(i) for i in range(20)))
+
+    async with manager.read_session() as session:
+        assert await session.scalar(text("PRAGMA journal_mode")) == "wal"
+        assert await session.scalar(text("SELECT count(*) FROM item")) == 20
+        with pytest.raises(exc.OperationalError):
+            await session.execute(text("INSERT INTO item VALUES (100)"))
+
+    stats = manager.pool_stats()
+    assert stats["primary"]["size"] == 1
+    assert stats["replica_0"]["size"] == 2
+    await manager.close()
@@ -0,0 +1,108 @@
+import asyncio
+import datetime
+from collections.abc import Callable
+
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from core.session_manager import db_manager
+from models.user import UserArchive
+from repositories.user import UserRepository
+from schemas.user import UserResponse
+from scripts.index_advisor import advise, seed
+from services.archive import ArchiveReport, archive_users
+from services.celery import celery, perform_async_task
+
+
+async def test_find_by_page_columns(
+    client: AsyncClient,
+    batch_test_user_in_db: Callable,
+) -> None:
+    await batch_test_user_in_db(count=3)
+
+    async with db_manager.session() as session:
+        repository = UserRepository(session)
+        rows, total = await repository.find_by_page_counted(3, 1, columns=UserResponse)
+        row = await repository.find_one_or_none(columns=["id"], id=rows[0]["id"])
+
+    # только поля схемы, без хеша пароля и без колонки количества
+    assert set(rows[0]) == set(UserResponse.model_fields)
+    assert total >= 3
+    assert dict(row) == {"id": rows[0]["id"]}
+    assert UserResponse.model_validate(dict(rows[0]))
+
+
+async def test_not_deleted_indexes() -> None:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    await seed(engine, 2_000)
+    reports = await advise(engine)
+    await engine.dispose()
+
+    # фильтры и сортировки обслуживаются частичными индексами
+    assert reports and not [report.name for report in reports if report.failed]
+    plans = {report.name: " ".join(report.plan) for report in reports}
+    assert "ix_user_active_fullname" in plans["find_all(fullname)"]
+    assert "ix_user_active_created_at" in plans["find_by_keyset(sort=created_at)"]
+
+
+async def test_archive_deleted_users(
+    client: AsyncClient,
+    test_user_in_db: Callable,
+) -> None:
+    kept = await test_user_in_db()
+    deleted = [await test_user_in_db() for _ in range(3)]
+    async with db_manager.session() as session:
+        repository = UserRepository(session)
+        await repository.edit_many([user["id"] for user in deleted], {"is_deleted": 1})
+        await session.commit()
+
+    # отрицательный срок — удаленные "раньше, чем через минуту", то есть все
+    future = datetime.timedelta(minutes=-1)
+    report = await archive_users(future, datetime.timedelta(days=1), batch_rows=2)
+    assert report.archived >= 3 and report.done
+
+    async with db_manager.session() as session:
+        repository = UserRepository(session)
+        archived = await session.scalars(select(UserArchive.id))
+        assert {user["id"] for user in deleted} <= set(archived)
+        assert await repository.find_one_or_none(id=deleted[0]["id"]) is None
+        assert await repository.find_one_or_none(id=kept["id"])
+
+    # лимит пачек: очистка не успевает за один запуск и продолжается следующим
+    report = await archive_users(future, future, batch_rows=1, max_batches=1)
+    assert report.purged == 1 and not report.done
+    await archive_users(future, future, batch_rows=2, pause=0)
+    async with db_manager.session() as session:
+        assert not list(await session.scalars(select(UserArchive.id)))
+
+
+async def test_perform_async_task_eager() -> None:
+    assert celery.conf.task_always_eager
+    done = asyncio.Event()
+
+    async def archive() -> ArchiveReport:
+        done.set()
+        return ArchiveReport(archived=1)
+
+    # вне цикла событий задача выполняется и возвращает результат
+    report = await asyncio.to_thread(perform_async_task, archive())
+    assert report == ArchiveReport(archived=1)
+
+    # в работающем цикле приложения корутина запускается в фоне
+    done.clear()
+    assert perform_async_task(archive()) is None
+    await asyncio.wait_for(done.wait(), 1)
+
+
+async def test_perform_async_task_concurrent() -> None:
+    async def archive(i: int) -> ArchiveReport:
+        await asyncio.sleep(0.05)
+        return ArchiveReport(archived=i)
+
+    # две задачи одновременно из разных потоков пула воркера
+    reports = await asyncio.gather(
+        asyncio.to_thread(perform_async_task, archive(1)),
+        asyncio.to_thread(perform_async_task, archive(2)),
+    )
+    assert [report.archived for report in reports] == [1, 2]